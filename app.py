@@ -1,14 +1,24 @@
 import asyncio
+import os
 import time
-from fastapi import FastAPI, Query
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 import uvicorn
 import sys
 import json
 
 # Import storage manager
 from storage_manager import StorageManager
+from storage_backend import get_storage_backend, contact_key
+import json_codec
+from json_codec import JSONResponse
+from http_cache import CachedBody, ResponseCache, cached_json_response, etag_matches, not_modified
+from timeline_pages import DEFAULT_PAGE_SIZE, event_types_for, read_timeline_page
+from summary_cache import SPECULATIVE_SUMMARIES, SummaryJobs, saved_summary_for
 # Import the timeline extraction function
 def import_timeline_func():
     try:
@@ -26,9 +36,73 @@ def import_timeline_func():
 from llm_analysis.orchestrator import generate_combined_summary
 
 # Initialize storage manager
-storage_manager = StorageManager(max_age_days=7, max_files_per_mobile=50)
+storage_manager = StorageManager(max_age_days=7, max_files_per_mobile=50)  # capacity via STORAGE_CAPACITY_MB
 
-app = FastAPI()
+# Summary generations in flight, shared by speculative starts and requests;
+# each one pins the lead's timeline and summary against eviction
+summary_jobs = SummaryJobs(generate_combined_summary, pin=storage_manager.pin_lead)
+# Leads summarised at once for all batch requests of this worker together
+BATCH_SUMMARY_CONCURRENCY = int(os.getenv('BATCH_SUMMARY_CONCURRENCY', '4'))
+BATCH_SUMMARY_MAX_LEADS = int(os.getenv('BATCH_SUMMARY_MAX_LEADS', '200'))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_SUMMARY_CONCURRENCY, thread_name_prefix='batch-summary')
+
+# Encoded timelines and summaries, keyed by what they were built from
+response_cache = ResponseCache()
+# A conditional timeline request is answered from storage, without
+# re-running extraction, while the stored timeline is younger than this
+TIMELINE_REVALIDATE_SECONDS = float(os.getenv('TIMELINE_REVALIDATE_SECONDS', '300'))
+
+
+def stored_timeline_body(backend, contact: str):
+    """
+    The stored timeline encoded for a response, with its content ETag.
+    Re-read and re-encoded only when the backend reports a new version.
+
+    Returns:
+        CachedBody, or None if no timeline is stored
+    """
+    version = backend.timeline_version(contact)
+    if version is None:
+        return None
+    key = ('timeline', contact, version[0])
+    entry = response_cache.get(key)
+    if entry is None:
+        timeline = backend.load_timeline(contact)
+        if timeline is None:
+            return None
+        entry = response_cache.put(key, CachedBody.encode(timeline))
+    return entry
+
+
+def cached_summary_body(backend, contact: str, source: CachedBody):
+    """Encoded summary already generated from this timeline version, or None"""
+    key = ('summary', contact, source.etag)
+    entry = response_cache.get(key)
+    if entry is None:
+        stored = saved_summary_for(backend, contact, source.etag)
+        if stored is not None:
+            entry = response_cache.put(key, CachedBody.encode(stored))
+    return entry
+
+
+def generate_summary_body(backend, contact: str, timeline_path: str, source: CachedBody,
+                          refresh: bool = False) -> CachedBody:
+    """Generate (or join the generation of) the summary of a timeline version, encoded"""
+    # Joins a speculative or concurrent generation of the same timeline
+    result = summary_jobs.summarize(backend, contact, timeline_path,
+                                    lambda: json_codec.loads(source.body), source.etag, refresh=refresh)
+    return response_cache.put(('summary', contact, source.etag), CachedBody.encode(result))
+
+
+def speculate_summary(backend, contact: str, timeline_path: str, entry: CachedBody):
+    """Start the summary of a just-served timeline, unless it is cached already"""
+    if response_cache.get(('summary', contact, entry.etag)) is not None:
+        return
+    if summary_jobs.speculate(backend, contact, timeline_path, lambda: json_codec.loads(entry.body), entry.etag):
+        print(f"[API] Speculative summary started for {contact}")
+
+
+app = FastAPI(default_response_class=JSONResponse)
 
 # Allow CORS for frontend development and production
 app.add_middleware(
@@ -45,12 +119,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_summary_warmup():
+    # Opt-in: one worker (whichever takes the lock) warms summaries in the background
+    if os.getenv('WARMUP_IN_APP', 'false').lower() in ('1', 'true', 'yes'):
+        import warmup
+        if warmup.start_background():
+            print("[API] Summary warm-up service started in this worker")
+
 @app.get("/generate-timeline")
-def generate_timeline_api(mobile: str = Query(None), email: str = Query(None)):
+def generate_timeline_api(request: Request, mobile: str = Query(None), email: str = Query(None),
+                          transcribe: bool = Query(None), speculate: bool = Query(None)):
     """
     Generate timeline for a given mobile number or email.
     Returns the timeline JSON as used by the frontend.
+    With transcribe=true, recorded calls without a transcript are transcribed
+    (or filled from stored transcripts) before the timeline is returned.
+
+    Responses carry a strong ETag of their content. A request whose
+    If-None-Match names the stored timeline gets 304 without re-running
+    extraction while that timeline is younger than TIMELINE_REVALIDATE_SECONDS.
+    Large bodies are gzipped for clients that accept it.
+
+    With speculate=true (default: SPECULATIVE_SUMMARIES), the summary of the
+    returned timeline starts generating in the background right away, and
+    /generate-summary picks up that job instead of starting over.
     """
+    if speculate is None:
+        speculate = SPECULATIVE_SUMMARIES
     try:
         print(f"[API] generate-timeline called with mobile={mobile}, email={email}")
         
@@ -63,30 +159,38 @@ def generate_timeline_api(mobile: str = Query(None), email: str = Query(None)):
             print("[API] No mobile or email provided")
             return JSONResponse(status_code=400, content={"error": "Provide either mobile or email."})
         
+        backend = get_storage_backend()
+        contact = contact_key(mobile, email)
+        timeline_path = backend.timeline_location(contact)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and not transcribe:
+            version = backend.timeline_version(contact)
+            if version is not None and time.time() - version[1] < TIMELINE_REVALIDATE_SECONDS:
+                entry = stored_timeline_body(backend, contact)
+                if entry is not None and etag_matches(if_none_match, entry.etag):
+                    storage_manager.touch(timeline_path)
+                    print(f"[API] Timeline unchanged for {contact}, skipping extraction")
+                    if speculate:
+                        speculate_summary(backend, contact, timeline_path, entry)
+                    return not_modified(entry.etag)
+
         print(f"[API] Running timeline extraction for: {mobile or email}")
         # Run extraction and load the generated file
-        timeline_func(mobile_number=mobile, email=email)
-        
-        # Determine file path
-        import os
-        if mobile:
-            timeline_path = os.path.join('data', f'timeline_{mobile}.json')
-        elif email:
-            email_safe = email.replace('@', '_').replace('.', '_')
-            timeline_path = os.path.join('data', f'timeline_{email_safe}.json')
-        else:
-            timeline_path = os.path.join('data', 'timeline_unknown.json')
+        timeline_func(mobile_number=mobile, email=email, transcribe_calls=transcribe)
         
-        print(f"[API] Looking for timeline file: {timeline_path}")
-        if not os.path.exists(timeline_path):
-            print(f"[API] Timeline file not found: {timeline_path}")
+        # Load the stored timeline from the configured backend
+        print(f"[API] Looking for timeline: {contact} ({backend.name} backend)")
+        entry = stored_timeline_body(backend, contact)
+        if entry is None:
+            print(f"[API] Timeline not found: {contact}")
             return JSONResponse(status_code=404, content={"error": "Timeline not found."})
+        storage_manager.touch(timeline_path)
         
-        with open(timeline_path, 'r', encoding='utf-8') as f:
-            timeline = f.read()
-        
-        print(f"[API] Timeline loaded successfully, size: {len(timeline)} characters")
-        return JSONResponse(content=json.loads(timeline))
+        print(f"[API] Timeline loaded successfully, {len(entry.body)} bytes, ETag {entry.etag}")
+        if speculate:
+            speculate_summary(backend, contact, timeline_path, entry)
+        return cached_json_response(request, entry, response_cache)
         
     except Exception as e:
         print(f"[API] Error in generate-timeline: {e}")
@@ -94,14 +198,55 @@ def generate_timeline_api(mobile: str = Query(None), email: str = Query(None)):
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": f"Internal server error: {str(e)}"})
 
+@app.get("/timeline")
+def timeline_page_api(request: Request, mobile: str = Query(None), email: str = Query(None),
+                      cursor: str = Query(None), since: str = Query(None),
+                      limit: int = Query(DEFAULT_PAGE_SIZE), channel: str = Query(None)):
+    """
+    Read a stored timeline page by page, without regenerating it.
+
+    Pages run newest first; pass next_cursor back as cursor for older
+    events. Pollers pass latest_cursor back as since to get only the events
+    added (or updated in place) after it, oldest first. channel filters by
+    whatsapp, email, call and/or lead (comma separated). Only the returned
+    events are read from storage.
+    """
+    if not mobile and not email:
+        return JSONResponse(status_code=400, content={"error": "Provide either mobile or email."})
+    if cursor and since:
+        return JSONResponse(status_code=400, content={"error": "Use either cursor or since, not both."})
+    try:
+        types = event_types_for(channel)
+        backend = get_storage_backend()
+        contact = contact_key(mobile, email)
+        # Retry once if the timeline was rewritten while the page was read
+        for _ in range(2):
+            version = backend.timeline_version(contact)
+            page = read_timeline_page(backend, contact, cursor=cursor, since=since, limit=limit, types=types)
+            if version == backend.timeline_version(contact):
+                break
+        if page is None:
+            return JSONResponse(status_code=404, content={"error": "Timeline not found."})
+        storage_manager.touch(backend.timeline_location(contact))
+        return cached_json_response(request, CachedBody.encode(page))
+    except ValueError as e:  # InvalidCursor, unknown channel
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        print(f"[API] Error in timeline: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 @app.get("/generate-summary")
-def generate_summary_api(mobile: str = Query(None), email: str = Query(None)):
+def generate_summary_api(request: Request, mobile: str = Query(None), email: str = Query(None),
+                         refresh: bool = Query(False)):
     """
     Generate LLM summary for a given mobile number or email.
     Returns the raw LLM output as JSON.
+
+    The saved summary is returned as is, without calling the LLM, while the
+    stored timeline is the one it was generated from; pass refresh=true to
+    regenerate anyway. ETags, 304 answers and gzip work as for
+    /generate-timeline.
     """
-    import os
-    
     # Check if cleanup is needed before processing
     if storage_manager.should_cleanup():
         print("Storage cleanup needed, running cleanup...")
@@ -110,26 +255,122 @@ def generate_summary_api(mobile: str = Query(None), email: str = Query(None)):
     
     if not mobile and not email:
         return JSONResponse(status_code=400, content={"error": "Provide either mobile or email."})
-    if mobile:
-        timeline_path = os.path.join('data', f'timeline_{mobile}.json')
-    elif email:
-        email_safe = email.replace('@', '_').replace('.', '_')
-        timeline_path = os.path.join('data', f'timeline_{email_safe}.json')
-    else:
-        timeline_path = os.path.join('data', 'timeline_unknown.json')
-    if not os.path.exists(timeline_path):
+    backend = get_storage_backend()
+    contact = contact_key(mobile, email)
+    timeline_path = backend.timeline_location(contact)
+    if not backend.timeline_exists(contact):
         return JSONResponse(status_code=404, content={"error": "Timeline not found."})
     try:
-        result = generate_combined_summary(timeline_path)
-        return JSONResponse(content=result)
+        storage_manager.touch_lead(backend, contact)
+        # Pin the timeline and summary so cleanup in another worker cannot evict them mid-request
+        with storage_manager.pin_lead(backend, contact):
+            source = stored_timeline_body(backend, contact)
+            if source is None:
+                return JSONResponse(status_code=404, content={"error": "Timeline not found."})
+            entry = None if refresh else cached_summary_body(backend, contact, source)
+            if entry is None:
+                entry = generate_summary_body(backend, contact, timeline_path, source, refresh=refresh)
+            else:
+                print(f"[API] Timeline unchanged for {contact}, serving saved summary")
+        return cached_json_response(request, entry, response_cache)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+class BatchSummaryRequest(BaseModel):
+    mobiles: List[str] = []
+    emails: List[str] = []
+    refresh: bool = False
+
+
+def _ndjson_line(meta: dict, summary_body: bytes = None) -> bytes:
+    """One result line, splicing an already encoded summary in as is"""
+    line = json_codec.dumps_bytes(meta)
+    if summary_body is not None:
+        line = line[:-1] + b',"summary":' + summary_body + b'}'
+    return line + b'\n'
+
+
+@app.post("/generate-summaries")
+def generate_summaries_batch_api(batch: BatchSummaryRequest):
+    """
+    Summaries for many leads in one request, streamed back as
+    newline-delimited JSON, one line per lead as soon as it is ready:
+    {"contact", "mobile", "email", "status", "summary" | "error"}.
+
+    Leads are deduplicated by storage key. Summaries already generated
+    from the current timeline come first ("cached"); the rest are
+    generated ("generated") on a pool shared by all batch requests
+    (BATCH_SUMMARY_CONCURRENCY), joining speculative or concurrent
+    generations of the same timeline. Leads without a stored timeline
+    report "not_found". refresh=true regenerates every summary.
+    """
+    leads = {}
+    for mobile in batch.mobiles:
+        if mobile:
+            leads.setdefault(contact_key(mobile, None), {"mobile": mobile, "email": None})
+    for email in batch.emails:
+        if email:
+            leads.setdefault(contact_key(None, email), {"mobile": None, "email": email})
+    if not leads:
+        return JSONResponse(status_code=400, content={"error": "Provide mobiles or emails."})
+    if len(leads) > BATCH_SUMMARY_MAX_LEADS:
+        return JSONResponse(status_code=400,
+                            content={"error": f"At most {BATCH_SUMMARY_MAX_LEADS} leads per batch."})
+    if storage_manager.should_cleanup():
+        print(f"Storage cleanup completed: {storage_manager.cleanup_old_files()}")
+    backend = get_storage_backend()
+    print(f"[API] generate-summaries called for {len(leads)} leads")
+
+    def stream():
+        misses = []
+        for contact, lead in leads.items():
+            meta = {"contact": contact, **lead}
+            try:
+                # Same pin as /generate-summary, held while the lead is read
+                with storage_manager.pin_lead(backend, contact):
+                    source = stored_timeline_body(backend, contact)
+                    if source is not None:
+                        timeline_path = backend.timeline_location(contact)
+                        storage_manager.touch_lead(backend, contact)
+                        entry = None if batch.refresh else cached_summary_body(backend, contact, source)
+            except Exception as e:
+                yield _ndjson_line({**meta, "status": "error", "error": str(e)})
+                continue
+            if source is None:
+                yield _ndjson_line({**meta, "status": "not_found", "error": "Timeline not found."})
+                continue
+            if entry is not None:
+                yield _ndjson_line({**meta, "status": "cached"}, entry.body)
+            else:
+                misses.append((meta, contact, timeline_path, source))
+
+        def generate_pinned(contact, timeline_path, source):
+            with storage_manager.pin_lead(backend, contact):
+                return generate_summary_body(backend, contact, timeline_path, source, batch.refresh)
+
+        futures = {batch_executor.submit(generate_pinned, contact, timeline_path, source): meta
+                   for meta, contact, timeline_path, source in misses}
+        try:
+            for future in as_completed(futures):
+                meta = futures[future]
+                try:
+                    yield _ndjson_line({**meta, "status": "generated"}, future.result().body)
+                except Exception as e:
+                    print(f"[API] Batch summary failed for {meta['contact']}: {e}")
+                    yield _ndjson_line({**meta, "status": "error", "error": str(e)})
+        finally:
+            # Client went away: drop the leads that have not started yet
+            for future in futures:
+                future.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/storage/stats")
 def get_storage_stats():
     """Get current storage statistics"""
     try:
         stats = storage_manager.get_storage_stats()
+        stats['backend'] = get_storage_backend().get_stats()
         return JSONResponse(content=stats)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -0,0 +1,102 @@
+"""
+JSON encode/decode cost per request: the stdlib calls the API and storage
+layers used to make versus json_codec (orjson when installed).
+
+    python benchmarks/bench_json_encoding.py [--repeat 50]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_codec  # noqa: E402
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "data", "timeline_917007220975.json")
+
+
+def legacy_make_json_serializable(obj):
+    """The per-value converter db_test_extract used to apply to every cell"""
+    import numpy as np
+    import pandas as pd
+    if isinstance(obj, (pd.Timestamp, datetime.datetime)):
+        return obj.isoformat()
+    elif isinstance(obj, datetime.date):
+        return obj.isoformat()
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif pd.isna(obj):
+        return None
+    else:
+        return obj
+
+
+def per_call(fn, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def compare(label, legacy, current, repeat):
+    before, after = per_call(legacy, repeat), per_call(current, repeat)
+    print(f"{label:<40} {before:9.2f} ms {after:9.2f} ms {before / after:7.1f}x")
+    return before - after
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    with open(SAMPLE, "rb") as f:
+        raw = f.read()
+    timeline = json.loads(raw)
+    print(f"json_codec backend: {json_codec.BACKEND}; {len(timeline)} events, {len(raw) / 1024:.0f} KB")
+    print(f"{'CPU per call':<40} {'stdlib':>12} {'json_codec':>12} {'speedup':>8}")
+
+    # GET /generate-timeline: load the stored timeline, render the response
+    saved = compare("load stored timeline", lambda: json.loads(raw), lambda: json_codec.loads(raw), args.repeat)
+    saved += compare("render API response",
+                     lambda: json.dumps(timeline, ensure_ascii=False, allow_nan=False, indent=None,
+                                        separators=(",", ":")).encode("utf-8"),
+                     lambda: json_codec.dumps_bytes(timeline), args.repeat)
+    print(f"  -> saved per /generate-timeline request: {saved:.2f} ms CPU")
+
+    # Timeline extraction: write the timeline file
+    compare("write timeline file (indent=2)",
+            lambda: json.dumps(timeline, indent=2, ensure_ascii=False).encode("utf-8"),
+            lambda: json_codec.dumps_bytes(timeline, pretty=True), args.repeat)
+
+    # GET /generate-summary: three prompt builders each serialize the timeline
+    saved = compare("build 3 prompts (indent=2 -> compact)",
+                    lambda: [json.dumps(timeline, indent=2, ensure_ascii=False) for _ in range(3)],
+                    lambda: [json_codec.dumps(timeline) for _ in range(3)], args.repeat)
+    pretty_len = len(json.dumps(timeline, indent=2, ensure_ascii=False))
+    compact_len = len(json_codec.dumps(timeline))
+    print(f"  -> saved per /generate-summary request: {saved:.2f} ms CPU, "
+          f"prompt {pretty_len} -> {compact_len} chars ({1 - compact_len / pretty_len:.0%} smaller)")
+
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        print("numpy/pandas not installed; skipping cell conversion")
+        return
+    cells = [pd.Timestamp("2025-01-02 03:04:05"), np.int64(3), np.float64("nan"), "text", None, 1.5] * 20_000
+    compare("convert 120k DataFrame cells",
+            lambda: [legacy_make_json_serializable(c) for c in cells],
+            lambda: [json_codec.to_jsonable(c) for c in cells], max(1, args.repeat // 25))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Narrow reads from a large stored timeline: json.load of the whole file
+versus lazy_json.LazyJsonArray (memory mapped, offset index).
+
+    python benchmarks/bench_lazy_timeline.py [--events 50000]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lazy_json  # noqa: E402
+from lazy_json import LazyJsonArray  # noqa: E402
+
+
+def build_timeline(events: int):
+    start = datetime.datetime(2024, 1, 1)
+    timeline = [{"type": "call" if i % 20 == 0 else "whatsapp",
+                 "timestamp": (start + datetime.timedelta(minutes=15 * i)).isoformat(),
+                 "sender_type": "agent" if i % 2 else "customer",
+                 "message_content": "Hello, when can we connect about the room?" * 3}
+                for i in range(events)]
+    timeline.append({"type": "lead_info", "timestamp": "2025-09-01T00:00:00", "user_name": "Test Lead"})
+    return timeline
+
+
+def measure(label, fn, reset=lambda: None):
+    """Time one run, then trace allocations in a second (tracing slows it down)"""
+    reset()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    reset()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<45} {elapsed * 1000:9.1f} ms {peak / 1024 / 1024:9.2f} MB peak")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50_000)
+    args = parser.parse_args()
+    timeline = build_timeline(args.events)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "timeline_bench.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(timeline, f, indent=2, ensure_ascii=False)
+        print(f"{len(timeline)} events, {os.path.getsize(path) / 1024 / 1024:.1f} MB on disk")
+        cutoff = timeline[-101]["timestamp"]
+
+        def full_load():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        measure("json.load, then filter lead_info",
+                lambda: [e for e in full_load() if e["type"] == "lead_info"])
+        def forget_index():
+            lazy_json._indexes.clear()
+            if os.path.exists(lazy_json.sidecar_path(path)):
+                os.remove(lazy_json.sidecar_path(path))
+
+        measure("lazy: scan and write offset index (once)", lambda: len(LazyJsonArray(path)),
+                reset=forget_index)
+        measure("lazy: load .idx sidecar (new process)", lambda: len(LazyJsonArray(path)),
+                reset=lazy_json._indexes.clear)
+        lead = measure("lazy: of_type('lead_info')", lambda: LazyJsonArray(path).of_type("lead_info"))
+        recent = measure("lazy: after(T), last 100 events", lambda: LazyJsonArray(path).after(cutoff))
+        measure("lazy: last(50)", lambda: LazyJsonArray(path).last(50))
+        assert lead == [timeline[-1]] and recent == timeline[-100:]
+
+
+if __name__ == "__main__":
+    main()
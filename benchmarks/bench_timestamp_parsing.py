@@ -0,0 +1,78 @@
+"""
+Timestamp parsing benchmark for graph/data_consolidator on a synthetic
+100k-message lead (WhatsApp export timestamps plus ISO calls and emails).
+
+    python benchmarks/bench_timestamp_parsing.py [--messages 100000]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.data_consolidator import TimestampParser, consolidate_and_report  # noqa: E402
+
+
+def legacy_parse_timestamp(ts):
+    """The original try-every-format parser, kept here as the baseline"""
+    if isinstance(ts, datetime.datetime):
+        return ts
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%d %H:%M", "%B %d, %Y, %I:%M %p"):
+        try:
+            return datetime.datetime.strptime(ts, fmt)
+        except Exception:
+            continue
+    return None
+
+
+def build_lead(messages: int):
+    rng = random.Random(42)
+    start = datetime.datetime(2024, 1, 1)
+    def moment():
+        return start + datetime.timedelta(minutes=rng.randint(0, 500 * 24 * 60))
+    whatsapp = [{"created_at": moment().strftime("%B %d, %Y, %I:%M %p").replace(" 0", " "),
+                 "sender_type": rng.choice(("agent", "customer")),
+                 "message_content": "Hello, when can we connect?"} for _ in range(messages)]
+    calls = [{"timestamp": moment().isoformat(), "content": "call"} for _ in range(messages // 50)]
+    emails = [{"timestamp": moment().strftime("%Y-%m-%d %H:%M:%S"), "subject": "Booking"} for _ in range(messages // 100)]
+    return {"Whatsapp_test": whatsapp, "calls": calls, "mail": emails}
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed * 1000:10.1f} ms")
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+    lead = build_lead(args.messages)
+    stamps = [(m["created_at"], "whatsapp") for m in lead["Whatsapp_test"]]
+    stamps += [(c["timestamp"], "call") for c in lead["calls"]]
+    stamps += [(e["timestamp"], "email") for e in lead["mail"]]
+    print(f"{len(stamps)} timestamps")
+
+    baseline, _ = timed("legacy parse (every value, in sort key)",
+                        lambda: sorted(stamps, key=lambda s: legacy_parse_timestamp(s[0]) or datetime.datetime.min))
+    ts_parser = TimestampParser()
+    per_value, _ = timed("TimestampParser.parse (format cached)",
+                         lambda: [ts_parser.parse(ts, source) for ts, source in stamps])
+    ts_parser = TimestampParser()
+    by_source = {}
+    for ts, source in stamps:
+        by_source.setdefault(source, []).append(ts)
+    bulk, _ = timed("TimestampParser.parse_many (per channel)",
+                    lambda: [ts_parser.parse_many(values, source) for source, values in by_source.items()])
+    timed("consolidate_and_report (whole lead)", lambda: consolidate_and_report(lead))
+    print(f"speedup: {baseline / per_value:.1f}x per value, {baseline / bulk:.1f}x bulk")
+
+
+if __name__ == "__main__":
+    main()
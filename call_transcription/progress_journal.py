@@ -0,0 +1,150 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Set
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to in-process locking only
+    fcntl = None
+
+import json_codec  # repo root, put on sys.path by transcribe_calls
+
+SNAPSHOT_EVERY = 500  # journal entries between snapshots
+
+
+class ProgressJournal:
+    """
+    Transcription progress as in-memory sets, persisted as an append-only
+    journal plus periodic snapshots.
+
+    The snapshot keeps the historical transcription_progress.json format
+    ({"completed_urls": [...], "failed_urls": [...]}); each mark appends one
+    line to <snapshot>.journal instead of rewriting the snapshot. Every
+    SNAPSHOT_EVERY entries the journal is folded into a new snapshot.
+
+    Appends take a shared file lock and compaction an exclusive one, so
+    several batch processes can share the same progress files; each process
+    picks up entries written by the others before answering a lookup.
+    """
+
+    def __init__(self, snapshot_path: str, snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + '.journal'
+        self.lock_path = snapshot_path + '.lock'
+        self.snapshot_every = snapshot_every
+        self.sets: Dict[str, Set[str]] = {'completed': set(), 'failed': set()}
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._snapshot_id = None
+        self._lock = threading.RLock()
+        with self._file_lock(exclusive=False):
+            self._reload()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current_snapshot_id(self):
+        try:
+            st = os.stat(self.snapshot_path)
+            return (st.st_ino, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _reload(self):
+        """Load the snapshot and replay the whole journal"""
+        self.sets = {'completed': set(), 'failed': set()}
+        self._snapshot_id = self._current_snapshot_id()
+        if os.path.exists(self.snapshot_path):
+            try:
+                snapshot = json_codec.load_file(self.snapshot_path)
+                self.sets['completed'].update(snapshot.get('completed_urls', []))
+                self.sets['failed'].update(snapshot.get('failed_urls', []))
+            except Exception as e:
+                logging.warning(f"Could not load progress snapshot: {e}")
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._replay()
+
+    def _replay(self):
+        """Apply journal entries appended since the last read (by any process)"""
+        try:
+            size = os.path.getsize(self.journal_path)
+        except OSError:
+            size = 0
+        if size < self._journal_offset or self._current_snapshot_id() != self._snapshot_id:
+            # Journal was compacted by another process
+            self._reload()
+            return
+        if size == self._journal_offset:
+            return
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partially written entry, pick it up next time
+                self._journal_offset += len(line)
+                self._journal_entries += 1
+                try:
+                    entry = json_codec.loads(line)
+                    self.sets[entry['state']].add(entry['url'])
+                except (ValueError, KeyError):
+                    continue
+
+    def contains(self, state: str, url: str) -> bool:
+        with self._lock:
+            if url in self.sets[state]:
+                return True
+            self._replay()
+            return url in self.sets[state]
+
+    def mark(self, state: str, url: str):
+        with self._lock:
+            if url in self.sets[state]:
+                return
+            self.sets[state].add(url)
+            line = json_codec.dumps_bytes({'state': state, 'url': url}) + b'\n'
+            with self._file_lock(exclusive=False):
+                fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+            self._replay()
+            if self._journal_entries >= self.snapshot_every:
+                self.snapshot()
+
+    def snapshot(self):
+        """Fold the journal into a new snapshot and truncate it"""
+        with self._file_lock(exclusive=True):
+            self._replay()
+            data = {
+                'completed_urls': sorted(self.sets['completed']),
+                'failed_urls': sorted(self.sets['failed']),
+            }
+            tmp = f'{self.snapshot_path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(json_codec.dumps_bytes(data, pretty=True))
+            os.replace(tmp, self.snapshot_path)
+            with open(self.journal_path, 'w'):
+                pass
+            self._journal_offset = 0
+            self._journal_entries = 0
+            self._snapshot_id = self._current_snapshot_id()
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        with self._lock:
+            self._replay()
+            return {'completed_urls': sorted(self.sets['completed']),
+                    'failed_urls': sorted(self.sets['failed'])}
@@ -1,32 +1,69 @@
 import os
+import sys
 import json
 import logging
-import shutil
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import glob
 
-class StorageManager:
-    def __init__(self, max_age_days: int = 7, max_files_per_mobile: int = 50):
+# Access tracking, pinning and eviction are shared with the API (repo root)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lru_files import LRUFileStore
+
+class StorageManager(LRUFileStore):
+    def __init__(self, max_age_days: int = 7, max_files_per_mobile: int = 50,
+                 capacity_mb: Optional[float] = None, high_water: float = 0.9,
+                 low_water: float = 0.75, pin_ttl_seconds: int = 3600):
         """
         Initialize storage manager with cleanup policies
         
         Args:
             max_age_days: Files older than this will be deleted
             max_files_per_mobile: Maximum files to keep per mobile number
+            capacity_mb: Disk budget for managed files; enables LRU eviction when set
+            high_water: Fraction of capacity_mb that triggers LRU eviction
+            low_water: Fraction of capacity_mb that LRU eviction frees down to
+            pin_ttl_seconds: Pins older than this are treated as stale (crashed worker)
         """
         self.max_age_days = max_age_days
         self.max_files_per_mobile = max_files_per_mobile
+        if capacity_mb is None and os.getenv('STORAGE_CAPACITY_MB'):
+            capacity_mb = float(os.getenv('STORAGE_CAPACITY_MB'))
+        self.capacity_mb = capacity_mb
+        self.high_water = high_water
+        self.low_water = min(low_water, high_water)
+        self.pin_ttl_seconds = pin_ttl_seconds
+        self._bytes_freed = 0
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.transcripts_dir = os.path.join(self.base_dir, 'data', 'transcripts')
         self.timeline_dir = os.path.join(self.base_dir, 'data')
         self.log_dir = os.path.dirname(os.path.abspath(__file__))
+        self.pin_dir = os.path.join(self.base_dir, 'data', '.pins')
         
         # Ensure directories exist
         os.makedirs(self.transcripts_dir, exist_ok=True)
         os.makedirs(self.timeline_dir, exist_ok=True)
+        os.makedirs(self.pin_dir, exist_ok=True)
         
-        logging.info(f"StorageManager initialized with max_age_days={max_age_days}, max_files_per_mobile={max_files_per_mobile}")
+        logging.info(f"StorageManager initialized with max_age_days={max_age_days}, max_files_per_mobile={max_files_per_mobile}, capacity_mb={capacity_mb}")
+    
+    def _transcript_files(self) -> List[str]:
+        """Transcript files, plain (.txt) or compressed (.txt.z)"""
+        files = glob.glob(os.path.join(self.transcripts_dir, "*.txt"))
+        files.extend(glob.glob(os.path.join(self.transcripts_dir, "*.txt.z")))
+        return files
+    
+    def _timeline_files(self) -> List[str]:
+        """Timeline files in both the legacy JSON and the event log layout"""
+        files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+        files.extend(glob.glob(os.path.join(self.timeline_dir, "events", "timeline_*.jsonl")))
+        return files
+    
+    def _tracked_paths(self) -> List[str]:
+        paths = self._transcript_files()
+        paths.extend(self._timeline_files())
+        paths.extend(glob.glob(os.path.join(self.timeline_dir, "*summary*.json")))
+        return paths
     
     def cleanup_old_files(self) -> Dict[str, int]:
         """
@@ -39,8 +76,10 @@ class StorageManager:
             'transcripts_deleted': 0,
             'timeline_files_deleted': 0,
             'log_files_deleted': 0,
+            'lru_items_evicted': 0,
             'total_space_freed_mb': 0
         }
+        self._bytes_freed = 0
         
         try:
             # Clean up old transcript files
@@ -52,6 +91,9 @@ class StorageManager:
             # Clean up old log files
             stats['log_files_deleted'] = self._cleanup_log_files()
             
+            # Evict least-recently-used items if still above the high-water mark
+            stats['lru_items_evicted'] = self.evict_lru()['items_evicted']
+            
             # Calculate space freed
             stats['total_space_freed_mb'] = self._calculate_space_freed()
             
@@ -60,23 +102,25 @@ class StorageManager:
             
         except Exception as e:
             logging.error(f"Storage cleanup failed: {e}")
+            stats['total_space_freed_mb'] = self._calculate_space_freed()
             return stats
     
     def _cleanup_transcripts(self) -> int:
         """Clean up old transcript files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
         # Get all transcript files
-        transcript_files = glob.glob(os.path.join(self.transcripts_dir, "*.txt"))
+        transcript_files = self._transcript_files()
         
         for file_path in transcript_files:
             try:
                 file_stat = os.stat(file_path)
-                file_date = datetime.fromtimestamp(file_stat.st_mtime)
+                file_date = datetime.fromtimestamp(max(file_stat.st_atime, file_stat.st_mtime))
                 
-                if file_date < cutoff_date:
-                    os.remove(file_path)
+                if file_date < cutoff_date and not self.is_pinned(file_path, pins):
+                    self._remove_path(file_path)
                     deleted_count += 1
                     logging.info(f"Deleted old transcript: {file_path}")
             except Exception as e:
@@ -84,27 +128,30 @@ class StorageManager:
         
         # Also limit files per mobile number
         mobile_files = {}
-        for file_path in glob.glob(os.path.join(self.transcripts_dir, "*.txt")):
+        for file_path in self._transcript_files():
             try:
                 filename = os.path.basename(file_path)
                 # Extract mobile number from filename (format: mobile_timestamp.txt)
                 mobile_number = filename.split('_')[0]
                 if mobile_number not in mobile_files:
                     mobile_files[mobile_number] = []
-                mobile_files[mobile_number].append((file_path, os.path.getmtime(file_path)))
+                file_stat = os.stat(file_path)
+                mobile_files[mobile_number].append((file_path, max(file_stat.st_atime, file_stat.st_mtime)))
             except Exception as e:
                 logging.warning(f"Failed to process file {file_path}: {e}")
         
         # Keep only the most recent files per mobile number
         for mobile_number, files in mobile_files.items():
             if len(files) > self.max_files_per_mobile:
-                # Sort by modification time (newest first)
+                # Sort by last access time (most recently used first)
                 files.sort(key=lambda x: x[1], reverse=True)
                 
                 # Delete excess files
                 for file_path, _ in files[self.max_files_per_mobile:]:
+                    if self.is_pinned(file_path, pins):
+                        continue
                     try:
-                        os.remove(file_path)
+                        self._remove_path(file_path)
                         deleted_count += 1
                         logging.info(f"Deleted excess transcript for {mobile_number}: {file_path}")
                     except Exception as e:
@@ -114,19 +161,20 @@ class StorageManager:
     
     def _cleanup_timeline_files(self) -> int:
         """Clean up old timeline files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
         # Get all timeline files
-        timeline_files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+        timeline_files = self._timeline_files()
         
         for file_path in timeline_files:
             try:
                 file_stat = os.stat(file_path)
-                file_date = datetime.fromtimestamp(file_stat.st_mtime)
+                file_date = datetime.fromtimestamp(max(file_stat.st_atime, file_stat.st_mtime))
                 
-                if file_date < cutoff_date:
-                    os.remove(file_path)
+                if file_date < cutoff_date and not self.is_pinned(file_path, pins):
+                    self._remove_path(file_path)
                     deleted_count += 1
                     logging.info(f"Deleted old timeline: {file_path}")
             except Exception as e:
@@ -136,6 +184,7 @@ class StorageManager:
     
     def _cleanup_log_files(self) -> int:
         """Clean up old log files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
@@ -145,10 +194,10 @@ class StorageManager:
         for file_path in log_files:
             try:
                 file_stat = os.stat(file_path)
-                file_date = datetime.fromtimestamp(file_stat.st_mtime)
+                file_date = datetime.fromtimestamp(max(file_stat.st_atime, file_stat.st_mtime))
                 
-                if file_date < cutoff_date:
-                    os.remove(file_path)
+                if file_date < cutoff_date and not self.is_pinned(file_path, pins):
+                    self._remove_path(file_path)
                     deleted_count += 1
                     logging.info(f"Deleted old log: {file_path}")
             except Exception as e:
@@ -157,9 +206,8 @@ class StorageManager:
         return deleted_count
     
     def _calculate_space_freed(self) -> float:
-        """Calculate approximate space freed in MB"""
-        # This is a rough estimate - in production you'd want more precise tracking
-        return 0.0  # Placeholder for now
+        """Space freed in MB by the current cleanup run"""
+        return self._bytes_freed / (1024 * 1024)
     
     def get_storage_stats(self) -> Dict[str, any]:
         """Get current storage statistics"""
@@ -174,11 +222,11 @@ class StorageManager:
         
         try:
             # Count transcript files
-            transcript_files = glob.glob(os.path.join(self.transcripts_dir, "*.txt"))
+            transcript_files = self._transcript_files()
             stats['transcript_files'] = len(transcript_files)
             
             # Count timeline files
-            timeline_files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+            timeline_files = self._timeline_files()
             stats['timeline_files'] = len(timeline_files)
             
             # Count log files
@@ -227,7 +275,10 @@ class StorageManager:
         # 1. More than 100 total files
         # 2. Total size > 50MB
         # 3. Oldest file > 3 days
+        # 4. Total size above the LRU high-water mark (when a capacity is set)
         total_files = stats['transcript_files'] + stats['timeline_files'] + stats['log_files']
+        if self.capacity_mb and stats['total_size_mb'] > self.capacity_mb * self.high_water:
+            return True
         
         return (total_files > 100 or 
                 stats['total_size_mb'] > 50 or 
@@ -2,24 +2,38 @@ import os
 import json
 import logging
 import time
+import asyncio
 import requests
 from datetime import datetime
 from typing import List, Dict, Optional
 from urllib.parse import urlparse
 import re
+import sys
 import assemblyai as aai
 from dotenv import load_dotenv
 
 # FastAPI imports for API endpoint
 from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.responses import PlainTextResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import storage manager
 from storage_manager import StorageManager
 
+# Shared storage backend lives at the repo root (appended so the local
+# storage_manager above keeps precedence)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage_backend import get_storage_backend, TranscriptAttachBatcher
+from json_codec import JSONResponse
+import json_codec
+from transcription_jobs import TranscriptionJob, TranscriptionJobManager, count_pending_jobs
+from transcription_queue import TranscriptionPriorityQueue, transcription_priority, INTERACTIVE, BATCH
+from rate_limiter import TokenBucket
+from progress_journal import ProgressJournal
+from concurrent.futures import ThreadPoolExecutor
+
 load_dotenv()
 
 # Setup logging
@@ -57,55 +71,51 @@ TRANSCRIPTION_CONFIG = {
 # Processing configuration
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
-RATE_LIMIT_DELAY = 1.5  # seconds between requests
 REQUEST_TIMEOUT = 30  # seconds
 
+# Concurrent batch configuration
+BATCH_MAX_IN_FLIGHT = int(os.getenv('TRANSCRIBE_MAX_IN_FLIGHT', '20'))  # jobs queued/processing at the provider
+BATCH_REQUESTS_PER_SECOND = float(os.getenv('TRANSCRIBE_REQUESTS_PER_SECOND', '5'))  # provider API budget
+BATCH_BURST = int(os.getenv('TRANSCRIBE_BURST', '10'))
+BATCH_POLL_INTERVAL = 5  # seconds between polling rounds
+BATCH_POLL_WORKERS = 8  # status checks issued in parallel per round
+# Provider-side concurrency shared by the batch and the API. The batch always
+# leaves INTERACTIVE_RESERVE slots (plus whatever API jobs are pending) free.
+INTERACTIVE_RESERVE = int(os.getenv('TRANSCRIBE_INTERACTIVE_RESERVE', '4'))
+PROVIDER_CONCURRENCY = int(os.getenv('TRANSCRIBE_PROVIDER_CONCURRENCY', str(BATCH_MAX_IN_FLIGHT + INTERACTIVE_RESERVE)))
+
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
 
 class TranscriptionManager:
     def __init__(self):
-        self.progress = self.load_progress()
+        self.journal = ProgressJournal(PROGRESS_FILE)
         self.failed_urls = []
         self.successful_count = 0
         self.failed_count = 0
     
-    def load_progress(self) -> Dict:
-        """Load progress from previous runs"""
-        if os.path.exists(PROGRESS_FILE):
-            try:
-                with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.warning(f"Could not load progress file: {e}")
-        return {'completed_urls': [], 'failed_urls': []}
+    @property
+    def progress(self) -> Dict:
+        """Progress in the historical {'completed_urls': [...], 'failed_urls': [...]} shape"""
+        return self.journal.as_dict()
     
     def save_progress(self):
-        """Save current progress"""
+        """Save current progress as a snapshot (marks are journaled as they happen)"""
         try:
-            with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.progress, f, indent=2, ensure_ascii=False)
+            self.journal.snapshot()
         except Exception as e:
             logging.error(f"Could not save progress: {e}")
     
     def is_url_completed(self, audio_url: str) -> bool:
         """Check if URL was already successfully transcribed"""
-        return audio_url in self.progress.get('completed_urls', [])
+        return self.journal.contains('completed', audio_url)
     
     def mark_url_completed(self, audio_url: str):
         """Mark URL as successfully completed"""
-        if 'completed_urls' not in self.progress:
-            self.progress['completed_urls'] = []
-        if audio_url not in self.progress['completed_urls']:
-            self.progress['completed_urls'].append(audio_url)
-        self.save_progress()
+        self.journal.mark('completed', audio_url)
     
     def mark_url_failed(self, audio_url: str):
         """Mark URL as failed"""
-        if 'failed_urls' not in self.progress:
-            self.progress['failed_urls'] = []
-        if audio_url not in self.progress['failed_urls']:
-            self.progress['failed_urls'].append(audio_url)
-        self.save_progress()
+        self.journal.mark('failed', audio_url)
 
 # --- Utility to convert Plivo record_url to S3 URL ---
 def get_plivo_s3_url(record_url: str) -> str:
@@ -116,7 +126,7 @@ def get_plivo_s3_url(record_url: str) -> str:
     return f"https://plivo-assets-prod.s3.eu-west-1.amazonaws.com/voice/recordings/{recording_id}.wav"
 
 # --- FastAPI setup ---
-app = FastAPI()
+app = FastAPI(default_response_class=JSONResponse)
 
 # Enable CORS for frontend development and production
 app.add_middleware(
@@ -138,86 +148,136 @@ class TranscribeRequest(BaseModel):
     mobile_number: Optional[str] = None
     serial: Optional[int] = None
     call_id: Optional[int] = None  # <-- Add call_id for timeline update
+    wait: bool = False  # return the transcript text instead of a job handle
 
 # Utility to format utterances for diarization
 
 def format_utterances(utterances):
     return '\n'.join([f'Speaker {u.speaker}: {u.text}' for u in utterances])
 
-# Utility to append transcript to timeline JSON
-import json
+# Attachments completing together for the same lead are written in one go
+attach_batcher = TranscriptAttachBatcher()
+
+def reuse_transcript(audio_url):
+    """Stored transcript of a recording, recorded as accessed so LRU eviction keeps it"""
+    backend = get_storage_backend()
+    entry = backend.transcript_location(audio_url=audio_url)
+    if entry is None:
+        return None
+    storage_manager.touch(entry['location'])
+    return backend.find_transcript(audio_url=audio_url)
 
 def append_transcript_to_timeline(mobile_number, call_id, transcript_text):
-    # Use absolute path based on script location
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    timeline_path = os.path.join(base_dir, "data", f"timeline_{mobile_number}.json")
-    print(f"[DEBUG] Trying to update timeline: {timeline_path} for call_id: {call_id}")
+    backend = get_storage_backend()
+    timeline_path = backend.timeline_location(mobile_number)
+    logging.debug(f"Trying to update timeline for {mobile_number} ({backend.name} backend) for call_id: {call_id}")
     try:
-        if not os.path.exists(timeline_path):
-            print(f"[DEBUG] Timeline file does not exist: {timeline_path}")
+        if not backend.timeline_exists(mobile_number):
+            logging.debug(f"Timeline does not exist for {mobile_number}")
             return
-        with open(timeline_path, "r", encoding="utf-8") as f:
-            timeline = json.load(f)
-        updated = False
-        for event in timeline:
-            print(f"[DEBUG] Checking event: id={event.get('id')} type={event.get('type')}")
-            if event.get("type") == "call" and str(event.get("id")) == str(call_id):
-                print(f"[DEBUG] Match found for call_id {call_id}, updating transcript.")
-                event["transcript"] = transcript_text
-                updated = True
-                break
-        if updated:
-            with open(timeline_path, "w", encoding="utf-8") as f:
-                json.dump(timeline, f, indent=2, ensure_ascii=False)
-            print(f"[DEBUG] Timeline updated successfully for call_id {call_id}.")
+        storage_manager.touch(timeline_path)
+        if attach_batcher.attach(mobile_number, call_id, transcript_text):
+            logging.debug(f"Timeline updated successfully for call_id {call_id}.")
         else:
-            print(f"[DEBUG] No matching call event found in timeline for call_id {call_id}.")
+            logging.debug(f"No matching call event found in timeline for call_id {call_id}.")
     except Exception as e:
-        print(f"[DEBUG] Failed to update timeline: {e}")
+        logging.warning(f"Failed to update timeline for {mobile_number}: {e}")
+
+def complete_api_transcription(job: TranscriptionJob, transcript) -> str:
+    """Write a finished API transcription and attach it to the lead's timeline"""
+    # --- Diarization: use utterances if present ---
+    diarized_text = None
+    if hasattr(transcript, 'utterances') and transcript.utterances:
+        diarized_text = format_utterances(transcript.utterances)
+    transcript_text = diarized_text if diarized_text else transcript.text
+    # Save through the storage backend (.txt under data/transcripts for the file backend)
+    out_path = get_storage_backend().save_transcript(
+        job.mobile_number, job.serial, transcript_text, call_id=job.call_id, audio_url=job.audio_url)
+    logging.info(f"[API] Saved transcript text to {out_path}")
+    # --- Append transcript to timeline JSON ---
+    if job.mobile_number and job.call_id is not None:
+        append_transcript_to_timeline(job.mobile_number, job.call_id, transcript_text)
+    return transcript_text
 
-@app.post("/transcribe-call", response_class=PlainTextResponse)
-def transcribe_call_api(req: TranscribeRequest):
+job_manager = TranscriptionJobManager(TRANSCRIPTION_CONFIG, complete_api_transcription)
+
+@app.on_event("startup")
+async def start_transcription_poller():
+    job_manager.ensure_poller()
+
+def job_status(job: TranscriptionJob) -> Dict:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "mobile_number": job.mobile_number,
+        "call_id": job.call_id,
+        "error": job.error,
+        "transcript": job.transcript_text,
+        "status_url": f"/transcribe-call/{job.job_id}",
+    }
+
+@app.post("/transcribe-call")
+async def transcribe_call_api(req: TranscribeRequest):
+    """
+    Submit a call for transcription and return a job handle immediately (202).
+    Poll GET /transcribe-call/{job_id} for the result. With "wait": true the
+    response is the plain-text transcript, awaited without blocking a worker.
+    """
     try:
         # Check if cleanup is needed before processing
         if storage_manager.should_cleanup():
             logging.info("Storage cleanup needed, running cleanup...")
-            cleanup_stats = storage_manager.cleanup_old_files()
+            cleanup_stats = await asyncio.to_thread(storage_manager.cleanup_old_files)
             logging.info(f"Storage cleanup completed: {cleanup_stats}")
         
         s3_url = get_plivo_s3_url(req.record_url)
         mobile_number = req.mobile_number or "apiuser"
-        serial = req.serial or int(datetime.now().timestamp())
-        call_id = req.call_id
-        logging.info(f"[API] Transcribing Plivo call for {mobile_number} from {s3_url}")
-        # Transcribe
-        config = aai.TranscriptionConfig(**TRANSCRIPTION_CONFIG)
-        transcriber = aai.Transcriber(config=config)
-        transcript = transcriber.transcribe(s3_url)
-        while transcript.status in ['queued', 'processing']:
-            time.sleep(2)
-            transcript = transcriber.get_transcript(transcript.id)
-        if transcript.status == 'error':
-            raise RuntimeError(f"Transcription failed: {getattr(transcript, 'error', 'Unknown error')}")
-        if not transcript.text or transcript.text.strip() == "":
-            raise RuntimeError("Transcript is empty")
-        # --- Diarization: use utterances if present ---
-        diarized_text = None
-        if hasattr(transcript, 'utterances') and transcript.utterances:
-            diarized_text = format_utterances(transcript.utterances)
-        transcript_text = diarized_text if diarized_text else transcript.text
-        # Save as .txt for consistency
-        out_path = os.path.join(TRANSCRIPTS_DIR, f"{mobile_number}_{serial}.txt")
-        with open(out_path, 'w', encoding='utf-8') as f:
-            f.write(transcript_text)
-        logging.info(f"[API] Saved transcript text to {out_path}")
-        # --- Append transcript to timeline JSON ---
-        if mobile_number and call_id is not None:
-            append_transcript_to_timeline(mobile_number, call_id, transcript_text)
-        return transcript_text
+        cached = await asyncio.to_thread(reuse_transcript, s3_url)
+        if cached is not None:
+            logging.info(f"[API] Recording already transcribed, serving stored transcript for {s3_url}")
+            if req.call_id is not None:
+                await asyncio.to_thread(append_transcript_to_timeline, mobile_number, req.call_id, cached)
+            if req.wait:
+                return PlainTextResponse(cached)
+            return JSONResponse(status_code=200, content={
+                "job_id": None, "status": "completed", "mobile_number": mobile_number,
+                "call_id": req.call_id, "error": None, "transcript": cached, "status_url": None,
+            })
+        serial = req.serial or await asyncio.to_thread(get_next_serial, mobile_number)
+        logging.info(f"[API] Submitting Plivo call for {mobile_number} from {s3_url}")
+        job = await asyncio.to_thread(job_manager.submit, s3_url, mobile_number, serial, req.call_id)
+        job_manager.ensure_poller()
     except Exception as e:
-        logging.error(f"[API] Failed to transcribe: {e}")
+        logging.error(f"[API] Failed to submit transcription: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not req.wait:
+        return JSONResponse(status_code=202, content=job_status(job))
+    job = await job_manager.wait(job.job_id)
+    if not job.done:
+        # Still running after WAIT_TIMEOUT: hand back the job to poll instead of hanging
+        return JSONResponse(status_code=202, content=job_status(job))
+    if job.status != 'completed':
+        raise HTTPException(status_code=500, detail=job.error or f"Transcription {job.status}")
+    return PlainTextResponse(job.transcript_text)
+
+@app.get("/transcribe-call/{job_id}", response_class=JSONResponse)
+def transcribe_call_status(job_id: str):
+    """Status of a submitted transcription, including the transcript once completed"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown transcription job")
+    return job_status(job)
+
+@app.post("/transcribe-call/webhook", response_class=JSONResponse)
+async def transcribe_call_webhook(request: Request):
+    """AssemblyAI completion webhook (set TRANSCRIPTION_WEBHOOK_URL to enable)"""
+    payload = await request.json()
+    transcript_id = payload.get("transcript_id")
+    if not transcript_id:
+        raise HTTPException(status_code=400, detail="Missing transcript_id")
+    job = await asyncio.to_thread(job_manager.handle_webhook, transcript_id)
+    return {"job_id": transcript_id, "status": job.status if job else "unknown"}
 
 @app.get("/storage/stats", response_class=JSONResponse)
 def get_storage_stats():
@@ -242,8 +302,7 @@ def cleanup_storage():
 def load_calls_list(filename: str) -> List[Dict]:
     """Load calls list with validation"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            calls = json.load(f)
+        calls = json_codec.load_file(filename)
         
         if not isinstance(calls, list):
             raise ValueError("Input file must contain a JSON array")
@@ -311,118 +370,214 @@ def test_audio_url(audio_url: str) -> bool:
         return False
 
 def get_next_serial(mobile_number: str) -> int:
-    """Get next serial number for a mobile number"""
+    """Reserve the next serial number for a mobile number from the transcript index"""
     try:
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.startswith(f"{mobile_number}_") and f.endswith('.json')]
-        if not files:
-            return 1
-        
-        serials = []
-        for f in files:
-            try:
-                # Extract serial from filename like "mobile_123.json"
-                parts = f.replace('.json', '').split('_')
-                if len(parts) >= 2:
-                    serial = int(parts[1])
-                    serials.append(serial)
-            except (ValueError, IndexError):
-                continue
-        
-        return max(serials, default=0) + 1
+        return get_storage_backend().allocate_serial(mobile_number)
     except Exception as e:
         logging.error(f"Error getting serial number: {e}")
-        return 1
+        return int(datetime.now().timestamp())
 
 def is_already_transcribed(mobile_number: str, audio_url: str) -> bool:
-    """Check if this exact URL was already transcribed for this mobile number"""
+    """Check the transcript index for this recording (matched by Plivo recording ID)"""
     try:
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.startswith(f"{mobile_number}_") and f.endswith('.json')]
-        for file in files:
-            file_path = os.path.join(TRANSCRIPTS_DIR, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if data.get('metadata', {}).get('audio_url') == audio_url:
-                        logging.info(f"Already transcribed: {audio_url} for {mobile_number}")
-                        return True
-            except (json.JSONDecodeError, KeyError):
-                continue
+        entry = get_storage_backend().transcript_location(audio_url=audio_url)
+        if entry is not None:
+            logging.info(f"Already transcribed: {audio_url} for {mobile_number} ({entry['location']})")
+            return True
         return False
     except Exception as e:
         logging.error(f"Error checking if already transcribed: {e}")
         return False
 
-def transcribe_and_save(call: Dict, serial: int, manager: TranscriptionManager) -> bool:
-    """Transcribe audio and save with retry logic"""
-    mobile_number = str(call['mobile_number']).strip()
-    audio_url = call['audio_url'].strip()
-    
-    # Check if already completed
-    if manager.is_url_completed(audio_url):
-        logging.info(f"Skipping already completed: {audio_url}")
-        return True
-    
-    # Check if already transcribed locally
-    if is_already_transcribed(mobile_number, audio_url):
-        manager.mark_url_completed(audio_url)
+class BatchJobState:
+    """Per-call retry state for the concurrent batch"""
+
+    def __init__(self, call: Dict, serial: Optional[int] = None, priority: float = 0.0, lane: str = BATCH):
+        self.call = call
+        self.mobile_number = str(call['mobile_number']).strip()
+        self.audio_url = call['audio_url'].strip()
+        self.serial = serial
+        self.priority = priority
+        self.lane = lane
+        self.attempt = 0
+        self.not_before = 0.0
+        self.transcript_id: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+
+class BatchTranscriber:
+    """
+    Runs a backlog of calls with many jobs in flight at the provider.
+
+    Submissions and status checks share one token bucket so the provider's
+    request limit is respected no matter how many jobs are in flight. A
+    single poller checks every in-flight job each round (in parallel, rate
+    limited) instead of one sleep loop per call. Failed jobs are retried with
+    exponential backoff up to MAX_RETRIES.
+
+    Calls are taken from a priority queue rather than in input order: calls
+    shorter than TRANSCRIBE_MIN_DURATION are skipped, and recent, long calls
+    for leads with an open summary request go first. Calls marked
+    "interactive": true use a lane that is always served first. Batch work
+    never takes the last INTERACTIVE_RESERVE provider slots, and backs off
+    while API transcriptions are pending, so the API is never starved.
+    """
+
+    def __init__(self, manager: TranscriptionManager, max_in_flight: int = BATCH_MAX_IN_FLIGHT,
+                 limiter: Optional[TokenBucket] = None):
+        self.manager = manager
+        self.max_in_flight = max(1, max_in_flight)
+        self.limiter = limiter or TokenBucket(BATCH_REQUESTS_PER_SECOND, BATCH_BURST)
+        self.config = aai.TranscriptionConfig(**TRANSCRIPTION_CONFIG)
+        self.queue = TranscriptionPriorityQueue()
+        self.in_flight: Dict[str, BatchJobState] = {}
+        self.audio_seconds = 0.0
+        self.skipped_short = 0
+
+    def _retry_or_fail(self, state: BatchJobState, error: str):
+        state.last_error = error
+        state.transcript_id = None
+        state.attempt += 1
+        if state.attempt < MAX_RETRIES:
+            state.not_before = time.time() + RETRY_DELAY * (2 ** (state.attempt - 1))
+            logging.warning(f"Attempt {state.attempt} failed for {state.audio_url}: {error}; retrying")
+            self.queue.push(state, state.priority, state.lane, not_before=state.not_before)
+        else:
+            logging.error(f"All {MAX_RETRIES} attempts failed for {state.audio_url}: {error}")
+            self.manager.mark_url_failed(state.audio_url)
+            self.manager.failed_count += 1
+            self.manager.failed_urls.append(state.audio_url)
+
+    def _prepare(self, state: BatchJobState) -> bool:
+        """Skip work already done; returns False if the call should not be submitted"""
+        if self.manager.is_url_completed(state.audio_url):
+            logging.info(f"Skipping already completed: {state.audio_url}")
+            self.manager.successful_count += 1
+            return False
+        if is_already_transcribed(state.mobile_number, state.audio_url):
+            self.manager.mark_url_completed(state.audio_url)
+            self.manager.successful_count += 1
+            return False
+        if state.attempt == 0 and not test_audio_url(state.audio_url):
+            self.manager.mark_url_failed(state.audio_url)
+            self.manager.failed_count += 1
+            self.manager.failed_urls.append(state.audio_url)
+            return False
+        if state.serial is None:
+            # Allocated only for calls that will actually be transcribed
+            state.serial = get_next_serial(state.mobile_number)
         return True
-    
-    # Test audio URL accessibility
-    if not test_audio_url(audio_url):
-        manager.mark_url_failed(audio_url)
-        return False
-    
-    for attempt in range(MAX_RETRIES):
+
+    def _open_lanes(self, pending_api_jobs: int) -> tuple:
+        """Lanes allowed to submit right now given provider slots in use"""
+        free = PROVIDER_CONCURRENCY - pending_api_jobs - len(self.in_flight)
+        if free <= 0:
+            return ()
+        if free > INTERACTIVE_RESERVE and len(self.in_flight) < self.max_in_flight:
+            return (INTERACTIVE, BATCH)
+        return (INTERACTIVE,)
+
+    def _submit_ready(self):
+        pending_api_jobs = count_pending_jobs()
+        while True:
+            lanes = self._open_lanes(pending_api_jobs)
+            state = self.queue.pop(lanes) if lanes else None
+            if state is None:
+                break
+            if state.attempt == 0 and not self._prepare(state):
+                continue
+            self.limiter.acquire()
+            try:
+                transcript = aai.Transcriber(config=self.config).submit(state.audio_url)
+                state.transcript_id = transcript.id
+                self.in_flight[transcript.id] = state
+                logging.info(f"Submitted {state.audio_url} for {state.mobile_number} "
+                             f"(serial {state.serial}, attempt {state.attempt + 1}, in flight {len(self.in_flight)})")
+            except Exception as e:
+                self._retry_or_fail(state, str(e))
+
+    def _fetch(self, transcript_id: str):
+        self.limiter.acquire()
+        return aai.Transcript.get_by_id(transcript_id)
+
+    def _poll_round(self):
+        ids = list(self.in_flight)
+        with ThreadPoolExecutor(max_workers=BATCH_POLL_WORKERS) as executor:
+            results = list(executor.map(self._safe_fetch, ids))
+        for transcript_id, transcript in zip(ids, results):
+            if transcript is None:
+                continue  # transient status-check failure, try again next round
+            status = str(getattr(transcript.status, 'value', transcript.status))
+            if status in ('queued', 'processing'):
+                continue
+            state = self.in_flight.pop(transcript_id)
+            if status == 'error':
+                self._retry_or_fail(state, f"Transcription failed: {getattr(transcript, 'error', 'Unknown error')}")
+            elif not transcript.text or transcript.text.strip() == "":
+                self._retry_or_fail(state, "Transcript is empty")
+            else:
+                out_path = get_storage_backend().save_transcript(
+                    state.mobile_number, state.serial, transcript.text, audio_url=state.audio_url)
+                logging.info(f"Successfully saved transcript text to {out_path} (length: {len(transcript.text)} chars)")
+                self.audio_seconds += float(getattr(transcript, 'audio_duration', 0) or 0)
+                self.manager.mark_url_completed(state.audio_url)
+                self.manager.successful_count += 1
+
+    def _safe_fetch(self, transcript_id: str):
         try:
-            logging.info(f"Transcribing for {mobile_number} (serial {serial}, attempt {attempt + 1}): {audio_url}")
-            
-            # Create transcription config
-            config = aai.TranscriptionConfig(**TRANSCRIPTION_CONFIG)
-            transcriber = aai.Transcriber(config=config)
-            
-            # Start transcription
-            transcript = transcriber.transcribe(audio_url)
-            
-            # Wait for completion with status checks
-            while transcript.status in ['queued', 'processing']:
-                logging.info(f"Transcription status: {transcript.status}")
-                time.sleep(5)
-                # Refresh transcript status
-                transcript = transcriber.get_transcript(transcript.id)
-            
-            # Check final status
-            if transcript.status == 'error':
-                error_msg = getattr(transcript, 'error', 'Unknown error')
-                raise RuntimeError(f"Transcription failed: {error_msg}")
-            
-            if transcript.status != 'completed':
-                raise RuntimeError(f"Unexpected transcription status: {transcript.status}")
-            
-            # Verify transcript has content
-            if not transcript.text or transcript.text.strip() == "":
-                raise RuntimeError("Transcript is empty")
-            
-            # Save only the transcript text as .txt
-            out_path = os.path.join(TRANSCRIPTS_DIR, f"{mobile_number}_{serial}.txt")
-            with open(out_path, 'w', encoding='utf-8') as f:
-                f.write(transcript.text)
-            
-            logging.info(f"Successfully saved transcript text to {out_path} (length: {len(transcript.text)} chars)")
-            manager.mark_url_completed(audio_url)
-            return True
-            
+            return self._fetch(transcript_id)
         except Exception as e:
-            logging.warning(f"Attempt {attempt + 1} failed for {audio_url}: {e}")
-            if attempt < MAX_RETRIES - 1:
-                sleep_time = RETRY_DELAY * (2 ** attempt)  # Exponential backoff
-                logging.info(f"Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
+            logging.warning(f"Status check failed for {transcript_id}: {e}")
+            return None
+
+    def _summary_pending(self, mobile_number: str) -> bool:
+        """A summary is being generated for the lead right now (its timeline is pinned)"""
+        try:
+            return storage_manager.is_pinned(get_storage_backend().timeline_location(mobile_number))
+        except Exception:
+            return False
+
+    def enqueue(self, call: Dict) -> bool:
+        """Queue a call by priority; returns False if it is too short to transcribe"""
+        mobile_number = str(call['mobile_number']).strip()
+        summary_pending = bool(call.get('summary_requested')) or self._summary_pending(mobile_number)
+        priority = transcription_priority(call, summary_pending)
+        if priority is None:
+            logging.info(f"Skipping short call ({call.get('duration')}s): {call['audio_url']}")
+            self.skipped_short += 1
+            return False
+        lane = INTERACTIVE if call.get('interactive') else BATCH
+        self.queue.push(BatchJobState(call, priority=priority, lane=lane), priority, lane)
+        return True
+
+    def run(self, calls: List[Dict]) -> Dict[str, float]:
+        """Transcribe all calls and return throughput statistics"""
+        started = time.time()
+        for call in calls:
+            self.enqueue(call)
+        logging.info(f"Queued {len(self.queue)} calls {self.queue.lane_sizes()}, skipped {self.skipped_short} short calls")
+
+        while len(self.queue) or self.in_flight:
+            self._submit_ready()
+            if self.in_flight:
+                time.sleep(BATCH_POLL_INTERVAL)
+                self._poll_round()
+            elif not self.queue.has_ready():
+                # Only deferred retries left; wait for the earliest one
+                next_ready = self.queue.next_ready_at()
+                time.sleep(max(0.0, (next_ready or time.time()) - time.time()))
             else:
-                logging.error(f"All {MAX_RETRIES} attempts failed for {audio_url}")
-                manager.mark_url_failed(audio_url)
-                return False
-    
-    return False
+                # Provider slots are taken by API transcriptions; wait for them to drain
+                time.sleep(BATCH_POLL_INTERVAL)
+
+        elapsed = max(time.time() - started, 1e-6)
+        return {
+            'elapsed_seconds': elapsed,
+            'calls_per_minute': len(calls) * 60 / elapsed,
+            'audio_hours': self.audio_seconds / 3600,
+            'audio_hours_per_hour': self.audio_seconds / elapsed,
+            'skipped_short': self.skipped_short,
+        }
 
 def main():
     """Main transcription function"""
@@ -443,30 +598,10 @@ def main():
             logging.error("No valid calls to process")
             return
         
-        # Process each call
-        for i, call in enumerate(valid_calls, 1):
-            mobile_number = str(call['mobile_number']).strip()
-            audio_url = call['audio_url'].strip()
-            
-            logging.info(f"Processing call {i}/{len(valid_calls)} for {mobile_number}")
-            
-            # Get serial number
-            serial = get_next_serial(mobile_number)
-            
-            # Transcribe and save
-            success = transcribe_and_save(call, serial, manager)
-            
-            if success:
-                manager.successful_count += 1
-                logging.info(f"✓ Successfully processed {mobile_number} ({i}/{len(valid_calls)})")
-            else:
-                manager.failed_count += 1
-                manager.failed_urls.append(audio_url)
-                logging.error(f"✗ Failed to process {mobile_number} ({i}/{len(valid_calls)})")
-            
-            # Rate limiting
-            if i < len(valid_calls):  # Don't delay after last item
-                time.sleep(RATE_LIMIT_DELAY)
+        # Process calls concurrently, up to BATCH_MAX_IN_FLIGHT jobs at the provider
+        logging.info(f"Running batch with up to {BATCH_MAX_IN_FLIGHT} jobs in flight "
+                     f"at {BATCH_REQUESTS_PER_SECOND} requests/second")
+        throughput = BatchTranscriber(manager).run(valid_calls)
         
         # Final summary
         logging.info("=" * 60)
@@ -474,6 +609,10 @@ def main():
         logging.info(f"Total processed: {len(valid_calls)}")
         logging.info(f"Successful: {manager.successful_count}")
         logging.info(f"Failed: {manager.failed_count}")
+        logging.info(f"Skipped (shorter than minimum duration): {throughput['skipped_short']}")
+        logging.info(f"Elapsed: {throughput['elapsed_seconds']:.1f}s, "
+                     f"throughput: {throughput['calls_per_minute']:.1f} calls/min, "
+                     f"{throughput['audio_hours']:.2f} audio hours ({throughput['audio_hours_per_hour']:.1f}x realtime)")
         
         if manager.failed_urls:
             logging.info("Failed URLs:")
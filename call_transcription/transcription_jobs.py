@@ -0,0 +1,340 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Callable, Any
+
+import assemblyai as aai
+
+import json_codec  # repo root, put on sys.path by transcribe_calls
+
+JOBS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'transcription_jobs')
+
+# Poller configuration
+POLL_INTERVAL = 3  # seconds between polling rounds
+WEBHOOK_FALLBACK_POLL_INTERVAL = 60  # safety-net polling when webhooks deliver completions
+POLL_CONCURRENCY = 16  # status checks in flight at once
+JOB_RETENTION_SECONDS = 24 * 3600  # finished job records are kept this long
+PENDING_MARKER_TTL = 2 * 3600  # pending markers older than this are treated as abandoned
+# Pollers refresh the markers of their jobs every round; a marker left alone
+# this long belongs to a restarted or dead worker and its job is adopted
+JOB_ORPHAN_SECONDS = 5 * WEBHOOK_FALLBACK_POLL_INTERVAL
+WAIT_TIMEOUT = 15 * 60  # longest a wait=true request blocks before getting the job handle
+
+PENDING_STATUSES = ('queued', 'processing')
+
+
+class TranscriptionJob:
+    """State of one AssemblyAI transcription submitted through the API"""
+
+    def __init__(self, job_id: str, audio_url: str, mobile_number: str, serial: int,
+                 call_id: Optional[int] = None, status: str = 'queued', error: Optional[str] = None,
+                 transcript_text: Optional[str] = None, submitted_at: Optional[float] = None,
+                 completed_at: Optional[float] = None):
+        self.job_id = job_id
+        self.audio_url = audio_url
+        self.mobile_number = mobile_number
+        self.serial = serial
+        self.call_id = call_id
+        self.status = status
+        self.error = error
+        self.transcript_text = transcript_text
+        self.submitted_at = submitted_at or time.time()
+        self.completed_at = completed_at
+
+    @property
+    def done(self) -> bool:
+        return self.status not in PENDING_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TranscriptionJob':
+        return cls(**data)
+
+
+class TranscriptionJobManager:
+    """
+    Tracks submitted transcriptions without blocking a worker per call.
+
+    Jobs are submitted to AssemblyAI and returned immediately. Completion is
+    picked up either by the webhook receiver (when TRANSCRIPTION_WEBHOOK_URL
+    is set) or by a single asyncio poller that checks all pending jobs each
+    round with bounded concurrency. Job state is written to
+    data/transcription_jobs/<job_id>.json so any gunicorn worker can answer a
+    status request or a webhook for a job submitted by another worker.
+
+    Each unfinished job also has a pending/<job_id> marker that its poller
+    refreshes every round. Markers nobody refreshed for JOB_ORPHAN_SECONDS
+    (the worker restarted or died) are claimed by another poller, which
+    resumes polling the job, or removes the marker if the job is gone or
+    done.
+
+    Args:
+        config_kwargs: Keyword arguments for aai.TranscriptionConfig
+        on_complete: Called as on_complete(job, transcript) when a job
+            finishes successfully; returns the transcript text to store
+    """
+
+    def __init__(self, config_kwargs: Dict[str, Any],
+                 on_complete: Callable[[TranscriptionJob, Any], str],
+                 webhook_url: Optional[str] = None, jobs_dir: str = JOBS_DIR):
+        self.config_kwargs = config_kwargs
+        self.on_complete = on_complete
+        self.webhook_url = webhook_url if webhook_url is not None else os.getenv('TRANSCRIPTION_WEBHOOK_URL')
+        self.jobs_dir = jobs_dir
+        self.pending_dir = os.path.join(jobs_dir, 'pending')
+        self.jobs: Dict[str, TranscriptionJob] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        os.makedirs(self.pending_dir, exist_ok=True)
+
+    # --- Persistence ---
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _save(self, job: TranscriptionJob):
+        path = self._job_path(job.job_id)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json_codec.dumps_bytes(job.to_dict()))
+        os.replace(tmp, path)
+        # Empty marker per unfinished job, so other processes can count them cheaply
+        marker = os.path.join(self.pending_dir, job.job_id)
+        if job.done:
+            try:
+                os.remove(marker)
+            except OSError:
+                pass
+        else:
+            with open(marker, 'a'):
+                pass
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Look up a job, including jobs submitted by other workers"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.done:
+            return job
+        try:
+            stored = TranscriptionJob.from_dict(json_codec.load_file(self._job_path(job_id)))
+        except (OSError, ValueError):
+            return job
+        if job is None or stored.done:
+            return stored
+        return job
+
+    # --- Submission ---
+
+    def submit(self, audio_url: str, mobile_number: str, serial: int,
+               call_id: Optional[int] = None) -> TranscriptionJob:
+        """Submit a transcription and return immediately with its job handle"""
+        config = aai.TranscriptionConfig(**self.config_kwargs)
+        if self.webhook_url:
+            config.set_webhook(self.webhook_url)
+        transcript = aai.Transcriber(config=config).submit(audio_url)
+        job = TranscriptionJob(transcript.id, audio_url, mobile_number, serial, call_id,
+                               status=str(getattr(transcript.status, 'value', transcript.status)))
+        self.jobs[job.job_id] = job
+        self._save(job)
+        logging.info(f"[Jobs] Submitted transcription {job.job_id} for {mobile_number} ({audio_url})")
+        self.ensure_poller()
+        return job
+
+    async def wait(self, job_id: str, timeout: float = WAIT_TIMEOUT) -> Optional[TranscriptionJob]:
+        """
+        Await completion of a local job without holding a worker thread.
+        After timeout the job is returned as it is, possibly still pending.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return self.get(job_id)
+        self._loop = self._loop or asyncio.get_running_loop()
+        event = self._events.setdefault(job_id, asyncio.Event())
+        if job.done:
+            # Finished on a worker thread before the event was registered
+            self._events.pop(job_id, None)
+            return self.get(job_id)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[Jobs] Gave up waiting for {job_id} after {timeout}s")
+        return self.get(job_id)
+
+    # --- Completion ---
+
+    def _finish(self, job: TranscriptionJob, transcript) -> TranscriptionJob:
+        status = str(getattr(transcript.status, 'value', transcript.status))
+        try:
+            if status == 'error':
+                raise RuntimeError(f"Transcription failed: {getattr(transcript, 'error', 'Unknown error')}")
+            if not transcript.text or transcript.text.strip() == "":
+                raise RuntimeError("Transcript is empty")
+            job.transcript_text = self.on_complete(job, transcript)
+            job.status = 'completed'
+        except Exception as e:
+            job.status = 'error'
+            job.error = str(e)
+            logging.error(f"[Jobs] Transcription {job.job_id} failed: {e}")
+        job.completed_at = time.time()
+        self._save(job)
+        self._notify(job.job_id)
+        return job
+
+    def _notify(self, job_id: str):
+        """Wake local waiters; callable from the event loop or a worker thread"""
+        event = self._events.pop(job_id, None)
+        if event is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(event.set)
+
+    def handle_webhook(self, transcript_id: str) -> Optional[TranscriptionJob]:
+        """Finish a job when AssemblyAI calls the webhook; safe on any worker"""
+        job = self.get(transcript_id)
+        if job is None:
+            logging.warning(f"[Jobs] Webhook for unknown transcription {transcript_id}")
+            return None
+        if job.done:
+            return job
+        transcript = aai.Transcript.get_by_id(transcript_id)
+        if str(getattr(transcript.status, 'value', transcript.status)) in PENDING_STATUSES:
+            return job
+        self.jobs[job.job_id] = job
+        return self._finish(job, transcript)
+
+    # --- Polling ---
+
+    def ensure_poller(self):
+        """Start the background poller on the running event loop, once"""
+        if self._poller is not None and not self._poller.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet; started again from the startup hook
+        self._loop = loop
+        self._poller = loop.create_task(self._poll_forever())
+
+    async def _check(self, job: TranscriptionJob, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                transcript = await asyncio.to_thread(aai.Transcript.get_by_id, job.job_id)
+            except Exception as e:
+                logging.warning(f"[Jobs] Status check failed for {job.job_id}: {e}")
+                return
+            status = str(getattr(transcript.status, 'value', transcript.status))
+            if status in PENDING_STATUSES:
+                job.status = status
+                return
+            stored = self.get(job.job_id)
+            if stored is not None and stored.done:
+                # Another worker (webhook) already finished it
+                self.jobs[job.job_id] = stored
+                self._notify(job.job_id)
+                return
+            await asyncio.to_thread(self._finish, job, transcript)
+
+    async def _poll_forever(self):
+        semaphore = asyncio.Semaphore(POLL_CONCURRENCY)
+        interval = WEBHOOK_FALLBACK_POLL_INTERVAL if self.webhook_url else POLL_INTERVAL
+        while True:
+            try:
+                await asyncio.to_thread(self._adopt_orphans)
+            except Exception as e:
+                logging.warning(f"[Jobs] Orphaned job sweep failed: {e}")
+            pending = [job for job in self.jobs.values() if not job.done]
+            self._refresh_markers(pending)
+            if pending:
+                await asyncio.gather(*(self._check(job, semaphore) for job in pending))
+            self._forget_finished()
+            await asyncio.sleep(interval)
+
+    def _refresh_markers(self, jobs):
+        """Show other workers that these jobs still have a live poller"""
+        for job in jobs:
+            try:
+                os.utime(os.path.join(self.pending_dir, job.job_id))
+            except OSError:
+                pass
+
+    def _adopt_orphans(self) -> int:
+        """
+        Resume polling jobs whose pending marker went stale, e.g. after a
+        restart, and remove markers of jobs that are done or gone.
+
+        A stale marker is claimed by renaming it, which only one process can
+        do; the claimant then recreates it (fresh) if the job is resumed.
+
+        Returns:
+            Number of jobs adopted
+        """
+        cutoff = time.time() - JOB_ORPHAN_SECONDS
+        adopted = 0
+        try:
+            names = os.listdir(self.pending_dir)
+        except OSError:
+            return 0
+        for name in names:
+            if '.' in name or name in self.jobs:
+                continue  # claim in progress elsewhere, or ours
+            marker = os.path.join(self.pending_dir, name)
+            try:
+                if os.path.getmtime(marker) >= cutoff:
+                    continue
+                claim = f'{marker}.claim.{os.getpid()}'
+                os.rename(marker, claim)
+            except OSError:
+                continue  # gone, or another process claimed it first
+            try:
+                job = TranscriptionJob.from_dict(json_codec.load_file(self._job_path(name)))
+            except (OSError, ValueError, TypeError):
+                job = None
+            if job is not None and not job.done:
+                self.jobs[job.job_id] = job
+                self._save(job)  # recreates the marker
+                adopted += 1
+                logging.info(f"[Jobs] Resumed polling orphaned transcription {job.job_id}")
+            else:
+                logging.info(f"[Jobs] Removed stale pending marker {name}")
+            try:
+                os.remove(claim)
+            except OSError:
+                pass
+        return adopted
+
+    def _forget_finished(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j for j, job in self.jobs.items() if job.done and (job.completed_at or 0) < cutoff]:
+            self.jobs.pop(job_id, None)
+            try:
+                os.remove(self._job_path(job_id))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        in_flight = sum(1 for job in self.jobs.values() if not job.done)
+        return {'in_flight': in_flight, 'tracked': len(self.jobs)}
+
+
+def count_pending_jobs(jobs_dir: str = JOBS_DIR) -> int:
+    """
+    Interactive (API) transcriptions currently queued or processing, across
+    every worker and process sharing jobs_dir.
+    """
+    pending_dir = os.path.join(jobs_dir, 'pending')
+    cutoff = time.time() - PENDING_MARKER_TTL
+    count = 0
+    try:
+        with os.scandir(pending_dir) as entries:
+            for entry in entries:
+                if '.' in entry.name:
+                    continue  # marker being claimed by _adopt_orphans
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        count += 1
+                except OSError:
+                    continue
+    except FileNotFoundError:
+        return 0
+    return count
@@ -0,0 +1,131 @@
+import os
+import math
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Calls shorter than this (seconds) are skipped, or queued behind everything
+# else with TRANSCRIBE_SHORT_CALLS=defer. Missed and unanswered calls show up
+# with "duration": "0" and have nothing worth transcribing.
+MIN_TRANSCRIBE_DURATION = float(os.getenv('TRANSCRIBE_MIN_DURATION', '10'))
+SHORT_CALL_POLICY = os.getenv('TRANSCRIBE_SHORT_CALLS', 'skip').lower()
+RECENCY_HALF_LIFE_DAYS = 7.0
+SUMMARY_PENDING_BOOST = 100.0  # leads someone is waiting on go first
+DEFERRED_PRIORITY = -1.0
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+LANES = (INTERACTIVE, BATCH)
+
+
+def call_duration(call: Dict[str, Any]) -> Optional[float]:
+    """Call duration in seconds, or None when unknown"""
+    value = call.get('duration')
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def call_age_days(call: Dict[str, Any], now: Optional[float] = None) -> Optional[float]:
+    """Days since the call took place, or None when it has no timestamp"""
+    value = call.get('timestamp')
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return max(0.0, ((now or time.time()) - ts.timestamp()) / 86400)
+
+
+def transcription_priority(call: Dict[str, Any], summary_pending: bool = False,
+                           now: Optional[float] = None) -> Optional[float]:
+    """
+    Score a call for transcription; higher runs first.
+
+    Long calls score higher (log of the duration) and the score halves every
+    RECENCY_HALF_LIFE_DAYS of age. Calls for leads with an open summary
+    request get SUMMARY_PENDING_BOOST on top.
+
+    Returns:
+        The priority, or None if the call is too short to be worth transcribing
+    """
+    duration = call_duration(call)
+    if duration is not None and duration < MIN_TRANSCRIBE_DURATION:
+        return None if SHORT_CALL_POLICY == 'skip' else DEFERRED_PRIORITY
+    score = math.log1p(duration if duration is not None else 60.0)
+    age = call_age_days(call, now)
+    if age is not None:
+        score *= 0.5 ** (age / RECENCY_HALF_LIFE_DAYS)
+    if summary_pending:
+        score += SUMMARY_PENDING_BOOST
+    return score
+
+
+class TranscriptionPriorityQueue:
+    """
+    Two-lane priority queue of transcription work.
+
+    The interactive lane is always served before the batch lane, so a large
+    backfill can never delay a request someone is waiting on. Within a lane,
+    higher priority pops first and ties keep insertion order. Items pushed
+    with not_before (retries with backoff) stay out of both lanes until due.
+    """
+
+    def __init__(self):
+        self._ready: Dict[str, List[Tuple[float, int, Any]]] = {lane: [] for lane in LANES}
+        self._deferred: List[Tuple[float, int, str, float, Any]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, item: Any, priority: float = 0.0, lane: str = BATCH, not_before: float = 0.0):
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane}")
+        with self._lock:
+            seq = next(self._seq)
+            if not_before > time.time():
+                heapq.heappush(self._deferred, (not_before, seq, lane, priority, item))
+            else:
+                heapq.heappush(self._ready[lane], (-priority, seq, item))
+
+    def _promote_due(self, now: float):
+        while self._deferred and self._deferred[0][0] <= now:
+            _, seq, lane, priority, item = heapq.heappop(self._deferred)
+            heapq.heappush(self._ready[lane], (-priority, seq, item))
+
+    def pop(self, lanes: Tuple[str, ...] = LANES) -> Optional[Any]:
+        """Highest-priority ready item from the first non-empty lane, or None"""
+        with self._lock:
+            self._promote_due(time.time())
+            for lane in lanes:
+                if self._ready[lane]:
+                    return heapq.heappop(self._ready[lane])[2]
+            return None
+
+    def has_ready(self) -> bool:
+        with self._lock:
+            self._promote_due(time.time())
+            return any(self._ready[lane] for lane in LANES)
+
+    def next_ready_at(self) -> Optional[float]:
+        """When the earliest deferred item becomes due (None if nothing is deferred)"""
+        with self._lock:
+            return self._deferred[0][0] if self._deferred else None
+
+    def lane_sizes(self) -> Dict[str, int]:
+        with self._lock:
+            sizes = {lane: len(self._ready[lane]) for lane in LANES}
+            sizes['deferred'] = len(self._deferred)
+            return sizes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(heap) for heap in self._ready.values()) + len(self._deferred)
@@ -2,12 +2,17 @@ import yaml
 import redshift_connector
 import pandas as pd
 import os
+import sys
 import json
 from datetime import datetime
-import numpy as np
 from concurrent.futures import ThreadPoolExecutor
+import heapq
 import logging
 import traceback
+import json_codec
+from storage_backend import get_storage_backend, contact_key
+from timeline_transcription import transcribe_missing_calls
+from email_cleaning import pack_email_threads
 
 # Setup logging
 logging.basicConfig(
@@ -62,9 +67,13 @@ class Databaseconnect:
             raise
 
 def normalize_timestamp(ts):
-    """Convert various timestamp formats to ISO string format"""
+    """
+    Convert various timestamp formats to ISO string format. datetime and
+    pandas Timestamp values are formatted directly; only strings and other
+    types are parsed.
+    """
     try:
-        if ts is None:
+        if ts is None or (not isinstance(ts, str) and pd.isna(ts)):
             return None
         if isinstance(ts, str):
             return pd.to_datetime(ts).isoformat()
@@ -75,34 +84,94 @@ def normalize_timestamp(ts):
         logging.warning(f"Warning: Could not normalize timestamp {ts}: {e}")
         return str(ts) if ts is not None else None
 
-def make_json_serializable(obj):
-    """Convert pandas/numpy objects to JSON serializable formats"""
-    import datetime
-    if isinstance(obj, (pd.Timestamp, datetime.datetime)):
-        return obj.isoformat()
-    elif isinstance(obj, datetime.date):
-        return obj.isoformat()
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.bool_):
-        return bool(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif pd.isna(obj):
-        return None
-    else:
-        return obj
+def as_sorted_stream(events):
+    """
+    Order one channel's events by timestamp. Query results already come
+    sorted (WhatsApp ascending, mail and calls descending), so this is
+    usually a check plus a reversal rather than a sort.
+    """
+    keys = [e['timestamp'] for e in events]
+    if all(a <= b for a, b in zip(keys, keys[1:])):
+        return events
+    if all(a > b for a, b in zip(keys, keys[1:])):
+        return events[::-1]
+    return sorted(events, key=lambda e: e['timestamp'])
+
+def pack_whatsapp_events(events):
+    """Pack consecutive WhatsApp messages into whatsapp_pack events as they stream by"""
+    pack = []
+    for event in events:
+        if event['type'] == 'whatsapp':
+            pack.append(event)
+            continue
+        if pack:
+            yield {
+                'type': 'whatsapp_pack',
+                'start_timestamp': pack[0]['timestamp'],
+                'end_timestamp': pack[-1]['timestamp'],
+                'messages': pack
+            }
+            pack = []
+        yield event
+    if pack:
+        yield {
+            'type': 'whatsapp_pack',
+            'start_timestamp': pack[0]['timestamp'],
+            'end_timestamp': pack[-1]['timestamp'],
+            'messages': pack
+        }
+
+# Low-cardinality columns repeated on every row; interned so events share one copy
+INTERNED_FIELDS = ('sender_type', 'agent_number', 'customer_number', 'to_number', 'from_number',
+                   'sender_email', 'recipient_email', 'agent_email', 'student_email', 'direction',
+                   'source', 'status', 'message_type')
+
+def plain_record(record, skip=None):
+    """
+    A query row as plain JSON-ready values (see json_codec.to_jsonable),
+    without missing columns. Repeated string columns are interned.
+    """
+    plain = {}
+    for k, v in record.items():
+        if k == skip:
+            continue
+        v = json_codec.to_jsonable(v)
+        if v is None:
+            continue
+        if k in INTERNED_FIELDS and isinstance(v, str):
+            v = sys.intern(v)
+        plain[k] = v
+    return plain
 
-def clean_dataframe_for_json(df):
-    """Clean DataFrame to ensure all values are JSON serializable"""
-    df_clean = df.copy()
-    for col in df_clean.columns:
-        df_clean[col] = df_clean[col].apply(make_json_serializable)
-    return df_clean
+def rows_to_events(df, event_type, timestamp_column):
+    """
+    Turn query rows into timeline event dicts, skipping rows without a
+    timestamp. Reads the frame as plain records rather than building a
+    Series per row. The timestamp cell (usually already a Timestamp) is
+    formatted once, not turned into a string and parsed back.
+    """
+    events = []
+    for record in df.to_dict('records'):
+        timestamp = normalize_timestamp(record.get(timestamp_column))
+        if timestamp:
+            events.append({'type': event_type, 'timestamp': timestamp, **plain_record(record, timestamp_column)})
+    return events
 
-def consolidate_and_save_timeline(mobile_number=None, email=None):
+def consolidate_and_save_timeline(mobile_number=None, email=None, transcribe_calls=None):
+    """
+    Build a lead's timeline from Redshift and save it through the storage backend.
+
+    Args:
+        mobile_number: Lead phone number
+        email: Lead email (used when no mobile number is given)
+        transcribe_calls: Transcribe recorded calls that have no transcript
+            before saving; defaults to the TIMELINE_AUTO_TRANSCRIBE env var
+
+    Returns:
+        The saved events, or None if extraction failed
+    """
+    if transcribe_calls is None:
+        transcribe_calls = os.getenv('TIMELINE_AUTO_TRANSCRIBE', 'false').lower() in ('1', 'true', 'yes')
     if not mobile_number and not email:
         logging.error("Either mobile_number or email must be provided")
         return
@@ -267,115 +336,62 @@ def consolidate_and_save_timeline(mobile_number=None, email=None):
             }
             results = {key: future.result() for key, future in futures.items()}
 
-        whatsapp_df = clean_dataframe_for_json(results['whatsapp'])
-        mail_df = clean_dataframe_for_json(results['mail'])
-        call_df = clean_dataframe_for_json(results['call'])
-        lead_df = clean_dataframe_for_json(results['lead'])
+        whatsapp_df = results['whatsapp']
+        mail_df = results['mail']
+        call_df = results['call']
+        lead_df = results['lead']
         
         logging.info(f"Data summary - WhatsApp: {len(whatsapp_df)} rows, Mail: {len(mail_df)} rows, Call: {len(call_df)} rows, Lead: {len(lead_df)} rows")
 
-        # Build events list
-        events = []
-
-        # Process WhatsApp messages
-        for _, row in whatsapp_df.iterrows():
-            event = {
-                'type': 'whatsapp',
-                'timestamp': normalize_timestamp(row.get('created_at')),
-                **{k: v for k, v in row.dropna().to_dict().items() if k != 'created_at'}
-            }
-            if event['timestamp']:
-                events.append(event)
-
-        # Process email messages
-        for _, row in mail_df.iterrows():
-            event = {
-                'type': 'email',
-                'timestamp': normalize_timestamp(row.get('timestamp')),
-                **{k: v for k, v in row.dropna().to_dict().items() if k != 'timestamp'}
-            }
-            if event['timestamp']:
-                events.append(event)
-
-        # Process call records
-        for _, row in call_df.iterrows():
-            event = {
-                'type': 'call',
-                'timestamp': normalize_timestamp(row.get('timestamp')),
-                **{k: v for k, v in row.dropna().to_dict().items() if k != 'timestamp'}
-            }
-            if event['timestamp']:
-                events.append(event)
+        # Build one event stream per channel
+        whatsapp_events = rows_to_events(whatsapp_df, 'whatsapp', 'created_at')
+        # Raw bodies are stored; cleaning is applied to the prompt copy only
+        mail_events = rows_to_events(mail_df, 'email', 'timestamp')
+        call_events = rows_to_events(call_df, 'call', 'timestamp')
+        lead_events = []
 
         # Process lead information
         if not lead_df.empty:
-            lead_info = lead_df.iloc[0].dropna().to_dict()
+            lead_info = plain_record(lead_df.iloc[0].to_dict())
             lead_event = {
                 'type': 'lead_info',
                 'timestamp': normalize_timestamp(lead_info.get('move_in_date', datetime.now())),
                 **{k: v for k, v in lead_info.items() if k != 'move_in_date'}
             }
             if lead_event['timestamp']:
-                events.append(lead_event)
+                lead_events.append(lead_event)
 
-        # Filter out events without timestamps and sort
-        events = [e for e in events if e.get('timestamp')]
-        events.sort(key=lambda x: x['timestamp'])
-        
-        logging.info(f"Total events created: {len(events)}")
-        if events:
-            logging.info(f"Event types: {list(set(e.get('type', 'unknown') for e in events))}")
+        streams = [as_sorted_stream(s) for s in (whatsapp_events, mail_events, call_events, lead_events)]
+        total_events = sum(len(s) for s in streams)
+        logging.info(f"Total events created: {total_events}")
+        if total_events:
+            logging.info(f"Event types: {[s[0]['type'] for s in streams if s]}")
 
-        # Ensure all data is JSON serializable
-        for event in events:
-            for key, value in event.items():
-                event[key] = make_json_serializable(value)
+        # k-way merge of the sorted channel streams, packing WhatsApp runs and email threads in the same pass
+        merged = heapq.merge(*streams, key=lambda e: e['timestamp'])
+        events = list(pack_email_threads(pack_whatsapp_events(merged)))
 
-        # --- WhatsApp Pack Logic ---
-        packed_events = []
-        i = 0
-        while i < len(events):
-            if events[i]['type'] == 'whatsapp':
-                pack = [events[i]]
-                j = i + 1
-                while j < len(events) and events[j]['type'] == 'whatsapp':
-                    pack.append(events[j])
-                    j += 1
-                # Create a whatsapp_pack event
-                packed_events.append({
-                    'type': 'whatsapp_pack',
-                    'start_timestamp': pack[0]['timestamp'],
-                    'end_timestamp': pack[-1]['timestamp'],
-                    'messages': pack
-                })
-                i = j
-            else:
-                packed_events.append(events[i])
-                i += 1
-        events = packed_events
-        # --- End WhatsApp Pack Logic ---
+        contact_id = contact_key(mobile_number, email)
+
+        # Optional: fill in call transcripts (cached or freshly transcribed)
+        if transcribe_calls:
+            try:
+                transcribe_missing_calls(events, contact_id)
+            except Exception as e:
+                logging.error(f"Auto-transcription failed for {contact_id}: {e}\n{traceback.format_exc()}")
 
         # Create output directory and save
         os.makedirs('data', exist_ok=True)
         logging.info(f"Data directory created/verified: {os.path.abspath('data')}")
 
-        if mobile_number:
-            timeline_path = os.path.join('data', f'timeline_{mobile_number}.json')
-        elif email:
-            # Replace @ and . with _ for filename
-            email_safe = email.replace('@', '_').replace('.', '_')
-            timeline_path = os.path.join('data', f'timeline_{email_safe}.json')
-        else:
-            timeline_path = os.path.join('data', 'timeline_unknown.json')
-        
-        logging.info(f"Timeline will be saved to: {timeline_path}")
+        backend = get_storage_backend()
+        logging.info(f"Timeline will be saved for {contact_id} using the {backend.name} backend")
 
         try:
-            with open(timeline_path, 'w', encoding='utf-8') as f:
-                json.dump(events, f, indent=2, ensure_ascii=False)
-            logging.info(f"Timeline saved to {timeline_path} with {len(events)} events.")
+            backend.save_timeline(contact_id, events)
+            logging.info(f"Timeline saved for {contact_id} with {len(events)} events.")
         except Exception as e:
-            logging.error(f"Failed to save timeline to {timeline_path}: {e}\n{traceback.format_exc()}")
+            logging.error(f"Failed to save timeline for {contact_id}: {e}\n{traceback.format_exc()}")
 
         # Print summary
         event_types = {}
@@ -387,8 +403,10 @@ def consolidate_and_save_timeline(mobile_number=None, email=None):
         for event_type, count in event_types.items():
             logging.info(f"  {event_type}: {count} events")
         logging.info(f"Timeline extraction completed for: {mobile_number or email}")
+        return events
     except Exception as e:
         logging.critical(f"Timeline extraction failed: {e}\n{traceback.format_exc()}")
+        return None
 
 # Optional: Simple test function
 if __name__ == "__main__":
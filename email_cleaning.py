@@ -0,0 +1,288 @@
+"""
+Email preprocessing for timelines: consecutive messages of one thread
+packed into a single email_thread event, and for the prompt copy, plain
+text bodies without HTML, quoted history, signatures and disclaimers.
+
+    python email_cleaning.py    # tokens each stored lead would save
+"""
+import re
+import sys
+import html
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # regex fallback; install beautifulsoup4 (requirements.txt) for real HTML parsing
+    BeautifulSoup = None
+
+from token_counting import count_tokens
+
+_HTML_HINT = re.compile(r'<(?:html|body|div|p|br|table|span|a|font|blockquote)\b', re.IGNORECASE)
+# Containers mail clients put the quoted previous message in
+_QUOTE_SELECTORS = ('blockquote', 'div.gmail_quote', 'div.gmail_extra', 'div.yahoo_quoted',
+                    'div#divRplyFwdMsg', 'div#appendonsend', 'div.OutlookMessageHeader')
+_BLOCK_TAGS = re.compile(r'<\s*(?:br|/p|/div|/tr|/li|/h\d)\b[^>]*>', re.IGNORECASE)
+_BLOCK_NAMES = ('p', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+# Stands in for a line break while the source's own whitespace is collapsed
+_BREAK = '\ue000'
+_DROP_BLOCKS = re.compile(r'<(script|style|head|title)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+
+# First line of the quoted previous message; everything from it on is dropped
+_QUOTE_HEADER = re.compile(
+    r'^\s*(?:'
+    r'On\b[^\n]{0,200}(?:\n[^\n]{0,200})?\bwrote:\s*$'
+    r'|-{2,}\s*(?:Original Message|Forwarded message)\s*-{2,}'
+    r'|_{10,}\s*$'
+    r'|From:\s[^\n]+\n(?:[^\n]*\n){0,3}?\s*(?:Sent|Date):\s'
+    r')', re.IGNORECASE | re.MULTILINE)
+_SIGNATURE_DELIMITER = re.compile(r'^--\s*$', re.MULTILINE)
+_SIGN_OFF = re.compile(
+    r'^\s*(?:(?:best|kind|warm|warmest)\s+regards|regards|thanks?(?:\s+you)?(?:\s*(?:&|and)\s*regards)?'
+    r'|many thanks|cheers|sincerely|yours (?:sincerely|truly|faithfully))[\s,.!]*$', re.IGNORECASE)
+_MOBILE_FOOTER = re.compile(r'^\s*Sent from my \w+.*$|^\s*Get Outlook for \w+.*$', re.IGNORECASE | re.MULTILINE)
+_DISCLAIMER = re.compile(
+    r'this (?:e-?mail|message|communication)(?: and any (?:files|attachments?)[^.]{0,40})?'
+    r' (?:is|are|may be|contains?) (?:strictly )?(?:confidential|privileged|intended)'
+    r'|received this (?:e-?mail|message|communication) in error'
+    r'|^\s*disclaimer\b|\bunsubscribe\b|consider the environment before printing',
+    re.IGNORECASE | re.MULTILINE)
+# A sign-off starts the signature only when at most this many name and
+# contact lines follow it
+SIGNATURE_MAX_LINES = 6
+SIGNATURE_LINE_WORDS = 6
+SIGNATURE_LINE_CHARS = 80
+# Phone number, email address or link, e.g. "M: +44 7700 900123 | anna@agency.co.uk"
+_CONTACT = re.compile(r'\S+@\S+\.\w+|https?://\S+|www\.\S+|\+?\d[\d ()-]{6,}\d')
+# Lowercase words a name or job title may contain ("Head of Lettings", "Ana de Souza")
+_TITLE_CONNECTORS = {'of', 'and', 'for', 'at', 'the', 'in', 'de', 'da', 'van', 'von', 'der', 'le', 'la'}
+
+_SUBJECT_PREFIX = re.compile(r'^\s*(?:(?:re|fw|fwd|aw|sv|antw)\s*(?:\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+
+
+def html_to_text(content: str) -> str:
+    """Visible text of an HTML body, without the quoted previous message"""
+    if BeautifulSoup is not None:
+        soup = BeautifulSoup(content, 'html.parser')
+        for tag in soup(['script', 'style', 'head', 'title']):
+            tag.decompose()
+        for selector in _QUOTE_SELECTORS:
+            for tag in soup.select(selector):
+                tag.decompose()
+        # Line breaks only where blocks end, so inline markup (<b>, <a>) stays on its line
+        for tag in soup.find_all('br'):
+            tag.replace_with(_BREAK)
+        for tag in soup.find_all(_BLOCK_NAMES):
+            tag.append(_BREAK)
+        text = soup.get_text('')
+    else:
+        content = _DROP_BLOCKS.sub('', content)
+        content = re.sub(r'<blockquote\b.*?</blockquote\s*>', '', content, flags=re.IGNORECASE | re.DOTALL)
+        text = html.unescape(_TAG.sub('', _BLOCK_TAGS.sub(_BREAK, content)))
+    # Newlines in the HTML source are just spaces
+    text = re.sub(r'\s+', ' ', text)
+    return '\n'.join(line.strip() for line in text.split(_BREAK))
+
+
+def strip_quoted(text: str) -> str:
+    """Drop the quoted history of a reply: '>' lines and everything after a reply header"""
+    match = _QUOTE_HEADER.search(text)
+    if match:
+        text = text[:match.start()]
+    return '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith('>'))
+
+
+def _is_signature_line(line: str) -> bool:
+    """
+    A name, job title or contact line rather than a sentence of the message:
+    a phone number, address or link, or a few Title-Case words such as
+    "Anna Kowalska" or "Head of Lettings | Foo Estates".
+    """
+    line = line.strip()
+    if len(line) > SIGNATURE_LINE_CHARS:
+        return False
+    if _CONTACT.search(line):
+        return True
+    words = re.findall(r"[^\W\d_][\w'’.-]*", line)
+    if not words or len(words) > SIGNATURE_LINE_WORDS or line.endswith(('?', '!', ':')):
+        return False
+    return all(w[0].isupper() or w in _TITLE_CONNECTORS for w in words)
+
+
+def strip_signature(text: str) -> str:
+    """
+    Drop a '-- ' signature, or the closing sign-off with the name and
+    contact lines under it. Lines are scanned from the bottom, so a
+    "Thanks!" in the middle of the message never cuts what follows it.
+    """
+    match = _SIGNATURE_DELIMITER.search(text)
+    if match:
+        text = text[:match.start()]
+    text = _MOBILE_FOOTER.sub('', text)
+    lines = text.rstrip().split('\n')
+    content_lines = [i for i, line in enumerate(lines) if line.strip()]
+    for depth, i in enumerate(reversed(content_lines[1:])):
+        if _SIGN_OFF.match(lines[i]):
+            return '\n'.join(lines[:i])
+        if depth >= SIGNATURE_MAX_LINES or not _is_signature_line(lines[i]):
+            break
+    return '\n'.join(lines)
+
+
+def strip_disclaimers(text: str) -> str:
+    """Drop paragraphs that are legal disclaimers or unsubscribe footers"""
+    paragraphs = re.split(r'\n\s*\n', text)
+    return '\n\n'.join(p for p in paragraphs if not _DISCLAIMER.search(p))
+
+
+def clean_email_body(content: Optional[str]) -> str:
+    """
+    Plain text of what the sender actually wrote in one email: HTML turned
+    into text, then quoted history, signature, disclaimers and runs of
+    blank lines removed.
+    """
+    if not content:
+        return ''
+    text = str(content).replace('\r\n', '\n').replace('\r', '\n')
+    if _HTML_HINT.search(text):
+        text = html_to_text(text)
+    text = text.replace('\xa0', ' ')
+    text = strip_disclaimers(strip_signature(strip_quoted(text)))
+    lines = [line.rstrip() for line in text.split('\n')]
+    text = '\n'.join(lines)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def thread_key(subject: Optional[str]) -> Optional[str]:
+    """Subject without Re:/Fwd: prefixes, case and spacing, or None if empty"""
+    if not subject:
+        return None
+    key = ' '.join(_SUBJECT_PREFIX.sub('', str(subject)).split()).lower()
+    return key or None
+
+
+def _normalized(text: str) -> str:
+    return ' '.join(str(text).split()).rstrip('.… ')
+
+
+def clean_email_event(event: Dict[str, Any], body_field: str = 'message'):
+    """
+    Clean the body of one email event in place. The snippet stands in for an
+    empty body and is dropped when the cleaned body starts with it.
+    """
+    snippet = event.get('snippet')
+    cleaned = clean_email_body(event.get(body_field)) or clean_email_body(snippet)
+    event[body_field] = cleaned
+    if snippet and _normalized(cleaned).startswith(_normalized(snippet)[:60]):
+        del event['snippet']
+
+
+def clean_email_events(events: List[Dict[str, Any]], body_field: str = 'message') -> Dict[str, int]:
+    """
+    Clean the bodies of email events in place, see clean_email_event.
+
+    Returns:
+        Counts of emails and of tokens before and after cleaning
+    """
+    stats = {'emails': 0, 'tokens_before': 0, 'tokens_after': 0}
+    for event in events:
+        stats['emails'] += 1
+        stats['tokens_before'] += (count_tokens(str(event.get(body_field) or ''))
+                                   + count_tokens(str(event.get('snippet') or '')))
+        clean_email_event(event, body_field)
+        stats['tokens_after'] += count_tokens(event[body_field]) + count_tokens(str(event.get('snippet') or ''))
+    stats['tokens_removed'] = stats['tokens_before'] - stats['tokens_after']
+    return stats
+
+
+def clean_timeline_emails(timeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copy of a timeline with the body of every email, lone or in an
+    email_thread, cleaned for the prompts. The stored timeline keeps the
+    raw bodies, so a cleaning mistake never loses data.
+    """
+    out = []
+    for event in timeline:
+        if event.get('type') == 'email':
+            event = dict(event)
+            clean_email_event(event)
+        elif event.get('type') == 'email_thread':
+            messages = [dict(m) for m in event.get('messages') or []]
+            for message in messages:
+                clean_email_event(message)
+            event = {**event, 'messages': messages}
+        out.append(event)
+    return out
+
+
+def pack_email_threads(events: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Pack consecutive emails of the same thread (same subject without
+    Re:/Fwd:) into email_thread events as they stream by, the way
+    whatsapp_pack works for chats. Lone emails are passed through as is;
+    packed ones lose their subject, which the thread carries once.
+    """
+    thread: List[Dict[str, Any]] = []
+    current_key = None
+
+    def flush():
+        if len(thread) == 1:
+            return thread[0]
+        return {
+            'type': 'email_thread',
+            'start_timestamp': thread[0].get('timestamp'),
+            'end_timestamp': thread[-1].get('timestamp'),
+            'subject': thread[0].get('subject'),
+            'message_count': len(thread),
+            'messages': [{k: v for k, v in m.items() if k != 'subject'} for m in thread],
+        }
+
+    for event in events:
+        key = thread_key(event.get('subject')) if event.get('type') == 'email' else None
+        if thread and (key is None or key != current_key):
+            yield flush()
+            thread = []
+        if key is None:
+            yield event
+            continue
+        thread.append(event)
+        current_key = key
+    if thread:
+        yield flush()
+
+
+def email_report(timeline: List[Dict[str, Any]]) -> Dict[str, int]:
+    """What cleaning would save on a stored timeline, without changing it"""
+    emails = []
+    for event in timeline:
+        if event.get('type') == 'email':
+            emails.append(dict(event))
+        elif event.get('type') == 'email_thread':
+            emails.extend(dict(m) for m in event.get('messages', []))
+    stats = clean_email_events(emails)
+    stats['threads'] = sum(1 for event in timeline if event.get('type') == 'email_thread')
+    return stats
+
+
+def main():
+    from storage_backend import get_storage_backend
+    backend = get_storage_backend()
+    print(f"{'lead':<40} {'emails':>7} {'threads':>8} {'tokens before':>14} {'after':>9} {'removed':>9}")
+    totals = {'emails': 0, 'tokens_before': 0, 'tokens_after': 0}
+    for contact in sorted(backend.list_contacts()):
+        timeline = backend.load_timeline(contact) or []
+        stats = email_report(timeline)
+        if not stats['emails']:
+            continue
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"{contact:<40} {stats['emails']:>7} {stats['threads']:>8} {stats['tokens_before']:>14} "
+              f"{stats['tokens_after']:>9} {stats['tokens_removed']:>9}")
+    removed = totals['tokens_before'] - totals['tokens_after']
+    print(f"{'total':<40} {totals['emails']:>7} {'':>8} {totals['tokens_before']:>14} "
+          f"{totals['tokens_after']:>9} {removed:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,12 @@
 import datetime
+import heapq
 import re
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, TextIO
+
+import json_codec
+from email_cleaning import clean_email_body
+from message_dedup import collapse_repeats
 
 WHATSAPP_PATTERNS = re.compile(r"whatsapp|wa", re.IGNORECASE)
 CALL_PATTERNS = re.compile(r"call|phone", re.IGNORECASE)
@@ -9,201 +15,467 @@ SUMMARY_PATTERNS = re.compile(r"summary", re.IGNORECASE)
 
 # Helper to parse timestamps to datetime
 
-def parse_timestamp(ts):
-    if isinstance(ts, datetime.datetime):
-        return ts
-    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%d %H:%M", "%B %d, %Y, %I:%M %p"):
-        try:
-            return datetime.datetime.strptime(ts, fmt)
-        except Exception:
-            continue
+TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%d %H:%M", "%B %d, %Y, %I:%M %p")
+
+ISO_FORMAT = "iso"
+WHATSAPP_EXPORT_FORMAT = "%B %d, %Y, %I:%M %p"
+
+_MONTHS = {name.lower(): i for i, name in enumerate(
+    ("January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"), start=1)}
+_WHATSAPP_EXPORT_RE = re.compile(r"^([A-Za-z]+) (\d{1,2}), (\d{4}), (\d{1,2}):(\d{2}) ([AaPp][Mm])$")
+
+
+def _parse_iso(ts: str) -> datetime.datetime:
+    """ISO 8601 via fromisoformat; aware values are converted to naive UTC"""
+    if ts.endswith("Z"):
+        ts = ts[:-1]
+    value = datetime.datetime.fromisoformat(ts)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_whatsapp_export(ts: str) -> datetime.datetime:
+    """"February 12, 2025, 1:37 PM" without going through strptime"""
+    match = _WHATSAPP_EXPORT_RE.match(ts)
+    if not match:
+        raise ValueError(ts)
+    month, day, year, hour, minute, meridiem = match.groups()
+    hour = int(hour) % 12 + (12 if meridiem.upper() == "PM" else 0)
+    return datetime.datetime(int(year), _MONTHS[month.lower()], int(day), hour, int(minute))
+
+
+_FAST_PARSERS = {ISO_FORMAT: _parse_iso, WHATSAPP_EXPORT_FORMAT: _parse_whatsapp_export}
+
+
+class TimestampParser:
+    """
+    Parses the timestamp formats found across channels, remembering which
+    format each source uses so later values skip format detection.
+
+    ISO strings and the WhatsApp export format have dedicated fast paths;
+    the remaining formats fall back to strptime.
+    """
+
+    def __init__(self, formats=TIMESTAMP_FORMATS):
+        self.formats = formats
+        self._source_formats: Dict[str, str] = {}
+
+    def _parse_with(self, ts: str, fmt: str) -> datetime.datetime:
+        fast = _FAST_PARSERS.get(fmt)
+        return fast(ts) if fast else datetime.datetime.strptime(ts, fmt)
+
+    def _detect(self, ts: str) -> Optional[Tuple[str, datetime.datetime]]:
+        for fmt in (ISO_FORMAT, WHATSAPP_EXPORT_FORMAT) + tuple(self.formats):
+            try:
+                return fmt, self._parse_with(ts, fmt)
+            except (ValueError, TypeError, KeyError):
+                continue
+        return None
+
+    def parse(self, ts, source: Optional[str] = None) -> Optional[datetime.datetime]:
+        """Parse one timestamp; source (e.g. the channel) keys the format cache"""
+        if isinstance(ts, datetime.datetime):
+            return ts
+        if not isinstance(ts, str) or not ts:
+            return None
+        fmt = self._source_formats.get(source)
+        if fmt is not None:
+            try:
+                return self._parse_with(ts, fmt)
+            except (ValueError, TypeError, KeyError):
+                pass  # this value uses another format; detect again
+        detected = self._detect(ts)
+        if detected is None:
+            return None
+        fmt, value = detected
+        if source is not None:
+            self._source_formats[source] = fmt
+        return value
+
+    def parse_many(self, values: List[Any], source: Optional[str] = None) -> List[Optional[datetime.datetime]]:
+        """
+        Parse a whole channel's timestamps: the format is detected once and
+        applied to every value, falling back to per-value detection only for
+        values that don't match it.
+        """
+        fmt = self._source_formats.get(source) if source is not None else None
+        first = next((v for v in values if isinstance(v, str) and v), None)
+        if fmt is None and first is not None:
+            detected = self._detect(first)
+            if detected is not None:
+                fmt = detected[0]
+                if source is not None:
+                    self._source_formats[source] = fmt
+        if fmt is None:
+            return [self.parse(v, source) for v in values]
+        parse_fmt = _FAST_PARSERS.get(fmt) or (lambda ts: datetime.datetime.strptime(ts, fmt))
+        parsed = []
+        for value in values:
+            if isinstance(value, str) and value:
+                try:
+                    parsed.append(parse_fmt(value))
+                    continue
+                except (ValueError, TypeError, KeyError):
+                    pass
+            parsed.append(self.parse(value, source))
+        return parsed
+
+
+_default_parser = TimestampParser()
+
+
+def parse_timestamp(ts, source: Optional[str] = None):
+    """Parse a timestamp in any supported format (None if it matches none)"""
+    return _default_parser.parse(ts, source)
+
+
+def parse_timestamps(values: List[Any], source: Optional[str] = None) -> List[Optional[datetime.datetime]]:
+    """Bulk-parse one channel's timestamps"""
+    return _default_parser.parse_many(values, source)
+
+
+# Compact events
+
+DIRECTIONS = {"agent": "outbound", "customer": "inbound", "user": "inbound", "student": "inbound"}
+
+
+class TimelineEvent:
+    """
+    One WhatsApp message, call or email.
+
+    Slotted to keep per-event overhead low on long histories. The source row
+    is held once in raw; content is read from it on demand instead of being
+    copied. Sender and direction strings are interned, so the few distinct
+    values are shared by every event.
+    """
+    __slots__ = ("type", "timestamp", "parsed_timestamp", "direction", "sender", "raw", "_content")
+
+    def __init__(self, type: str, timestamp, raw, content: Optional[str] = None,
+                 parsed_timestamp: Optional[datetime.datetime] = None):
+        self.type = type
+        self.timestamp = timestamp
+        self.parsed_timestamp = parsed_timestamp
+        self.raw = raw
+        self._content = content
+        sender = raw.get("sender_type") if isinstance(raw, dict) else None
+        self.sender = sys.intern(sender) if isinstance(sender, str) else None
+        self.direction = DIRECTIONS.get(sender.lower()) if isinstance(sender, str) else None
+
+    @property
+    def source(self) -> str:
+        return self.type
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        return self.raw.get("content", self.raw.get("message_content", ""))
+
+    def to_dict(self, include_raw: bool = True) -> Dict[str, Any]:
+        """The timeline event dict format returned by consolidate_and_report"""
+        d = {"type": self.type, "timestamp": self.timestamp, "content": self.content, "source": self.source}
+        if include_raw:
+            d["raw"] = self.raw
+        return d
+
+    def to_json(self) -> str:
+        return json_codec.dumps(self.to_dict())
+
+
+class WhatsAppPack:
+    """
+    Consecutive WhatsApp messages forming one session. Keeps only the raw
+    rows and the session start; the joined content is built when asked for.
+    """
+    __slots__ = ("timestamp", "parsed_timestamp", "raw")
+    type = "whatsapp_pack"
+    source = "whatsapp"
+
+    def __init__(self, first: TimelineEvent):
+        self.timestamp = first.timestamp
+        self.parsed_timestamp = first.parsed_timestamp
+        self.raw = [first.raw]
+
+    def add(self, ev: TimelineEvent):
+        self.raw.append(ev.raw)
+
+    @property
+    def count(self) -> int:
+        return len(self.raw)
+
+    @property
+    def content(self) -> str:
+        return "\n".join([m.get("content", m.get("message_content", "")) for m in self.raw])
+
+    def to_dict(self, include_raw: bool = True) -> Dict[str, Any]:
+        d = {"type": self.type, "timestamp": self.timestamp, "content": self.content,
+             "source": self.source, "count": self.count}
+        if include_raw:
+            d["raw"] = self.raw
+        return d
+
+    def to_json(self) -> str:
+        return json_codec.dumps(self.to_dict())
+
+
+def iter_timeline_json(timeline: Iterable[Any]) -> Iterator[str]:
+    """Render timeline events as a JSON array chunk by chunk (e.g. for a StreamingResponse)"""
+    yield "["
+    first = True
+    for ev in timeline:
+        if not first:
+            yield ","
+        yield ev.to_json()
+        first = False
+    yield "]"
+
+
+# Channel extraction
+
+def _channel_of(key: str) -> Optional[str]:
+    """Channel of a raw_data key, or None for keys that are not conversation data"""
+    if SUMMARY_PATTERNS.search(key):
+        return None
+    if WHATSAPP_PATTERNS.search(key):
+        return "whatsapp"
+    if CALL_PATTERNS.search(key):
+        return "call"
+    if EMAIL_PATTERNS.search(key):
+        return "email"
     return None
 
-# Main consolidator
 
-def consolidate_and_report(raw_data: Dict[str, Any]) -> Dict[str, Any]:
-    events = []
+def _make_event(channel: str, item, parsed_timestamp: Optional[datetime.datetime] = None) -> Optional[TimelineEvent]:
+    if isinstance(item, dict):
+        return TimelineEvent(channel, item.get("timestamp") or item.get("created_at"), item,
+                             parsed_timestamp=parsed_timestamp)
+    # Plain-text call notes / emails (e.g. call_001.txt) have no timestamp
+    if channel != "whatsapp" and isinstance(item, str) and item.strip():
+        return TimelineEvent(channel, None, item, content=item.strip(), parsed_timestamp=parsed_timestamp)
+    return None
+
+
+def iter_channel_events(raw_data: Dict[str, Any]) -> Iterator[Tuple[str, TimelineEvent]]:
+    """Yield (channel, event) for every message, call and email in raw_data, unsorted"""
     for k, v in raw_data.items():
-        if SUMMARY_PATTERNS.search(k):
+        channel = _channel_of(k)
+        if channel is None:
             continue
-        # WhatsApp
-        if WHATSAPP_PATTERNS.search(k):
-            if isinstance(v, list):
-                for msg in v:
-                    ts = msg.get("timestamp") or msg.get("created_at")
-                    events.append({
-                        "type": "whatsapp",
-                        "timestamp": ts,
-                        "content": msg.get("content", msg.get("message_content", "")),
-                        "source": "whatsapp",
-                        "raw": msg
-                    })
-            elif isinstance(v, dict):
-                ts = v.get("timestamp") or v.get("created_at")
-                events.append({
-                    "type": "whatsapp",
-                    "timestamp": ts,
-                    "content": v.get("content", v.get("message_content", "")),
-                    "source": "whatsapp",
-                    "raw": v
-                })
-        # Calls
-        elif CALL_PATTERNS.search(k):
-            if isinstance(v, list):
-                for call in v:
-                    ts = call.get("timestamp") or call.get("created_at")
-                    events.append({
-                        "type": "call",
-                        "timestamp": ts,
-                        "content": call.get("content", call.get("message_content", call if isinstance(call, str) else "")),
-                        "source": "call",
-                        "raw": call
-                    })
-            elif isinstance(v, dict):
-                ts = v.get("timestamp") or v.get("created_at")
-                events.append({
-                    "type": "call",
-                    "timestamp": ts,
-                    "content": v.get("content", v.get("message_content", v if isinstance(v, str) else "")),
-                    "source": "call",
-                    "raw": v
-                })
-            elif isinstance(v, str) and v.strip():
-                events.append({
-                    "type": "call",
-                    "timestamp": None,
-                    "content": v.strip(),
-                    "source": "call",
-                    "raw": v
-                })
-        # Email
-        elif EMAIL_PATTERNS.search(k):
-            if isinstance(v, list):
-                for email in v:
-                    ts = email.get("timestamp") or email.get("created_at")
-                    events.append({
-                        "type": "email",
-                        "timestamp": ts,
-                        "content": email.get("content", email.get("message_content", email if isinstance(email, str) else "")),
-                        "source": "email",
-                        "raw": email
-                    })
-            elif isinstance(v, dict):
-                ts = v.get("timestamp") or v.get("created_at")
-                events.append({
-                    "type": "email",
-                    "timestamp": ts,
-                    "content": v.get("content", v.get("message_content", v if isinstance(v, str) else "")),
-                    "source": "email",
-                    "raw": v
-                })
-            elif isinstance(v, str) and v.strip():
-                events.append({
-                    "type": "email",
-                    "timestamp": None,
-                    "content": v.strip(),
-                    "source": "email",
-                    "raw": v
-                })
-    # Sort all events chronologically
-    def event_sort_key(ev):
-        ts = parse_timestamp(ev.get("timestamp", ""))
-        return ts or datetime.datetime.min
-    events = sorted(events, key=event_sort_key)
-
-    # Pack consecutive WhatsApp messages as a single session until the medium changes
-    timeline = []
-    whatsapp_pack = []
-    def flush_whatsapp_pack():
-        if whatsapp_pack:
-            session_start = whatsapp_pack[0].get("timestamp")
-            content = "\n".join([m.get("content", "") for m in whatsapp_pack])
-            timeline.append({
-                "type": "whatsapp_pack",
-                "timestamp": session_start,
-                "content": content,
-                "source": "whatsapp",
-                "count": len(whatsapp_pack),
-                "raw": [m["raw"] for m in whatsapp_pack]
-            })
-            whatsapp_pack.clear()
+        items = v if isinstance(v, list) else [v]
+        for item in items:
+            event = _make_event(channel, item)
+            if event is not None:
+                yield channel, event
+
+
+def _sort_key(ev: TimelineEvent) -> datetime.datetime:
+    return ev.parsed_timestamp or datetime.datetime.min
+
+
+def _sorted_stream(channel: str, items: List[Any]) -> Iterator[TimelineEvent]:
+    """
+    One raw_data entry as a chronologically ordered event stream.
+
+    Exports and queries are usually already in order (ascending, or
+    descending for mail and calls), which is detected from the parsed
+    timestamps; anything else is sorted for this stream only. Events are
+    built lazily as the merge consumes them.
+    """
+    items = [item for item in items if isinstance(item, dict)
+             or (channel != "whatsapp" and isinstance(item, str) and item.strip())]
+    stamps = parse_timestamps([item.get("timestamp") or item.get("created_at") if isinstance(item, dict) else None
+                               for item in items], channel)
+    keys = [ts or datetime.datetime.min for ts in stamps]
+    if all(a <= b for a, b in zip(keys, keys[1:])):
+        order = range(len(items))
+    elif all(a > b for a, b in zip(keys, keys[1:])):
+        order = range(len(items) - 1, -1, -1)
+    else:
+        order = sorted(range(len(items)), key=keys.__getitem__)
+    for i in order:
+        yield _make_event(channel, items[i], stamps[i])
+
+
+def merge_sorted_streams(streams: List[Iterable[TimelineEvent]]) -> Iterator[TimelineEvent]:
+    """
+    Heap-based k-way merge of chronologically sorted event streams, O(n log k).
+    Ties keep stream order, matching a stable sort over the concatenation.
+    """
+    return heapq.merge(*streams, key=_sort_key)
+
+
+def iter_sorted_events(raw_data: Dict[str, Any]) -> Iterator[TimelineEvent]:
+    """All events in chronological order, each with its parsed_timestamp"""
+    streams = []
+    for k, v in raw_data.items():
+        channel = _channel_of(k)
+        if channel is not None:
+            streams.append(_sorted_stream(channel, v if isinstance(v, list) else [v]))
+    return merge_sorted_streams(streams)
+
+
+# Timeline packing
+
+def pack_whatsapp(events: Iterable[TimelineEvent]) -> Iterator[Any]:
+    """
+    Pack consecutive WhatsApp messages as a single session until the medium
+    changes. Only the current session is held in memory.
+    """
+    whatsapp_pack: Optional[WhatsAppPack] = None
     for ev in events:
-        if ev["type"] == "whatsapp":
-            whatsapp_pack.append(ev)
-        else:
-            flush_whatsapp_pack()
-            timeline.append({
-                "type": ev["type"],
-                "timestamp": ev.get("timestamp"),
-                "content": ev.get("content", ""),
-                "source": ev.get("source", ""),
-                "raw": ev.get("raw")
-            })
-    flush_whatsapp_pack()
-
-    # Count totals
-    total_calls = sum(1 for ev in timeline if ev["type"] == "call")
-    total_emails = sum(1 for ev in timeline if ev["type"] == "email")
-    total_whatsapp_packs = sum(1 for ev in timeline if ev["type"] == "whatsapp_pack")
-
-    # Preprocess for LLM: build llm_timeline with rich content, no raw
-    llm_timeline = []
-    llm_lines = []
+        if ev.type == "whatsapp":
+            if whatsapp_pack is None:
+                whatsapp_pack = WhatsAppPack(ev)
+            else:
+                whatsapp_pack.add(ev)
+            continue
+        if whatsapp_pack is not None:
+            yield whatsapp_pack
+            whatsapp_pack = None
+        yield ev
+    if whatsapp_pack is not None:
+        yield whatsapp_pack
+
+
+def iter_timeline(raw_data: Dict[str, Any]) -> Iterator[Any]:
+    """
+    Yield packed timeline events (TimelineEvent / WhatsAppPack) in
+    chronological order. Merging and WhatsApp packing happen in a single
+    streaming pass.
+    """
+    return pack_whatsapp(iter_sorted_events(raw_data))
+
+
+# LLM views
+
+def _email_content(raw) -> str:
+    """Subject, snippet and cleaned body of an email, from its raw row"""
+    subject = raw.get("subject", "") if isinstance(raw, dict) else ""
+    snippet = raw.get("snippet", "") if isinstance(raw, dict) else ""
+    body = ""
+    if isinstance(raw, dict):
+        raw_data = raw.get("raw_data")
+        if raw_data:
+            try:
+                if isinstance(raw_data, str):
+                    parsed = json_codec.loads(raw_data)
+                    body = parsed.get("content", "") or parsed.get("snippet", "")
+                    if not snippet:
+                        snippet = parsed.get("snippet", "")
+                elif isinstance(raw_data, dict):
+                    body = raw_data.get("content", "") or raw_data.get("snippet", "")
+                    if not snippet:
+                        snippet = raw_data.get("snippet", "")
+            except Exception:
+                if isinstance(raw_data, str):
+                    body = raw_data
+        elif raw.get("raw_data") and not body:
+            body = str(raw.get("raw_data"))
+    body = clean_email_body(body)
+    if snippet and " ".join(body.split()).startswith(" ".join(str(snippet).split())[:60]):
+        snippet = ""  # the body starts with it already
+    return "\n".join([x for x in [subject, snippet, body] if x])
+
+
+def llm_content(ev) -> str:
+    """Content-rich text of a timeline event for LLM input"""
+    if ev.type == "whatsapp_pack":
+        # Repeats within one sender's run become a single line with a count
+        kept = collapse_repeats(ev.raw, lambda m: m.get("message_content", m.get("content", "")))
+        return "\n".join([m.get("message_content", m.get("content", "")) + (f" (x{count})" if count > 1 else "")
+                          for m, count, _ in kept])
+    raw = ev.raw
+    if not raw:
+        return ev.content
+    if ev.type == "email":
+        return _email_content(raw)
+    if ev.type == "call":
+        if isinstance(raw, dict):
+            return raw.get("transcription", raw.get("content", ""))
+        if isinstance(raw, str):
+            return raw
+    return ev.content
+
+
+def llm_line(ev, content: Optional[str] = None) -> str:
+    """Minimal metadata line: [timestamp] [CHANNEL] content"""
+    if content is None:
+        content = llm_content(ev)
+    channel = ev.type.replace("_pack", "").upper()
+    return f"[{ev.timestamp or ''}] [{channel}] {content}".strip()
+
+
+def iter_llm_lines(timeline: Iterable[Any]) -> Iterator[str]:
+    """Yield one LLM line per timeline event"""
     for ev in timeline:
-        rich_content = ev.get("content", "")
-        channel = ev["type"].replace("_pack", "").upper()
-        ts = ev.get("timestamp") or ""
-        # For emails, try to extract subject, snippet, and body from raw
-        if ev["type"] == "email" and ev.get("raw"):
-            raw = ev["raw"]
-            subject = raw.get("subject", "") if isinstance(raw, dict) else ""
-            snippet = raw.get("snippet", "") if isinstance(raw, dict) else ""
-            body = ""
-            if isinstance(raw, dict):
-                raw_data = raw.get("raw_data")
-                if raw_data:
-                    try:
-                        import json as _json
-                        if isinstance(raw_data, str):
-                            parsed = _json.loads(raw_data)
-                            body = parsed.get("content", "") or parsed.get("snippet", "")
-                            if not snippet:
-                                snippet = parsed.get("snippet", "")
-                        elif isinstance(raw_data, dict):
-                            body = raw_data.get("content", "") or raw_data.get("snippet", "")
-                            if not snippet:
-                                snippet = raw_data.get("snippet", "")
-                    except Exception:
-                        if isinstance(raw_data, str):
-                            body = raw_data
-                elif raw.get("raw_data") and not body:
-                    body = str(raw.get("raw_data"))
-            rich_content = "\n".join([x for x in [subject, snippet, body] if x])
-        elif ev["type"] == "whatsapp_pack" and ev.get("raw"):
-            msgs = ev["raw"]
-            if isinstance(msgs, list):
-                rich_content = "\n".join([m.get("message_content", m.get("content", "")) for m in msgs if isinstance(m, dict)])
-        elif ev["type"] == "call" and ev.get("raw"):
-            raw = ev["raw"]
-            if isinstance(raw, dict):
-                rich_content = raw.get("transcription", raw.get("content", ""))
-            elif isinstance(raw, str):
-                rich_content = raw
-        llm_timeline.append({
-            k: v for k, v in ev.items() if k not in ("raw",)
-        } | {"content": rich_content})
-        # Compose minimal metadata line
-        line = f"[{ts}] [{channel}] {rich_content}".strip()
-        llm_lines.append(line)
-    llm_text = "\n".join(llm_lines)
-
-    return {
-        "timeline": timeline,         # full, with raw, for incremental logic
-        "llm_timeline": llm_timeline, # content-rich, for LLM input (if needed)
-        "llm_text": llm_text,         # minimal metadata, content-rich, for LLM summarization
-        "counts": {
-            "calls": total_calls,
-            "emails": total_emails,
-            "whatsapp_packs": total_whatsapp_packs
-        }
-    } 
\ No newline at end of file
+        yield llm_line(ev)
+
+
+def write_llm_text(raw_data: Dict[str, Any], out: TextIO) -> Dict[str, int]:
+    """
+    Stream llm_text for a lead straight into a file or socket wrapper
+    without building the timeline in memory.
+
+    Returns:
+        The counts dict of consolidate_and_report
+    """
+    counts = {"calls": 0, "emails": 0, "whatsapp_packs": 0}
+    first = True
+    for ev in iter_timeline(raw_data):
+        _count(counts, ev)
+        if not first:
+            out.write("\n")
+        out.write(llm_line(ev))
+        first = False
+    return counts
+
+
+def _count(counts: Dict[str, int], ev):
+    key = {"call": "calls", "email": "emails", "whatsapp_pack": "whatsapp_packs"}.get(ev.type)
+    if key:
+        counts[key] += 1
+
+
+# Main consolidator
+
+ALL_OUTPUTS = ("timeline", "llm_timeline", "llm_text", "counts")
+
+
+def consolidate_and_report(raw_data: Dict[str, Any], outputs: Tuple[str, ...] = ALL_OUTPUTS,
+                           compact: bool = False) -> Dict[str, Any]:
+    """
+    Consolidate a lead's channels into one timeline plus LLM-ready views.
+
+    Built on the streaming helpers above; pass outputs to build only what
+    the caller needs (e.g. ("llm_text", "counts")). With compact=True the
+    timeline holds TimelineEvent / WhatsAppPack objects instead of dicts
+    (render them with to_dict() / to_json() or iter_timeline_json()).
+    """
+    want_timeline = "timeline" in outputs
+    want_llm_timeline = "llm_timeline" in outputs
+    want_llm_text = "llm_text" in outputs
+    timeline, llm_timeline, llm_lines = [], [], []
+    counts = {"calls": 0, "emails": 0, "whatsapp_packs": 0}
+    for ev in iter_timeline(raw_data):
+        _count(counts, ev)
+        if want_timeline:
+            timeline.append(ev if compact else ev.to_dict())
+        if want_llm_timeline or want_llm_text:
+            rich_content = llm_content(ev)
+            if want_llm_timeline:
+                llm_timeline.append(ev.to_dict(include_raw=False) | {"content": rich_content})
+            if want_llm_text:
+                llm_lines.append(llm_line(ev, rich_content))
+
+    result: Dict[str, Any] = {}
+    if want_timeline:
+        result["timeline"] = timeline          # full, with raw, for incremental logic
+    if want_llm_timeline:
+        result["llm_timeline"] = llm_timeline  # content-rich, for LLM input (if needed)
+    if want_llm_text:
+        result["llm_text"] = "\n".join(llm_lines)  # minimal metadata, content-rich, for LLM summarization
+    if "counts" in outputs:
+        result["counts"] = counts
+    return result
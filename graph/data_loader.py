@@ -1,70 +1,239 @@
 import os
-import json
-from typing import Dict, Any
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import json_codec
+from graph.data_consolidator import TIMESTAMP_FORMATS, TimestampParser, _channel_of
+
+SKIP_FILES = ("summary_store.json", ".DS_Store")
+PARALLEL_THRESHOLD = 1024 * 1024  # files at least this big are decoded in the thread pool
+LOADER_WORKERS = int(os.getenv("DATA_LOADER_WORKERS", "4"))
+
+# Plain-text call notes start with "Date & Time: 2/15/2025 8:02:00"
+CALL_NOTE_DATE = re.compile(r"^\s*Date\s*&\s*Time:\s*(.+?)\s*$", re.MULTILINE)
+CALL_NOTE_FORMATS = ("%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M:%S")
+
+_parser = TimestampParser(TIMESTAMP_FORMATS + CALL_NOTE_FORMATS)
+
+
+class _CachedFile:
+    """Parsed content of one file plus what is needed to tell whether it changed"""
+    __slots__ = ("mtime_ns", "size", "digest", "parsed", "stamps")
+
+    def __init__(self, mtime_ns: int, size: int, digest: str, parsed):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.parsed = parsed
+        self.stamps = None  # parsed record timestamps, filled on first filter
+
+
+# Shared by every DataLoader in the process, keyed by file path
+_file_cache: Dict[str, _CachedFile] = {}
+_cache_lock = threading.Lock()
+
+
+def _record_timestamp(record) -> Any:
+    if isinstance(record, dict):
+        return record.get("timestamp") or record.get("created_at")
+    if isinstance(record, str):
+        match = CALL_NOTE_DATE.search(record)
+        return match.group(1) if match else None
+    return None
+
 
 class DataLoader:
-    def __init__(self, lead_id: str, data_dir: str = "data"):
+    """
+    Loads a lead's channel files from data/<lead_id>/, incrementally.
+
+    Each file's mtime, size and content hash are remembered across calls
+    (and across loaders for the same directory), so unchanged files are
+    never re-read and files that were touched but not modified are not
+    re-parsed. Loads return only records newer than the last_processed
+    watermark of their channel ("whatsapp", "calls", "email"); pass the
+    result of advance_watermarks back in on the next run. Large files are
+    decoded in parallel through json_codec.
+    """
+
+    def __init__(self, lead_id: str, data_dir: str = "data", max_workers: int = LOADER_WORKERS):
         self.lead_id = lead_id
         self.data_dir = data_dir
         self.lead_path = os.path.join(data_dir, lead_id)
+        self.max_workers = max_workers
+        self.stats = {"unchanged": 0, "rehashed": 0, "parsed": 0}
+
+    # --- File cache ---
+
+    def _list_files(self) -> List[str]:
+        if not os.path.isdir(self.lead_path):
+            return []
+        return sorted(f for f in os.listdir(self.lead_path) if f not in SKIP_FILES)
+
+    def _read(self, fname: str, st: os.stat_result) -> Optional[_CachedFile]:
+        fpath = os.path.join(self.lead_path, fname)
+        with open(fpath, "rb") as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        cached = _file_cache.get(fpath)
+        if cached is not None and cached.digest == digest:
+            # Touched but not modified: keep the parsed content
+            self.stats["rehashed"] += 1
+            return _CachedFile(st.st_mtime_ns, st.st_size, digest, cached.parsed)
+        self.stats["parsed"] += 1
+        if fname.endswith(".json"):
+            parsed = json_codec.loads(data)
+        else:
+            parsed = data.decode("utf-8", errors="replace")
+        return _CachedFile(st.st_mtime_ns, st.st_size, digest, parsed)
+
+    def _load_files(self, fnames: List[str]) -> Dict[str, Optional[_CachedFile]]:
+        """Cached entries for fnames, re-reading only files whose mtime or size changed"""
+        entries: Dict[str, Optional[_CachedFile]] = {}
+        stale = []
+        for fname in fnames:
+            fpath = os.path.join(self.lead_path, fname)
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                continue
+            cached = _file_cache.get(fpath)
+            if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                self.stats["unchanged"] += 1
+                entries[fname] = cached
+            else:
+                stale.append((fname, st))
+
+        def load(item):
+            fname, st = item
+            try:
+                return fname, self._read(fname, st)
+            except Exception as e:
+                print(f"Error loading file {os.path.join(self.lead_path, fname)}: {e}")
+                return fname, None
+
+        large = [item for item in stale if item[1].st_size >= PARALLEL_THRESHOLD]
+        small = [item for item in stale if item[1].st_size < PARALLEL_THRESHOLD]
+        results = [load(item) for item in small]
+        if len(large) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(large))) as executor:
+                results.extend(executor.map(load, large))
+        else:
+            results.extend(load(item) for item in large)
+
+        with _cache_lock:
+            for fname, entry in results:
+                fpath = os.path.join(self.lead_path, fname)
+                if entry is None:
+                    _file_cache.pop(fpath, None)
+                else:
+                    _file_cache[fpath] = entry
+                entries[fname] = entry
+        return entries
+
+    # --- Watermarks ---
+
+    @staticmethod
+    def _newer_than(entry: _CachedFile, channel: str, watermark: Optional[str]):
+        """Records of a cached file newer than watermark (all of them when there is none)"""
+        parsed = entry.parsed
+        records = parsed if isinstance(parsed, list) else [parsed]
+        if not watermark:
+            return parsed
+        mark = _parser.parse(watermark)
+        if mark is None:
+            return parsed
+        if entry.stamps is None:
+            entry.stamps = _parser.parse_many([_record_timestamp(r) for r in records], channel)
+        newer = [r for r, ts in zip(records, entry.stamps) if ts is not None and ts > mark]
+        if isinstance(parsed, list):
+            return newer
+        return newer[0] if newer else None
+
+    def _load_channel(self, channel: str, last_processed: Dict[str, str]) -> List[Any]:
+        fnames = [f for f in self._list_files() if _channel_of(os.path.splitext(f)[0]) == channel]
+        records = []
+        for fname, entry in self._load_files(fnames).items():
+            if entry is None:
+                continue
+            newer = self._newer_than(entry, channel, last_processed.get(_watermark_key(channel)))
+            if isinstance(newer, list):
+                records.extend(newer)
+            elif newer:
+                records.append(newer)
+        return records
+
+    # --- Channels ---
 
     def load_calls(self, last_processed: Dict[str, str]) -> str:
-        call_file = os.path.join(self.lead_path, "call_001.txt")
-        if not os.path.exists(call_file):
-            return ""
-        # If never processed, load all; otherwise, return empty (no incremental logic for plain text)
-        if not last_processed.get("calls"):
-            with open(call_file, "r") as f:
-                return f.read()
-        return ""
-
-    # Placeholder for future data types
-    def load_whatsapp(self, last_processed: Dict[str, str]):
-        return []
-    def load_email(self, last_processed: Dict[str, str]):
-        return []
+        """Plain-text call notes newer than last_processed["calls"], joined"""
+        notes = [r for r in self._load_channel("call", last_processed) if isinstance(r, str)]
+        return "\n\n".join(notes)
+
+    def load_whatsapp(self, last_processed: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [r for r in self._load_channel("whatsapp", last_processed) if isinstance(r, dict)]
+
+    def load_email(self, last_processed: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [r for r in self._load_channel("email", last_processed) if isinstance(r, dict)]
+
     def load_lead(self, last_processed: Dict[str, str]):
-        # Find the first JSON file in the lead directory that is not summary_store.json or .DS_Store
-        for fname in os.listdir(self.lead_path):
-            if fname.endswith('.json') and fname not in ('summary_store.json', '.DS_Store'):
-                lead_file = os.path.join(self.lead_path, fname)
-                try:
-                    with open(lead_file, 'r') as f:
-                        data = f.read()
-                        parsed = json.loads(data)
-                        # If the file is a list, return the first item
-                        if isinstance(parsed, list) and len(parsed) > 0:
-                            return parsed[0]
-                        return parsed
-                except Exception as e:
-                    print(f"Error loading lead file {lead_file}: {e}")
-                    return None
+        # Find the first JSON file in the lead directory that is not a channel file
+        fnames = [f for f in self._list_files()
+                  if f.endswith('.json') and _channel_of(os.path.splitext(f)[0]) is None]
+        for fname, entry in self._load_files(fnames[:1]).items():
+            if entry is None:
+                return None
+            parsed = entry.parsed
+            # If the file is a list, return the first item
+            if isinstance(parsed, list) and len(parsed) > 0:
+                return parsed[0]
+            return parsed
         return None
 
     def load_all(self, last_processed: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Every file of the lead keyed by file name without extension. Channel
+        files only contain records past their watermark; other files (lead
+        details) are returned whole.
+        """
         data = {}
-        if not os.path.exists(self.lead_path):
-            return data
-        for fname in os.listdir(self.lead_path):
-            if fname in ("summary_store.json", ".DS_Store"):
-                continue
-            fpath = os.path.join(self.lead_path, fname)
+        for fname, entry in self._load_files(self._list_files()).items():
             key = os.path.splitext(fname)[0]
-            try:
-                if fname.endswith('.json'):
-                    with open(fpath, 'r') as f:
-                        content = f.read()
-                        parsed = json.loads(content)
-                        # If the file is a list, use the full list
-                        if isinstance(parsed, list):
-                            data[key] = parsed
-                        else:
-                            data[key] = parsed
-                else:
-                    # Try to read as text
-                    with open(fpath, 'r') as f:
-                        data[key] = f.read()
-            except Exception as e:
-                print(f"Error loading file {fpath}: {e}")
+            if entry is None:
                 data[key] = None
-        return data 
\ No newline at end of file
+                continue
+            channel = _channel_of(key)
+            if channel is None:
+                data[key] = entry.parsed
+            else:
+                data[key] = self._newer_than(entry, channel, last_processed.get(_watermark_key(channel)))
+        return data
+
+
+def _watermark_key(channel: str) -> str:
+    """last_processed key of a channel ("calls" predates the other channels' naming)"""
+    return "calls" if channel == "call" else channel
+
+
+def advance_watermarks(last_processed: Dict[str, str], data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    New last_processed after consuming data from DataLoader.load_all: the
+    latest record timestamp seen per channel, as an ISO string.
+    """
+    marks = dict(last_processed)
+    for key, value in data.items():
+        channel = _channel_of(key)
+        if channel is None or value is None:
+            continue
+        records = value if isinstance(value, list) else [value]
+        stamps = [ts for ts in _parser.parse_many([_record_timestamp(r) for r in records], channel) if ts]
+        if not stamps:
+            continue
+        wkey = _watermark_key(channel)
+        current = _parser.parse(marks.get(wkey)) if marks.get(wkey) else None
+        latest = max(stamps)
+        if current is None or latest > current:
+            marks[wkey] = latest.isoformat()
+    return marks
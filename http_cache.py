@@ -0,0 +1,162 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import json_codec
+
+try:
+    from starlette.responses import Response
+except ImportError:  # helpers only; the web stack is not installed
+    Response = None
+
+# Bodies smaller than this are sent as is; gzip would barely shrink them
+COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_LEVEL = int(os.getenv('RESPONSE_COMPRESS_LEVEL', '6'))
+# Encoded (and compressed) response bodies kept in memory, per worker
+RESPONSE_CACHE_MB = float(os.getenv('RESPONSE_CACHE_MB', '64'))
+
+GZIP_SUFFIX = '-gzip'
+# Clients may reuse a response only after revalidating it with If-None-Match
+CACHE_CONTROL = 'private, no-cache'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag of an encoded body: a quoted hash of its bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header names etag. Weak (W/) validators and
+    the "-gzip" variant sent with compressed bodies match the plain ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.endswith(GZIP_SUFFIX + '"'):
+            candidate = candidate[:-len(GZIP_SUFFIX) - 1] + '"'
+        if candidate == etag:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class CachedBody:
+    """An encoded JSON body with its ETag; the gzipped form is made on first use"""
+    __slots__ = ('etag', 'body', '_gzipped')
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or content_etag(body)
+        self._gzipped = None
+
+    @classmethod
+    def encode(cls, content: Any) -> 'CachedBody':
+        return cls(json_codec.dumps_bytes(content))
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + (len(self._gzipped) if self._gzipped else 0)
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=COMPRESS_LEVEL, mtime=0)
+        return self._gzipped
+
+
+class ResponseCache:
+    """
+    LRU of CachedBody by key, bounded by total bytes. Keys should include
+    the stored version the body was built from (e.g. a timeline_version
+    token), so entries go stale on their own when the data changes.
+    """
+
+    def __init__(self, max_mb: float = RESPONSE_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: 'OrderedDict[Any, CachedBody]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: CachedBody) -> CachedBody:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+        return entry
+
+    def resized(self, entry: CachedBody, old_size: int):
+        """Account for an entry that grew (its gzipped form was added)"""
+        with self._lock:
+            self._bytes += entry.size - old_size
+            self._evict()
+
+    def discard(self, prefix: Tuple):
+        """Drop every entry whose key starts with prefix, e.g. (kind, contact)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[:len(prefix)] == prefix]:
+                self._bytes -= self._entries.pop(key).size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+
+
+def response_headers(etag: str) -> Dict[str, str]:
+    return {'ETag': etag, 'Cache-Control': CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+
+
+def not_modified(etag: str):
+    """Empty 304 answer for a request whose If-None-Match named etag"""
+    return Response(status_code=304, headers=response_headers(etag))
+
+
+def cached_json_response(request, entry: CachedBody, cache: Optional[ResponseCache] = None):
+    """
+    Response for an encoded body: 304 when the request's If-None-Match
+    already names it, gzipped when the client accepts gzip and the body is
+    large enough, otherwise the plain JSON bytes.
+
+    Args:
+        request: Incoming request (its If-None-Match and Accept-Encoding are read)
+        entry: The body and its ETag
+        cache: Cache holding entry, told when the gzipped form is added to it
+    """
+    if etag_matches(request.headers.get('if-none-match'), entry.etag):
+        return not_modified(entry.etag)
+    headers = response_headers(entry.etag)
+    body = entry.body
+    if len(body) >= COMPRESS_MIN_BYTES and accepts_gzip(request.headers.get('accept-encoding')):
+        old_size = entry.size
+        body = entry.gzipped()
+        if cache is not None and entry.size != old_size:
+            cache.resized(entry, old_size)
+        # A different representation needs its own strong validator
+        headers['ETag'] = entry.etag[:-1] + GZIP_SUFFIX + '"'
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, media_type='application/json', headers=headers)
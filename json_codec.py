@@ -0,0 +1,118 @@
+import sys
+import json
+import datetime
+import decimal
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output apart from NaN (see dumps_bytes)
+    orjson = None
+
+try:
+    from starlette.responses import JSONResponse as _StarletteJSONResponse
+except ImportError:  # encoding only; the web stack is not installed
+    _StarletteJSONResponse = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    _PRETTY_OPTIONS = _OPTIONS | orjson.OPT_INDENT_2
+
+_UNCONVERTED = object()
+
+
+def _convert(obj) -> Any:
+    """
+    Plain JSON value for the datetime, numpy and pandas types found in query
+    results, or _UNCONVERTED. numpy and pandas are only looked at when the
+    process has already imported them.
+    """
+    pd = sys.modules.get('pandas')
+    if pd is not None and (obj is pd.NaT or obj is pd.NA):
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.generic):
+            value = obj.item()
+            if isinstance(value, float) and value != value:
+                return None
+            return _convert(value) if isinstance(value, (datetime.datetime, datetime.date)) else value
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if pd is not None and isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    return _UNCONVERTED
+
+
+def _default(obj) -> Any:
+    value = _convert(obj)
+    # Anything else is written as its string form, as the timeline writers always did
+    return str(obj) if value is _UNCONVERTED else value
+
+
+def to_jsonable(value: Any) -> Any:
+    """
+    One value (e.g. a DataFrame cell) as a plain JSON-ready value.
+    Timestamps become ISO strings, numpy scalars Python numbers, and
+    missing values (None, NaN, NaT, NA) None. Unknown types pass through.
+    """
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return None if value != value else float(value)
+    if isinstance(value, (list, dict)):
+        return value
+    converted = _convert(value)
+    return value if converted is _UNCONVERTED else converted
+
+
+def dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Encode to UTF-8 JSON, compact unless pretty (2-space indent, the layout
+    lazy_json indexes fastest). Non-ASCII text is written as is. orjson
+    writes NaN as null; the stdlib fallback writes NaN, so pass data
+    through to_jsonable first when it may contain NaN.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=_PRETTY_OPTIONS if pretty else _OPTIONS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib encoder handles them
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """dumps_bytes as text, for prompts and string columns"""
+    return dumps_bytes(obj, pretty).decode('utf-8')
+
+
+def loads(data) -> Any:
+    """Decode JSON from str, bytes or a memoryview"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+if _StarletteJSONResponse is not None:
+    class JSONResponse(_StarletteJSONResponse):
+        """FastAPI/Starlette JSONResponse encoded through this module"""
+
+        def render(self, content: Any) -> bytes:
+            return dumps_bytes(content)
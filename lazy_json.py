@@ -0,0 +1,298 @@
+import os
+import re
+import mmap
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Optional, Any
+
+import json_codec
+
+# Strings (with escapes) and the structural characters that matter for
+# finding element boundaries; everything else is skipped by the regex engine
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},]', re.DOTALL)
+# Top-level keys whose string values are kept in the index
+INDEXED_KEYS = {b'"type"': 'type', b'"timestamp"': 'timestamp', b'"start_timestamp"': 'timestamp'}
+# json_codec.dumps_bytes(..., pretty=True) / json.dump(..., indent=2): strings never
+# span lines, so lines indented by exactly two spaces are top-level elements
+# and lines indented by four hold their keys
+_INDENTED_PREFIX = b'[\n  '
+_INDENTED_LINE = re.compile(
+    rb'\n(?:  (\S[^\n]*)|    ("type"|"timestamp"|"start_timestamp"): ("[^"\\\n]*(?:\\.[^"\\\n]*)*"))')
+
+
+class ArrayIndex:
+    """Byte span plus type/timestamp of every element of a top-level JSON array"""
+    __slots__ = ('signature', 'starts', 'ends', 'types', 'timestamps', 'ordered')
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.types: List[Optional[str]] = []
+        self.timestamps: List[Optional[str]] = []
+        self.ordered = False  # every element has a timestamp and they ascend
+
+
+def _build_index(buf, signature) -> ArrayIndex:
+    n = len(_INDENTED_PREFIX)
+    if buf[:n] == _INDENTED_PREFIX and buf[n:n + 1] != b' ':
+        return _build_indented_index(buf, signature)
+    return _scan_index(buf, signature)
+
+
+def _build_indented_index(buf, signature) -> ArrayIndex:
+    """Index an indent=2 document from its line structure in one regex pass"""
+    index = ArrayIndex(signature)
+    starts, ends, types, timestamps = index.starts, index.ends, index.types, index.timestamps
+    start = None
+    for match in _INDENTED_LINE.finditer(buf):
+        line = match.group(1)
+        if line is None:
+            # Top-level key of the element being read
+            value = match.group(3)
+            value = json_codec.loads(value) if b'\\' in value else value[1:-1].decode('utf-8')
+            if INDEXED_KEYS[match.group(2)] == 'type':
+                if types[-1] is None:
+                    types[-1] = value
+            elif timestamps[-1] is None:
+                timestamps[-1] = value
+        elif start is None:
+            starts.append(match.start(1))
+            types.append(None)
+            timestamps.append(None)
+            if line[:1] in b'{[' and line.rstrip(b',')[-1:] not in b']}':
+                start = match.start(1)  # opening line of a multi-line element
+                ends.append(None)
+            else:
+                ends.append(match.end(1) - (1 if line.endswith(b',') else 0))
+        elif line[:1] in b']}':
+            ends[-1] = match.start(1) + 1
+            start = None
+    _set_ordered(index)
+    return index
+
+
+def _set_ordered(index: ArrayIndex):
+    stamps = index.timestamps
+    index.ordered = None not in stamps and all(a <= b for a, b in zip(stamps, stamps[1:]))
+
+
+def _scan_index(buf, signature) -> ArrayIndex:
+    """
+    Index any other layout by walking its tokens. One pass over the raw bytes. Only tokens are visited, and no Python
+    objects are built for element contents, so this is much cheaper than
+    decoding the document.
+    """
+    index = ArrayIndex(signature)
+    depth = 0
+    boundary = None  # end of the last top-level '[' or ','
+    fields: Dict[str, Optional[str]] = {}
+    pending_key = None
+    expect_key = False
+    for match in _TOKEN.finditer(buf):
+        token = match.group()
+        first = token[:1]
+        if first == b'"':
+            if depth == 2 and expect_key:
+                pending_key = INDEXED_KEYS.get(token)
+                expect_key = False
+                continue
+            if depth == 2 and pending_key is not None and pending_key not in fields:
+                fields[pending_key] = json_codec.loads(token)
+            pending_key = None
+            continue
+        pending_key = None
+        if first in b'[{':
+            depth += 1
+            if depth == 1:
+                boundary = match.end()
+            expect_key = depth == 2 and first == b'{'
+        elif first in b']}':
+            depth -= 1
+            expect_key = False
+            if depth == 0:
+                _close(index, buf, boundary, match.start(), fields)
+                break
+        elif depth == 1:  # ','
+            _close(index, buf, boundary, match.start(), fields)
+            boundary = match.end()
+            fields = {}
+        else:
+            expect_key = depth == 2
+    _set_ordered(index)
+    return index
+
+
+_WHITESPACE = (b' ', b'\n', b'\r', b'\t')
+
+
+def _close(index: ArrayIndex, buf, start: int, end: int, fields: Dict[str, Optional[str]]):
+    """Record the element between two top-level separators, if there is one"""
+    while start < end and buf[start:start + 1] in _WHITESPACE:
+        start += 1
+    while end > start and buf[end - 1:end] in _WHITESPACE:
+        end -= 1
+    if start == end:
+        return  # empty array
+    index.starts.append(start)
+    index.ends.append(end)
+    index.types.append(fields.get('type'))
+    index.timestamps.append(fields.get('timestamp'))
+
+
+# Files at least this big keep their index in a sidecar (<file>.idx) so
+# other processes and restarts skip the scan; smaller ones index instantly
+SIDECAR_MIN_BYTES = 256 * 1024
+
+
+def sidecar_path(path: str) -> str:
+    return path + '.idx'
+
+
+def _load_sidecar(path: str, signature) -> Optional[ArrayIndex]:
+    """Index stored next to path, if it was written for this version of the file"""
+    try:
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            header = f.readline().rstrip('\n').split('\t')
+            if tuple(int(x) for x in header) != signature:
+                return None
+            index = ArrayIndex(signature)
+            for line in f:
+                start, end, event_type, timestamp = line.rstrip('\n').split('\t')
+                index.starts.append(int(start))
+                index.ends.append(int(end))
+                index.types.append(event_type or None)
+                index.timestamps.append(timestamp or None)
+    except (OSError, ValueError):
+        return None
+    _set_ordered(index)
+    return index
+
+
+def _clean(value: Optional[str]) -> str:
+    return (value or '').replace('\t', ' ').replace('\n', ' ')
+
+
+def _save_sidecar(path: str, index: ArrayIndex):
+    target = sidecar_path(path)
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(f'{index.signature[0]}\t{index.signature[1]}\n')
+            for start, end, event_type, timestamp in zip(index.starts, index.ends, index.types, index.timestamps):
+                f.write(f'{start}\t{end}\t{_clean(event_type)}\t{_clean(timestamp)}\n')
+        os.replace(tmp, target)
+    except OSError as e:
+        logging.debug(f"Could not write offset index for {path}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+_indexes: Dict[str, ArrayIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+class LazyJsonArray:
+    """
+    Read-only view of a JSON file holding one top-level array (a stored
+    timeline, a lead export), memory mapped and decoded element by element.
+
+    The offset index (byte span, type and timestamp of each element) is
+    built on first use and reused for as long as the file's mtime and size
+    are unchanged, by every view of the same path in the process; large
+    files also keep it in a <file>.idx sidecar. After that, reading N
+    elements costs N small decodes regardless of file size.
+
+    Example:
+        timeline = LazyJsonArray(path)
+        lead = timeline.of_type('lead_info')
+        recent = timeline.after('2025-06-01T00:00:00')
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b''
+        with _indexes_lock:
+            index = _indexes.get(path)
+        if index is None or index.signature != signature:
+            index = _load_sidecar(path, signature) if st.st_size >= SIDECAR_MIN_BYTES else None
+            if index is None:
+                index = _build_index(self._map, signature)
+                if st.st_size >= SIDECAR_MIN_BYTES:
+                    _save_sidecar(path, index)
+            with _indexes_lock:
+                _indexes[path] = index
+        self.index = index
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'LazyJsonArray':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index.starts)
+
+    def raw(self, i: int) -> bytes:
+        """Undecoded bytes of element i"""
+        return self._map[self.index.starts[i]:self.index.ends[i]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [json_codec.loads(self.raw(j)) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return json_codec.loads(self.raw(i))
+
+    def load(self) -> List[Any]:
+        """The whole array (same result as json.load)"""
+        return self[:]
+
+    def of_type(self, event_type: str) -> List[Any]:
+        """Elements whose top-level "type" is event_type, e.g. only lead_info"""
+        return [json_codec.loads(self.raw(i)) for i, t in enumerate(self.index.types) if t == event_type]
+
+    def last(self, n: int) -> List[Any]:
+        return self[max(0, len(self) - n):]
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Any]:
+        """
+        Elements with a timestamp within [start, end), compared as ISO
+        strings like the other backends' indexes. Bisects when timestamps
+        are in order; elements without a timestamp are left out.
+        """
+        stamps = self.index.timestamps
+        if self.index.ordered:
+            lo = bisect_left(stamps, start) if start else 0
+            hi = bisect_left(stamps, end) if end else len(stamps)
+            positions = range(lo, hi)
+        else:
+            positions = [i for i, ts in enumerate(stamps)
+                         if ts is not None and (not start or ts >= start) and (not end or ts < end)]
+        return [json_codec.loads(self.raw(i)) for i in positions]
+
+    def after(self, timestamp: str) -> List[Any]:
+        """Elements strictly newer than timestamp"""
+        stamps = self.index.timestamps
+        if self.index.ordered:
+            return self[bisect_right(stamps, timestamp):]
+        return [json_codec.loads(self.raw(i)) for i, ts in enumerate(stamps) if ts is not None and ts > timestamp]
+
+
+def open_json_array(path: str) -> Optional[LazyJsonArray]:
+    """LazyJsonArray for path, or None if the file does not exist"""
+    try:
+        return LazyJsonArray(path)
+    except FileNotFoundError:
+        return None
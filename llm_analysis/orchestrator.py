@@ -4,10 +4,17 @@ from concurrent.futures import ThreadPoolExecutor
 from llm_analysis.requirements_node import RequirementsNode
 from llm_analysis.tasks_actionables_node import TasksAndActionablesNode
 from llm_analysis.conversation_summary_node import ConversationSummaryNode
+from message_dedup import prompt_timeline
+from storage_backend import contact_key, get_storage_backend
 from dotenv import load_dotenv
 load_dotenv()
 
-def generate_requirements_summary(timeline_path: str):
+# One pool for the LLM calls of every summary in the process, so concurrent
+# and batch summaries share a limit instead of each starting its own threads
+SUMMARY_NODE_WORKERS = int(os.getenv("SUMMARY_NODE_WORKERS", "12"))
+_node_executor = ThreadPoolExecutor(max_workers=SUMMARY_NODE_WORKERS, thread_name_prefix="summary-node")
+
+def generate_requirements_summary(timeline_path: str, timeline: list = None):
     print(f"[Orchestrator] Starting requirements extraction...")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
@@ -17,14 +24,14 @@ def generate_requirements_summary(timeline_path: str):
     node = RequirementsNode(openai_api_key, prompt_path)
     output_path = None
     try:
-        result = node.run(timeline_path, output_path)
+        result = node.run(timeline_path, output_path, timeline=timeline)
         print("[Orchestrator] Requirements extraction complete.")
         return result
     except Exception as e:
         print(f"[Orchestrator] ERROR: {e}")
         raise
 
-def generate_tasks_actionables_summary(timeline_path: str):
+def generate_tasks_actionables_summary(timeline_path: str, timeline: list = None):
     print(f"[Orchestrator] Starting tasks/actionables extraction...")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
@@ -34,14 +41,14 @@ def generate_tasks_actionables_summary(timeline_path: str):
     node = TasksAndActionablesNode(openai_api_key, prompt_path)
     output_path = None
     try:
-        result = node.run(timeline_path, output_path)
+        result = node.run(timeline_path, output_path, timeline=timeline)
         print("[Orchestrator] Tasks/Actionables extraction complete.")
         return result
     except Exception as e:
         print(f"[Orchestrator] ERROR: {e}")
         raise
 
-def generate_conversation_summary(timeline_path: str):
+def generate_conversation_summary(timeline_path: str, timeline: list = None):
     print(f"[Orchestrator] Starting conversation summary extraction...")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
@@ -51,22 +58,14 @@ def generate_conversation_summary(timeline_path: str):
     node = ConversationSummaryNode(openai_api_key, prompt_path)
     output_path = None
     try:
-        result = node.run(timeline_path, output_path)
+        result = node.run(timeline_path, output_path, timeline=timeline)
         print("[Orchestrator] Conversation summary extraction complete.")
         return result
     except Exception as e:
         print(f"[Orchestrator] ERROR: {e}")
         raise
 
-async def generate_combined_summary_async(timeline_path: str):
-    loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor() as executor:
-        req_future = loop.run_in_executor(executor, generate_requirements_summary, timeline_path)
-        tasks_future = loop.run_in_executor(executor, generate_tasks_actionables_summary, timeline_path)
-        conv_future = loop.run_in_executor(executor, generate_conversation_summary, timeline_path)
-        requirements, tasks_actionables, conversation_summary = await asyncio.gather(
-            req_future, tasks_future, conv_future
-        )
+def _combine(requirements, tasks_actionables, conversation_summary):
     combined = {
         "requirements": requirements,
         "tasks_and_actionables": tasks_actionables,
@@ -76,16 +75,37 @@ async def generate_combined_summary_async(timeline_path: str):
     print(combined)
     return combined
 
-def generate_combined_summary(timeline_path: str):
+async def generate_combined_summary_async(timeline_path: str, timeline: list = None):
+    timeline = prompt_timeline(timeline_path, timeline)
+    loop = asyncio.get_running_loop()
+    req_future = loop.run_in_executor(_node_executor, generate_requirements_summary, timeline_path, timeline)
+    tasks_future = loop.run_in_executor(_node_executor, generate_tasks_actionables_summary, timeline_path, timeline)
+    conv_future = loop.run_in_executor(_node_executor, generate_conversation_summary, timeline_path, timeline)
+    return _combine(*await asyncio.gather(req_future, tasks_future, conv_future))
+
+def generate_combined_summary(timeline_path: str, timeline: list = None):
     """
-    Synchronous wrapper for backward compatibility. Runs the async version.
+    Synchronous version: runs the three extractions on the shared node pool
+    and waits for them, without starting an event loop per call.
+    Pass an already-loaded timeline to skip reading timeline_path (e.g. when
+    the timeline lives in the SQLite storage backend). Repeated and
+    templated messages are suppressed once for all three prompts (see
+    message_dedup).
     """
-    return asyncio.run(generate_combined_summary_async(timeline_path))
+    timeline = prompt_timeline(timeline_path, timeline)
+    futures = [_node_executor.submit(node, timeline_path, timeline) for node in
+               (generate_requirements_summary, generate_tasks_actionables_summary, generate_conversation_summary)]
+    return _combine(*[future.result() for future in futures])
 
 
 def main():
-    timeline_path = "data/timeline_917007220975.json"  # Example timeline
-    result = generate_combined_summary(timeline_path)
+    backend = get_storage_backend()
+    contact = contact_key(mobile_number="917007220975")  # Example lead
+    timeline = backend.load_timeline(contact)
+    if timeline is None:
+        print(f"[Orchestrator] No stored timeline for {contact}")
+        return
+    result = generate_combined_summary(backend.timeline_location(contact), timeline=timeline)
     print("\n[Orchestrator] Final Combined Extraction Result:")
     print(result)
 
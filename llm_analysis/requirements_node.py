@@ -1,5 +1,5 @@
 import os
-import json
+import json_codec
 from openai import OpenAI
 
 class RequirementsNode:
@@ -12,12 +12,12 @@ class RequirementsNode:
         with open(self.prompt_path, 'r', encoding='utf-8') as f:
             return f.read()
 
-    def run(self, timeline_path: str, output_path: str = None):
-        with open(timeline_path, 'r', encoding='utf-8') as f:
-            timeline = json.load(f)
+    def run(self, timeline_path: str, output_path: str = None, timeline: list = None):
+        if timeline is None:
+            timeline = json_codec.load_file(timeline_path)
         prompt = self.load_prompt()
-        # Insert timeline as JSON string (or prettified)
-        timeline_str = json.dumps(timeline, indent=2, ensure_ascii=False)
+        # Insert timeline as compact JSON (indentation only costs prompt tokens)
+        timeline_str = json_codec.dumps(timeline)
         full_prompt = prompt.replace('{TIMELINE}', timeline_str)
         response = self.client.chat.completions.create(
             model="gpt-4.1-mini",
@@ -31,17 +31,17 @@ class RequirementsNode:
         # Extract the JSON from the response
         result_text = response.choices[0].message.content
         try:
-            result_json = json.loads(result_text)
+            result_json = json_codec.loads(result_text)
         except Exception:
             # Try to extract JSON substring if LLM output is not pure JSON
             import re
             match = re.search(r'\{[\s\S]*\}', result_text)
             if match:
-                result_json = json.loads(match.group(0))
+                result_json = json_codec.loads(match.group(0))
             else:
                 raise ValueError("Could not parse JSON from LLM output")
         if output_path:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result_json, f, indent=2, ensure_ascii=False)
+            with open(output_path, 'wb') as f:
+                f.write(json_codec.dumps_bytes(result_json, pretty=True))
             print(f"[RequirementsNode] Saved requirements to {output_path}")
         return result_json 
\ No newline at end of file
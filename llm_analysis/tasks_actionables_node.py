@@ -1,5 +1,5 @@
 import os
-import json
+import json_codec
 from openai import OpenAI
 
 class TasksAndActionablesNode:
@@ -12,11 +12,11 @@ class TasksAndActionablesNode:
         with open(self.prompt_path, 'r', encoding='utf-8') as f:
             return f.read()
 
-    def run(self, timeline_path: str, output_path: str = None):
-        with open(timeline_path, 'r', encoding='utf-8') as f:
-            timeline = json.load(f)
+    def run(self, timeline_path: str, output_path: str = None, timeline: list = None):
+        if timeline is None:
+            timeline = json_codec.load_file(timeline_path)
         prompt = self.load_prompt()
-        timeline_str = json.dumps(timeline, indent=2, ensure_ascii=False)
+        timeline_str = json_codec.dumps(timeline)
         full_prompt = prompt.replace('{TIMELINE}', timeline_str)
         print("[TasksAndActionablesNode] Sending prompt to LLM...")
         response = self.client.chat.completions.create(
@@ -31,14 +31,14 @@ class TasksAndActionablesNode:
         result_text = response.choices[0].message.content
         print("[TasksAndActionablesNode] Received LLM response")
         try:
-            result_json = json.loads(result_text)
+            result_json = json_codec.loads(result_text)
         except Exception as e:
             print(f"[TasksAndActionablesNode] JSON parsing error: {e}")
             import re
             match = re.search(r'\{[\s\S]*\}', result_text)
             if match:
                 try:
-                    result_json = json.loads(match.group(0))
+                    result_json = json_codec.loads(match.group(0))
                 except Exception as e2:
                     print(f"[TasksAndActionablesNode] Fallback JSON parsing error: {e2}")
                     raise ValueError("Could not parse JSON from LLM output")
@@ -46,7 +46,7 @@ class TasksAndActionablesNode:
                 print("[TasksAndActionablesNode] No JSON object found in LLM output.")
                 raise ValueError("Could not parse JSON from LLM output")
         if output_path:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result_json, f, indent=2, ensure_ascii=False)
+            with open(output_path, 'wb') as f:
+                f.write(json_codec.dumps_bytes(result_json, pretty=True))
             print(f"[TasksAndActionablesNode] Saved output to {output_path}")
         return result_json 
\ No newline at end of file
@@ -0,0 +1,209 @@
+import os
+import time
+import shutil
+import logging
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def record_access(path: str):
+    """
+    Record an access to a file or directory that LRU eviction manages.
+
+    The access time is written explicitly with os.utime so it is tracked
+    even on filesystems mounted with noatime/relatime, and it is visible
+    to every worker process without any shared state. Paths that are not
+    files (e.g. SQLite locations) are ignored.
+    """
+    try:
+        st = os.stat(path)
+        os.utime(path, (time.time(), st.st_mtime))
+    except OSError as e:
+        logging.debug(f"Could not record access for {path}: {e}")
+
+
+class LRUFileStore:
+    """
+    Access tracking, pinning and size-aware LRU eviction for files under
+    data/, shared by the API's and the transcription service's
+    StorageManager.
+
+    Subclasses set capacity_mb, high_water, low_water, pin_ttl_seconds,
+    pin_dir and _bytes_freed, and list their evictable files in
+    _tracked_items().
+    """
+
+    # --- Access tracking and pinning ---
+
+    def touch(self, path: str):
+        """Record an access to a managed file or lead directory, see record_access"""
+        record_access(path)
+
+    def lead_paths(self, backend, contact: str) -> List[str]:
+        """Evictable files of one lead: its timeline and, on file backends, its saved summary"""
+        paths = [backend.timeline_location(contact)]
+        if hasattr(backend, 'summary_path'):
+            paths.append(backend.summary_path(contact))
+        return paths
+
+    def touch_lead(self, backend, contact: str):
+        """Record an access to a lead's timeline and saved summary"""
+        for path in self.lead_paths(backend, contact):
+            record_access(path)
+
+    def _pin_prefix(self, path: str) -> str:
+        # timeline_<key>.json and its event log timeline_<key>.jsonl share one pin
+        return os.path.basename(os.path.normpath(path)).split('.')[0] + '.'
+
+    @contextmanager
+    def pin(self, path: str):
+        """
+        Pin a file for the duration of the block so eviction never removes it.
+
+        Pins are marker files under data/.pins, shared by every gunicorn
+        worker and by the transcription service, so a transcript write and a
+        summary run never lose files to each other.
+        """
+        marker = os.path.join(self.pin_dir, f"{self._pin_prefix(path)}{os.getpid()}.{time.monotonic_ns()}")
+        try:
+            with open(marker, 'w') as f:
+                f.write(os.path.abspath(path))
+        except OSError as e:
+            logging.warning(f"Could not pin {path}: {e}")
+            marker = None
+        try:
+            yield
+        finally:
+            if marker:
+                try:
+                    os.remove(marker)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def pin_lead(self, backend, contact: str):
+        """Pin a lead's timeline and saved summary while a summary is generated"""
+        with ExitStack() as stack:
+            for path in self.lead_paths(backend, contact):
+                stack.enter_context(self.pin(path))
+            yield
+
+    def live_pins(self) -> Set[str]:
+        """
+        Pin prefixes of every live pin, from one listing of the pin
+        directory. Pins older than pin_ttl_seconds (crashed worker) are
+        removed instead.
+        """
+        pins = set()
+        now = time.time()
+        try:
+            names = os.listdir(self.pin_dir)
+        except OSError:
+            return pins
+        for name in names:
+            marker = os.path.join(self.pin_dir, name)
+            try:
+                if now - os.path.getmtime(marker) <= self.pin_ttl_seconds:
+                    pins.add(name.split('.')[0] + '.')
+                else:
+                    os.remove(marker)
+            except OSError:
+                continue
+        return pins
+
+    def is_pinned(self, path: str, pins: Optional[Set[str]] = None) -> bool:
+        """
+        Check whether any live pin exists for the given path. Loops over
+        many paths should pass the result of one live_pins() call.
+        """
+        if pins is None:
+            pins = self.live_pins()
+        return self._pin_prefix(path) in pins
+
+    # --- Eviction ---
+
+    def _path_size(self, path: str) -> int:
+        """Size in bytes of a file, or of every file below a directory"""
+        if os.path.isdir(path):
+            total = 0
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, file))
+                    except OSError:
+                        pass
+            return total
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remove_path(self, path: str) -> int:
+        """Remove a file or directory and account for the bytes freed"""
+        size = self._path_size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+            # Event logs and large JSON timelines carry a sidecar offset index
+            if os.path.exists(path + '.idx'):
+                size += os.path.getsize(path + '.idx')
+                os.remove(path + '.idx')
+        self._bytes_freed += size
+        return size
+
+    def _tracked_paths(self) -> List[str]:
+        """Paths of every evictable file or directory"""
+        raise NotImplementedError
+
+    def _tracked_items(self) -> List[Tuple[str, int, float]]:
+        """
+        List evictable items as (path, size_bytes, last_access) tuples.
+
+        Last access is the later of atime and mtime, so freshly written files
+        count as recently used even before anyone reads them.
+        """
+        items = []
+        for path in self._tracked_paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            items.append((path, self._path_size(path), max(st.st_atime, st.st_mtime)))
+        return items
+
+    def evict_lru(self) -> Dict[str, float]:
+        """
+        Evict least-recently-used items once usage crosses the high-water mark.
+
+        Items are removed oldest-access first until usage falls to the
+        low-water mark. Pinned items are skipped.
+
+        Returns:
+            Dict with eviction statistics, including the actual bytes freed
+        """
+        stats = {'items_evicted': 0, 'pinned_skipped': 0, 'bytes_freed': 0, 'usage_mb': 0.0}
+        if not self.capacity_mb:
+            return stats
+        items = self._tracked_items()
+        usage = sum(size for _, size, _ in items)
+        capacity = self.capacity_mb * 1024 * 1024
+        if usage > capacity * self.high_water:
+            target = capacity * self.low_water
+            pins = self.live_pins()
+            for path, size, _ in sorted(items, key=lambda x: x[2]):
+                if usage <= target:
+                    break
+                if self.is_pinned(path, pins):
+                    stats['pinned_skipped'] += 1
+                    continue
+                try:
+                    freed = self._remove_path(path)
+                    usage -= freed
+                    stats['bytes_freed'] += freed
+                    stats['items_evicted'] += 1
+                    logging.info(f"Evicted least-recently-used item: {path} ({freed} bytes)")
+                except Exception as e:
+                    logging.warning(f"Failed to evict {path}: {e}")
+        stats['usage_mb'] = usage / (1024 * 1024)
+        return stats
@@ -0,0 +1,428 @@
+"""
+Near-duplicate and template suppression for the timelines sent to the LLM.
+
+Runs of messages from the same sender are collapsed: exact and near
+duplicates (normalized hash, then MinHash over shingles) become one
+message with a repeat_count. Long boilerplate that agents send to many
+leads is looked up in a cross-lead template dictionary and replaced by a
+short tag. Stored timelines are not changed; only the prompt copy is.
+
+    python message_dedup.py --build    # rebuild data/message_templates.json from stored leads
+    python message_dedup.py            # tokens each stored lead would save
+"""
+import os
+import re
+import sys
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import json_codec
+from email_cleaning import clean_email_body, clean_timeline_emails
+from storage_backend import DATA_DIR
+from token_counting import count_tokens
+
+MESSAGE_DEDUP = os.getenv('MESSAGE_DEDUP', 'true').lower() in ('1', 'true', 'yes')
+# Estimated Jaccard similarity from which two messages count as the same
+DEDUP_SIMILARITY = float(os.getenv('DEDUP_SIMILARITY', '0.8'))
+# Looser for templates, which differ between leads by the name in the greeting
+TEMPLATE_SIMILARITY = float(os.getenv('TEMPLATE_SIMILARITY', '0.7'))
+# A message becomes a template once this many leads received it
+TEMPLATE_MIN_LEADS = int(os.getenv('TEMPLATE_MIN_LEADS', '5'))
+# Shorter messages are never tagged or referenced; the tag would not be shorter
+TEMPLATE_MIN_CHARS = int(os.getenv('TEMPLATE_MIN_CHARS', '80'))
+TEMPLATES_PATH = os.path.join(DATA_DIR, 'message_templates.json')
+TEMPLATE_PREVIEW_WORDS = 8
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs at 0.8 similarity become candidates >99.9% of the time
+SHINGLE_CHARS = 5
+SHINGLE_WORDS = 3
+
+# Text field of each message type
+TEXT_FIELDS = {'whatsapp': 'message_content', 'email': 'message'}
+
+_TOKEN = re.compile(r'https?://\S+|www\.\S+|\w+')
+# Tokens that carry facts (prices, dates, links): near duplicates must agree on them
+_FACT = re.compile(r'\d|://|^www\.')
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures have to agree between processes and with the saved dictionary
+_rng = random.Random(0x5eed)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class Fingerprint:
+    """
+    Normalized form of one message: lowercase words and links without
+    punctuation, its hash, the fact tokens (anything with digits, links),
+    and a MinHash signature computed on first use.
+    """
+    __slots__ = ('normalized', 'key', 'facts', '_signature')
+
+    def __init__(self, text: str):
+        tokens = _TOKEN.findall(str(text).lower())
+        self.normalized = ' '.join(tokens)
+        self.key = _hash64(self.normalized)
+        self.facts = tuple(t for t in tokens if _FACT.search(t))
+        self._signature = None
+
+    def shingles(self) -> set:
+        """Word 3-grams for longer messages, character 5-grams for short ones"""
+        words = self.normalized.split()
+        if len(words) >= 2 * SHINGLE_WORDS:
+            return {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+        text = self.normalized
+        if len(text) <= SHINGLE_CHARS:
+            return {text}
+        return {text[i:i + SHINGLE_CHARS] for i in range(len(text) - SHINGLE_CHARS + 1)}
+
+    @property
+    def signature(self) -> Tuple[int, ...]:
+        if self._signature is None:
+            hashes = [_hash64(s) for s in self.shingles()]
+            self._signature = tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+        return self._signature
+
+    def similarity(self, other: 'Fingerprint') -> float:
+        """Estimated Jaccard similarity of the two messages' shingles"""
+        return sum(x == y for x, y in zip(self.signature, other.signature)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    Messages seen so far, found again by exact normalized hash or by MinHash
+    LSH (BANDS bands of the signature) plus a similarity check. Near
+    duplicates must also have the same fact tokens, so "rent is 150" and
+    "rent is 180" stay apart.
+    """
+
+    def __init__(self, threshold: float = DEDUP_SIMILARITY):
+        self.threshold = threshold
+        self._exact: Dict[int, Any] = {}
+        self._buckets: Dict[Tuple[int, int], List[Tuple[Fingerprint, Any]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _bands(self, fingerprint: Fingerprint) -> Iterable[Tuple[int, int]]:
+        rows = NUM_PERM // BANDS
+        signature = fingerprint.signature
+        for band in range(BANDS):
+            yield band, hash(signature[band * rows:(band + 1) * rows])
+
+    def find(self, fingerprint: Fingerprint) -> Optional[Any]:
+        """Value of the most similar message added before, or None"""
+        if fingerprint.key in self._exact:
+            return self._exact[fingerprint.key]
+        if not self._exact:
+            return None
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for band in self._bands(fingerprint):
+            for candidate, value in self._buckets.get(band, ()):
+                if candidate.key in seen or candidate.facts != fingerprint.facts:
+                    continue
+                seen.add(candidate.key)
+                similarity = fingerprint.similarity(candidate)
+                if similarity >= best_similarity:
+                    best, best_similarity = value, similarity
+        return best
+
+    def add(self, fingerprint: Fingerprint, value: Any):
+        if fingerprint.key in self._exact:
+            return
+        self._exact[fingerprint.key] = value
+        for band in self._bands(fingerprint):
+            self._buckets[band].append((fingerprint, value))
+
+
+# --- Template dictionary ---
+
+class TemplateDictionary:
+    """
+    Boilerplate messages that at least TEMPLATE_MIN_LEADS leads received,
+    as built by build_templates(). tag() is what replaces a matching
+    message in a prompt: the template id and the message's first words
+    (not the template's, which may greet another lead).
+    """
+
+    def __init__(self, templates: List[Dict[str, Any]], threshold: float = TEMPLATE_SIMILARITY):
+        self.templates = templates
+        self._index = NearDuplicateIndex(threshold)
+        for template in templates:
+            self._index.add(Fingerprint(template['text']), template)
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def match(self, fingerprint: Fingerprint) -> Optional[Dict[str, Any]]:
+        return self._index.find(fingerprint) if self.templates else None
+
+    @staticmethod
+    def tag(template: Dict[str, Any], text: str) -> str:
+        words = text.split()
+        preview = ' '.join(words[:TEMPLATE_PREVIEW_WORDS])
+        return f"[template {template['id']}: {preview}{'…' if len(words) > TEMPLATE_PREVIEW_WORDS else ''}]"
+
+    @classmethod
+    def load(cls, path: str = TEMPLATES_PATH) -> 'TemplateDictionary':
+        try:
+            data = json_codec.load_file(path)
+        except (OSError, ValueError):
+            data = {}
+        return cls(data.get('templates', []))
+
+    def save(self, path: str = TEMPLATES_PATH):
+        data = {'built_at': datetime.now().isoformat(timespec='seconds'), 'templates': self.templates}
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json_codec.dumps_bytes(data, pretty=True))
+        os.replace(tmp, path)
+
+
+_templates_lock = threading.Lock()
+_templates_cache: Dict[str, Tuple[Optional[int], TemplateDictionary]] = {}
+
+
+def load_templates(path: str = TEMPLATES_PATH) -> TemplateDictionary:
+    """The template dictionary at path, reloaded when the file changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _templates_lock:
+        cached = _templates_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, TemplateDictionary.load(path) if mtime is not None else TemplateDictionary([]))
+            _templates_cache[path] = cached
+        return cached[1]
+
+
+def _iter_texts(timeline: List[Dict[str, Any]]) -> Iterable[str]:
+    """Text of every WhatsApp message and email in a timeline, emails cleaned as in prompts"""
+    for event in timeline:
+        messages = event.get('messages') if event.get('type') in ('whatsapp_pack', 'email_thread') else [event]
+        for message in messages or ():
+            field = TEXT_FIELDS.get(message.get('type'))
+            text = message.get(field) if field else None
+            if text and message.get('type') == 'email':
+                text = clean_email_body(text)
+            if text:
+                yield str(text)
+
+
+def build_templates(backend, min_leads: int = TEMPLATE_MIN_LEADS,
+                    min_chars: int = TEMPLATE_MIN_CHARS) -> TemplateDictionary:
+    """
+    Cluster the long messages of every stored lead by near-duplicate
+    matching and keep the clusters that reached min_leads leads.
+    """
+    index = NearDuplicateIndex(TEMPLATE_SIMILARITY)
+    clusters: List[Dict[str, Any]] = []
+    for contact in backend.list_contacts():
+        timeline = backend.load_timeline(contact) or []
+        for text in _iter_texts(timeline):
+            if len(text) < min_chars:
+                continue
+            fingerprint = Fingerprint(text)
+            cluster = index.find(fingerprint)
+            if cluster is None:
+                cluster = {'text': ' '.join(text.split()), 'leads': set()}
+                clusters.append(cluster)
+                index.add(fingerprint, cluster)
+            cluster['leads'].add(contact)
+    common = sorted((c for c in clusters if len(c['leads']) >= min_leads), key=lambda c: -len(c['leads']))
+    return TemplateDictionary([{'id': f'T{i}', 'text': c['text'], 'leads': len(c['leads'])}
+                               for i, c in enumerate(common, start=1)])
+
+
+# --- Prompt timelines ---
+
+def message_sender(message: Dict[str, Any]) -> Optional[str]:
+    """Who wrote a message: sender_type, or direction for rows without it"""
+    return message.get('sender_type') or message.get('direction')
+
+
+def collapse_repeats(messages: Iterable[Any], text_of: Callable[[Any], Optional[str]],
+                     sender_of: Callable[[Any], Optional[str]] = message_sender) -> List[List[Any]]:
+    """
+    Group each run of messages from one sender so that exact and near
+    duplicates within the run share an entry. Runs end when someone else
+    writes, so answers stay next to the questions they answer.
+
+    Returns:
+        [first message, repeat count, last repeat] per kept message, in order
+    """
+    kept: List[List[Any]] = []
+    run_sender, run = object(), NearDuplicateIndex()
+    for message in messages:
+        sender = sender_of(message)
+        if sender != run_sender:
+            run_sender, run = sender, NearDuplicateIndex()
+        text = text_of(message)
+        if not text:
+            kept.append([message, 1, None])
+            continue
+        fingerprint = Fingerprint(text)
+        entry = run.find(fingerprint)
+        if entry is not None:
+            entry[1] += 1
+            entry[2] = message
+            continue
+        entry = [message, 1, None]
+        run.add(fingerprint, entry)
+        kept.append(entry)
+    return kept
+
+
+def _dedup_messages(messages: List[Dict[str, Any]], stats: Dict[str, int],
+                    rewrite: Callable[[Dict[str, Any], str], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def text_of(message):
+        return message.get(TEXT_FIELDS.get(message.get('type'), ''))
+
+    out = []
+    for message, count, last in collapse_repeats(messages, text_of):
+        field = TEXT_FIELDS.get(message.get('type'))
+        message = rewrite(message, field) if field and message.get(field) else message
+        if count > 1:
+            message = {**message, 'repeat_count': count, 'last_repeat_at': last.get('timestamp')}
+            stats['collapsed'] += count - 1
+        out.append(message)
+    return out
+
+
+def dedup_timeline(timeline: List[Dict[str, Any]],
+                   templates: Optional[TemplateDictionary] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Prompt copy of a timeline with repeated messages suppressed:
+
+    - repeats within one sender's run in a whatsapp_pack or email_thread
+      are collapsed into the first message, with repeat_count and
+      last_repeat_at;
+    - long messages matching a template are replaced by its tag;
+    - other long messages already sent earlier in the timeline are
+      replaced by a reference to the earlier one.
+
+    Returns:
+        (timeline copy, counts of collapsed, templated and referenced messages)
+    """
+    stats = {'collapsed': 0, 'templated': 0, 'referenced': 0}
+    earlier = NearDuplicateIndex()
+
+    def rewrite(message: Dict[str, Any], field: str) -> Dict[str, Any]:
+        text = str(message[field])
+        if len(text) < TEMPLATE_MIN_CHARS:
+            return message
+        fingerprint = Fingerprint(text)
+        template = templates.match(fingerprint) if templates is not None else None
+        if template is not None:
+            stats['templated'] += 1
+            return {**message, field: TemplateDictionary.tag(template, text)}
+        first = earlier.find(fingerprint)
+        if first is not None:
+            stats['referenced'] += 1
+            return {**message, field: f'[same message as {first}]'}
+        if message.get('timestamp'):
+            earlier.add(fingerprint, message.get('timestamp'))
+        return message
+
+    out = []
+    for event in timeline:
+        kind = event.get('type')
+        if kind in ('whatsapp_pack', 'email_thread'):
+            messages = _dedup_messages(event.get('messages') or [], stats, rewrite)
+            event = {**event, 'messages': messages}
+            if 'message_count' in event:
+                event['message_count'] = len(messages)
+        elif kind in TEXT_FIELDS and event.get(TEXT_FIELDS[kind]):
+            event = rewrite(event, TEXT_FIELDS[kind])
+        out.append(event)
+    return out, stats
+
+
+def prompt_timeline(timeline_path: str, timeline: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    The timeline as the summary prompts should see it: loaded from
+    timeline_path unless given, email bodies cleaned, then deduplicated
+    (unless MESSAGE_DEDUP is off) with the template dictionary at
+    TEMPLATES_PATH.
+    """
+    if timeline is None:
+        timeline = json_codec.load_file(timeline_path)
+    templates = load_templates() if MESSAGE_DEDUP else None
+    _, deduped, stats = _prompt_pipeline(timeline, templates, dedup=MESSAGE_DEDUP)
+    if stats and any(stats.values()):
+        logging.info(f"Message dedup for {timeline_path}: {stats}")
+    return deduped
+
+
+def _prompt_pipeline(timeline: List[Dict[str, Any]], templates: Optional[TemplateDictionary], dedup: bool):
+    """
+    The steps prompt_timeline applies to a stored timeline.
+
+    Returns:
+        (timeline with emails cleaned, that timeline deduplicated, dedup
+        counts); the last two are the cleaned timeline and None when dedup
+        is off
+    """
+    cleaned = clean_timeline_emails(timeline)
+    if not dedup:
+        return cleaned, cleaned, None
+    deduped, stats = dedup_timeline(cleaned, templates)
+    return cleaned, deduped, stats
+
+
+def dedup_report(timeline: List[Dict[str, Any]], templates: Optional[TemplateDictionary] = None) -> Dict[str, int]:
+    """
+    What dedup saves on a stored timeline, in prompt tokens: measured on
+    the prompt_timeline pipeline, from the email-cleaned timeline to the
+    deduplicated one the prompts get.
+    """
+    cleaned, deduped, stats = _prompt_pipeline(timeline, templates, dedup=True)
+    stats['tokens_before'] = count_tokens(json_codec.dumps(cleaned))
+    stats['tokens_after'] = count_tokens(json_codec.dumps(deduped))
+    stats['tokens_removed'] = stats['tokens_before'] - stats['tokens_after']
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Message dedup: template dictionary and savings report')
+    parser.add_argument('--build', action='store_true', help='rebuild the template dictionary from stored leads')
+    parser.add_argument('--min-leads', type=int, default=TEMPLATE_MIN_LEADS)
+    args = parser.parse_args()
+
+    from storage_backend import get_storage_backend
+    backend = get_storage_backend()
+    if args.build:
+        templates = build_templates(backend, min_leads=args.min_leads)
+        templates.save()
+        print(f"[Dedup] {len(templates)} templates saved to {TEMPLATES_PATH}")
+        for template in templates.templates[:20]:
+            print(f"  {template['id']:<5} {template['leads']:>5} leads  {TemplateDictionary.tag(template, template['text'])}")
+        return 0
+
+    templates = load_templates()
+    print(f"{'lead':<40} {'collapsed':>9} {'templated':>9} {'referenced':>10} {'tokens before':>14} {'after':>9}")
+    totals = defaultdict(int)
+    for contact in sorted(backend.list_contacts()):
+        stats = dedup_report(backend.load_timeline(contact) or [], templates)
+        for key, value in stats.items():
+            totals[key] += value
+        print(f"{contact:<40} {stats['collapsed']:>9} {stats['templated']:>9} {stats['referenced']:>10} "
+              f"{stats['tokens_before']:>14} {stats['tokens_after']:>9}")
+    print(f"{'total':<40} {totals['collapsed']:>9} {totals['templated']:>9} {totals['referenced']:>10} "
+          f"{totals['tokens_before']:>14} {totals['tokens_after']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
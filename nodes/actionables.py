@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class Actionables(BaseModel):
@@ -59,11 +60,11 @@ Input Data:
         return text
 
     async def process(self, input_data: Dict[str, Any]) -> Actionables:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         try:
             json_str = self._extract_json_from_response(response.content)
-            actions_data = json.loads(json_str)
+            actions_data = json_codec.loads(json_str)
             normalized = {
                 "agent_actions": actions_data.get("sales_agent_actionables", []),
                 "student_actions": actions_data.get("student_actionables", [])
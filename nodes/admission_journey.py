@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class AdmissionJourney(BaseModel):
@@ -62,11 +63,11 @@ Input Data:
         return text
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         try:
             json_str = self._extract_json_from_response(response.content)
-            journey_data = json.loads(json_str)
+            journey_data = json_codec.loads(json_str)
             # Return the dict directly for new schema
             return journey_data
         except (json.JSONDecodeError, ValueError) as e:
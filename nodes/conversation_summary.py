@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class ConversationSummary(BaseModel):
@@ -85,13 +86,13 @@ class ConversationSummaryNode:
         return text.strip()
 
     async def process(self, input_data: Dict[str, Any]) -> ConversationSummary:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         print(f"\n[DEBUG] Raw LLM response:\n{response.content}\n")
         try:
             json_str = self._extract_json_from_response(response.content)
             print(f"[DEBUG] Candidate JSON string before parsing:\n{json_str}\n")
-            summary_data = json.loads(json_str)
+            summary_data = json_codec.loads(json_str)
             return ConversationSummary(**summary_data)
         except (json.JSONDecodeError, ValueError, TypeError) as e:
             print(f"Error parsing LLM response: {e}")
@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class TimelineEvent(BaseModel):
@@ -57,11 +58,11 @@ Input Data:
         return text
 
     async def process(self, input_data: Dict[str, Any]) -> List[TimelineEvent]:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         try:
             json_str = self._extract_json_from_response(response.content)
-            events_data = json.loads(json_str)
+            events_data = json_codec.loads(json_str)
             return [TimelineEvent(**item) for item in events_data]
         except (json.JSONDecodeError, ValueError) as e:
             print(f"Error parsing LLM response: {e}")
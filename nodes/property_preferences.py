@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class PropertyPreference(BaseModel):
@@ -68,12 +69,12 @@ Input Data:
         return text.strip()
 
     async def process(self, input_data: Dict[str, Any]) -> List[PropertyPreference]:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         print(f"\n[DEBUG] Raw LLM response:\n{response.content}\n")
         try:
             json_str = self._extract_json_from_response(response.content)
-            prefs_data = json.loads(json_str)
+            prefs_data = json_codec.loads(json_str)
             return [PropertyPreference(**item) for item in prefs_data]
         except (json.JSONDecodeError, ValueError, TypeError) as e:
             print(f"Error parsing LLM response: {e}")
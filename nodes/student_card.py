@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class StudentProfile(BaseModel):
@@ -80,7 +81,7 @@ Input Data:
     async def process(self, input_data: Dict[str, Any]) -> StudentProfile:
         """Process lead data and generate a student profile"""
         # Format the prompt with lead data
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         
         # Get response from LLM
         response = await self.llm.ainvoke(formatted_prompt)
@@ -88,7 +89,7 @@ Input Data:
         try:
             # Extract and parse JSON from response
             json_str = self._extract_json_from_response(response.content)
-            profile_data = json.loads(json_str)
+            profile_data = json_codec.loads(json_str)
             
             # Normalize the data structure if needed
             normalized_data = {
@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
+import json_codec
 import re
 
 class StudentRequirements(BaseModel):
@@ -63,11 +64,11 @@ Input Data:
         return text
 
     async def process(self, input_data: Dict[str, Any]) -> StudentRequirements:
-        formatted_prompt = self.prompt.format(input_data=json.dumps(input_data, indent=2))
+        formatted_prompt = self.prompt.format(input_data=json_codec.dumps(input_data))
         response = await self.llm.ainvoke(formatted_prompt)
         try:
             json_str = self._extract_json_from_response(response.content)
-            req_data = json.loads(json_str)
+            req_data = json_codec.loads(json_str)
             normalized = {
                 "room_type": req_data.get("room_type", []),
                 "budget_range": req_data.get("budget_range", ""),
@@ -33,6 +33,7 @@ const TimelineItem: React.FC<TimelineItemProps> = ({
       case 'call':
         return <Phone className="w-5 h-5 text-purple-600" />;
       case 'email':
+      case 'email_thread':
         return <Mail className="w-5 h-5 text-blue-600" />;
       case 'lead_info':
         return <User className="w-5 h-5 text-gray-600" />;
@@ -48,6 +49,7 @@ const TimelineItem: React.FC<TimelineItemProps> = ({
       case 'call':
         return 'border-purple-200 bg-purple-50';
       case 'email':
+      case 'email_thread':
         return 'border-blue-200 bg-blue-50';
       case 'lead_info':
         return 'border-gray-200 bg-gray-50';
@@ -63,7 +65,7 @@ const TimelineItem: React.FC<TimelineItemProps> = ({
   };
 
   const getTimeDisplay = () => {
-    if (item.type === 'whatsapp_pack') {
+    if (item.type === 'whatsapp_pack' || item.type === 'email_thread') {
       return `${formatDate(item.start_timestamp)} - ${formatDate(item.end_timestamp)}`;
     }
     return formatDate(item.timestamp);
@@ -124,6 +126,23 @@ const TimelineItem: React.FC<TimelineItemProps> = ({
           </div>
         );
 
+      case 'email_thread':
+        return (
+          <div className="flex items-center justify-between">
+            <div className="flex items-center space-x-3">
+              <span className="text-sm font-medium text-gray-900">✉️ Email Thread</span>
+              <span className="text-sm text-gray-600 truncate max-w-md">{item.subject}</span>
+              <span className="inline-flex items-center px-2 py-0.5 rounded-full text-xs font-medium bg-blue-100 text-blue-800">
+                📨 {item.message_count || item.messages?.length || 0} emails
+              </span>
+            </div>
+            <div className="flex items-center space-x-2 text-sm text-gray-500">
+              <Clock className="w-4 h-4" />
+              <span>{getTimeDisplay()}</span>
+            </div>
+          </div>
+        );
+
       case 'lead_info':
         return (
           <div className="flex items-center justify-between">
@@ -262,6 +281,25 @@ const TimelineItem: React.FC<TimelineItemProps> = ({
           </div>
         );
 
+      case 'email_thread':
+        return (
+          <div className="mt-4 pt-4 border-t border-gray-200 space-y-3">
+            {(item.messages || []).map((message: any, index: number) => (
+              <div key={`${message.timestamp}-${index}`} className="bg-gray-50 p-3 rounded-lg space-y-1">
+                <div className="flex items-center justify-between text-xs text-gray-500">
+                  <span>
+                    <span className="font-medium text-gray-700">{message.sender_email}</span>
+                    {' → '}
+                    {message.recipient_email}
+                  </span>
+                  <span>{formatFullDate(message.timestamp)}</span>
+                </div>
+                <p className="text-sm text-gray-900 whitespace-pre-wrap">{message.message}</p>
+              </div>
+            ))}
+          </div>
+        );
+
       case 'lead_info':
         return (
           <div className="mt-4 pt-4 border-t border-gray-200">
@@ -52,6 +52,25 @@ const TimelineSection: React.FC<TimelineSectionProps> = ({
   // Transcribe all calls logic
   const TRANSCRIPTION_API_URL = import.meta.env.VITE_TRANSCRIPTION_API_URL || 'http://localhost:8001';
   
+  // Submit a call for transcription, then poll the job until it finishes
+  const transcribeCall = async (item: any): Promise<string> => {
+    const response = await fetch(`${TRANSCRIPTION_API_URL}/transcribe-call`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ record_url: item.record_url, mobile_number: item.to_number, call_id: item.id }),
+    });
+    if (!response.ok) throw new Error(await response.text());
+    let job = await response.json();
+    while (job.status === 'queued' || job.status === 'processing') {
+      await new Promise(resolve => setTimeout(resolve, 3000));
+      const statusResponse = await fetch(`${TRANSCRIPTION_API_URL}/transcribe-call/${job.job_id}`);
+      if (!statusResponse.ok) throw new Error(await statusResponse.text());
+      job = await statusResponse.json();
+    }
+    if (job.status !== 'completed') throw new Error(job.error || `Transcription ${job.status}`);
+    return job.transcript;
+  };
+
   // Individual transcription handler
   const handleIndividualTranscribe = useCallback(async (item: any) => {
     // Use the same robust key generation as in the render
@@ -74,13 +93,7 @@ const TimelineSection: React.FC<TimelineSectionProps> = ({
     setIndividualTranscribeErrors(prev => ({ ...prev, [itemKey]: '' }));
     
     try {
-      const response = await fetch(`${TRANSCRIPTION_API_URL}/transcribe-call`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ record_url: item.record_url, mobile_number: item.to_number, call_id: item.id }),
-      });
-      if (!response.ok) throw new Error(await response.text());
-      const text = await response.text();
+      const text = await transcribeCall(item);
       setTranscripts(prev => ({ ...prev, [itemKey]: text }));
     } catch (err: any) {
       setIndividualTranscribeErrors(prev => ({ ...prev, [itemKey]: err.message || 'Failed to transcribe' }));
@@ -103,13 +116,7 @@ const TimelineSection: React.FC<TimelineSectionProps> = ({
         const itemId = item.id || `item-${timelineData.findIndex(i => i === item)}`;
         const itemKey = `${itemId}-${item.type}`;
         
-        const response = await fetch(`${TRANSCRIPTION_API_URL}/transcribe-call`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ record_url: item.record_url, mobile_number: item.to_number, call_id: item.id }),
-        });
-        if (!response.ok) throw new Error(await response.text());
-        const text = await response.text();
+        const text = await transcribeCall(item);
         newTranscripts[itemKey] = text;
       } catch (err: any) {
         const itemId = item.id || `item-${timelineData.findIndex(i => i === item)}`;
@@ -74,7 +74,7 @@ export type MessageType = 'whatsapp' | 'email' | 'call' | 'other';
 
 // Timeline event types
 export interface TimelineEvent {
-  type: 'whatsapp_pack' | 'email' | 'call' | 'lead_info';
+  type: 'whatsapp_pack' | 'email' | 'email_thread' | 'call' | 'lead_info';
   timestamp?: string;
   start_timestamp?: string;
   end_timestamp?: string;
@@ -120,6 +120,15 @@ export interface EmailEvent extends TimelineEvent {
   sender_type: 'agent' | 'student';
 }
 
+export interface EmailThread extends TimelineEvent {
+  type: 'email_thread';
+  start_timestamp: string;
+  end_timestamp: string;
+  subject: string;
+  message_count: number;
+  messages: Omit<EmailEvent, 'subject'>[];
+}
+
 export interface LeadInfoEvent extends TimelineEvent {
   type: 'lead_info';
   timestamp: string;
@@ -0,0 +1,1387 @@
+import os
+import glob
+import logging
+import sqlite3
+import threading
+import re
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Tuple, Union
+
+import json_codec
+from storage_codec import get_codec
+from lazy_json import open_json_array, sidecar_path
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to in-process locking only
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+LOCK_DIR = os.path.join(DATA_DIR, '.locks')
+# SQLite reads record an access only when the last one is older than this,
+# so most reads never take the write lock
+ACCESS_TOUCH_SECONDS = float(os.getenv('STORAGE_ACCESS_TOUCH_SECONDS', '3600'))
+
+_lead_locks: Dict[str, threading.RLock] = {}
+_lead_locks_guard = threading.Lock()
+_held_lead_locks = threading.local()
+
+
+@contextmanager
+def lead_lock(contact: str, lock_dir: str = LOCK_DIR):
+    """
+    Exclusive per-lead lock shared by threads and processes (flock on
+    <lock_dir>/<contact>.lock). Re-entrant within a thread so backend methods
+    can call each other while holding it.
+    """
+    path = os.path.join(lock_dir, f'{contact}.lock')
+    with _lead_locks_guard:
+        local_lock = _lead_locks.setdefault(path, threading.RLock())
+    with local_lock:
+        held = getattr(_held_lead_locks, 'paths', None)
+        if held is None:
+            held = _held_lead_locks.paths = set()
+        if path in held:
+            yield
+            return
+        os.makedirs(lock_dir, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            held.add(path)
+            try:
+                yield
+            finally:
+                held.discard(path)
+        finally:
+            os.close(fd)  # also releases the flock
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write via a temp file and rename so readers never see a partial file"""
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def contact_key(mobile_number: Optional[str] = None, email: Optional[str] = None) -> str:
+    """Storage key for a lead, matching the historical timeline_<key>.json naming"""
+    if mobile_number:
+        return str(mobile_number)
+    if email:
+        return email.replace('@', '_').replace('.', '_')
+    return 'unknown'
+
+
+def event_timestamp(event: Dict[str, Any]) -> Optional[str]:
+    """Sortable timestamp of a timeline event (packs use their first message)"""
+    return event.get('timestamp') or event.get('start_timestamp')
+
+
+def event_call_id(event: Dict[str, Any]) -> Optional[str]:
+    """Call ID of a call event as a string, or None for other event types"""
+    if event.get('type') == 'call' and event.get('id') is not None:
+        return str(event.get('id'))
+    return None
+
+
+def carry_over_transcripts(previous: Optional[List[Dict]], events: List[Dict]) -> List[Dict]:
+    """
+    Keep transcripts already attached to call events when a timeline is
+    regenerated from the source data, which never includes them.
+    """
+    if not previous or not any(event_call_id(e) and not e.get('transcript') for e in events):
+        return events
+    transcripts = {event_call_id(e): e['transcript'] for e in previous
+                   if event_call_id(e) and e.get('transcript')}
+    if transcripts:
+        for event in events:
+            call_id = event_call_id(event)
+            if call_id in transcripts and not event.get('transcript'):
+                event['transcript'] = transcripts[call_id]
+    return events
+
+
+_RECORDING_ID_RE = re.compile(r'/([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})\.(?:wav|mp3)(?:\?|$)')
+
+
+def recording_id(audio_url: str) -> str:
+    """
+    Plivo recording ID of an audio URL, so the Plivo record_url and the S3
+    URL derived from it dedupe to the same transcript. URLs without a
+    recording ID are used as-is.
+    """
+    match = _RECORDING_ID_RE.search(audio_url or '')
+    return match.group(1).lower() if match else (audio_url or '')
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+class StorageBackend:
+    """
+    Interface for persisting timelines, transcripts and summaries per lead.
+
+    All methods take the contact key produced by contact_key().
+    """
+    name = 'base'
+
+    def timeline_location(self, contact: str) -> str:
+        """On-disk path identifying a lead's timeline, used for access tracking and pins"""
+        return os.path.join(DATA_DIR, f'timeline_{contact}.json')
+
+    def save_timeline(self, contact: str, events: List[Dict]):
+        raise NotImplementedError
+
+    def load_timeline(self, contact: str) -> Optional[List[Dict]]:
+        raise NotImplementedError
+
+    def timeline_exists(self, contact: str) -> bool:
+        raise NotImplementedError
+
+    def timeline_version(self, contact: str) -> Optional[Tuple[Any, float]]:
+        """
+        Cheap (version token, last write time) of a stored timeline, or None
+        if there is none. The token changes on every write, so anything
+        derived from the timeline's content can be cached by it.
+        """
+        raise NotImplementedError
+
+    def load_events_between(self, contact: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[Dict]:
+        """Events within [start, end) by timestamp"""
+        return [e for e in self.load_timeline(contact) or []
+                if event_timestamp(e) and (not start or event_timestamp(e) >= start)
+                and (not end or event_timestamp(e) < end)]
+
+    def load_events_of_type(self, contact: str, event_type: str) -> List[Dict]:
+        """Only the events of one type, e.g. the lead_info record"""
+        return [e for e in self.load_timeline(contact) or [] if e.get('type') == event_type]
+
+    def event_index(self, contact: str) -> Optional[List[Tuple[Any, Optional[str], Optional[str]]]]:
+        """
+        (ref, type, timestamp) of every stored event in timeline order, or
+        None if there is no timeline. Backends answer from their index
+        without decoding events; pass refs to load_events_by_ref.
+        """
+        timeline = self.load_timeline(contact)
+        if timeline is None:
+            return None
+        return [(i, e.get('type'), event_timestamp(e)) for i, e in enumerate(timeline)]
+
+    def load_events_by_ref(self, contact: str, refs: List[Any]) -> List[Dict]:
+        """Events for refs from event_index, in the order given"""
+        timeline = self.load_timeline(contact) or []
+        return [timeline[i] for i in refs if 0 <= i < len(timeline)]
+
+    def append_events(self, contact: str, events: List[Dict]):
+        raise NotImplementedError
+
+    def attach_transcript(self, contact: str, call_id, transcript_text: str) -> bool:
+        return bool(self.attach_transcripts(contact, {str(call_id): transcript_text}))
+
+    def attach_transcripts(self, contact: str, transcripts: Dict[str, str]) -> List[str]:
+        """
+        Attach several transcripts (call ID -> text) to a lead's call events
+        in a single write.
+
+        Returns:
+            The call IDs that matched an event
+        """
+        raise NotImplementedError
+
+    def save_transcript(self, contact: str, serial: int, transcript_text: str,
+                        call_id=None, audio_url: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def find_transcript(self, call_id=None, audio_url: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def transcript_location(self, call_id=None, audio_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Index entry (contact, serial, location) of an existing transcript, or None"""
+        raise NotImplementedError
+
+    def allocate_serial(self, contact: str) -> int:
+        """Reserve the next transcript serial for a lead"""
+        raise NotImplementedError
+
+    def save_summary(self, contact: str, summary: Dict):
+        raise NotImplementedError
+
+    def load_summary(self, contact: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def summary_updated_at(self, contact: str) -> Optional[float]:
+        """Unix time the lead's summary was last saved, or None if it has none"""
+        raise NotImplementedError
+
+    def list_contacts(self) -> List[str]:
+        raise NotImplementedError
+
+    def delete_contact(self, contact: str) -> int:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class TranscriptIndex:
+    """
+    Persistent index of stored transcripts keyed by Plivo recording ID, plus
+    per-lead serial counters, so dedup checks and serial allocation are
+    single lookups instead of directory listings.
+
+    Entries are written in the same step as the transcript itself. Counters
+    are seeded once per lead from the transcripts already on disk.
+
+    Args:
+        db_path: SQLite file holding the index (may be shared with other tables)
+        seed_serial: Called as seed_serial(contact) the first time a lead is
+            seen; returns the highest serial already in use
+    """
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS transcript_index (
+        recording_id TEXT PRIMARY KEY,
+        audio_url TEXT,
+        contact TEXT NOT NULL,
+        serial INTEGER NOT NULL,
+        call_id TEXT,
+        location TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_transcript_index_call_id ON transcript_index (call_id);
+    CREATE INDEX IF NOT EXISTS idx_transcript_index_contact ON transcript_index (contact);
+    CREATE TABLE IF NOT EXISTS transcript_serials (
+        contact TEXT PRIMARY KEY,
+        next_serial INTEGER NOT NULL
+    );
+    '''
+
+    def __init__(self, db_path: str, seed_serial=None):
+        self.db_path = db_path
+        self.seed_serial = seed_serial or (lambda contact: 0)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def _ensure_counter(self, conn: sqlite3.Connection, contact: str):
+        row = conn.execute('SELECT 1 FROM transcript_serials WHERE contact = ?', (contact,)).fetchone()
+        if row is None:
+            conn.execute('INSERT INTO transcript_serials (contact, next_serial) VALUES (?, ?)',
+                         (contact, self.seed_serial(contact) + 1))
+
+    def allocate_serial(self, contact: str) -> int:
+        with _Transaction(self._conn()) as conn:
+            self._ensure_counter(conn, contact)
+            serial = conn.execute('SELECT next_serial FROM transcript_serials WHERE contact = ?',
+                                  (contact,)).fetchone()[0]
+            conn.execute('UPDATE transcript_serials SET next_serial = ? WHERE contact = ?', (serial + 1, contact))
+        return serial
+
+    def record(self, contact: str, serial: int, location: str, call_id=None,
+               audio_url: Optional[str] = None, conn: Optional[sqlite3.Connection] = None):
+        """
+        Index a stored transcript. Pass conn to write inside a transaction the
+        caller already holds.
+        """
+        if conn is None:
+            with _Transaction(self._conn()) as conn:
+                self.record(contact, serial, location, call_id, audio_url, conn)
+            return
+        self._ensure_counter(conn, contact)
+        conn.execute('UPDATE transcript_serials SET next_serial = MAX(next_serial, ?) WHERE contact = ?',
+                     (serial + 1, contact))
+        key = recording_id(audio_url) if audio_url else f'call:{call_id}' if call_id is not None else None
+        if key is None:
+            return
+        conn.execute(
+            'INSERT OR REPLACE INTO transcript_index '
+            '(recording_id, audio_url, contact, serial, call_id, location, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, audio_url, contact, serial, str(call_id) if call_id is not None else None, location, time.time()))
+
+    def lookup(self, call_id=None, audio_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        query = 'SELECT recording_id, audio_url, contact, serial, call_id, location FROM transcript_index'
+        row = None
+        if audio_url:
+            row = conn.execute(query + ' WHERE recording_id = ?', (recording_id(audio_url),)).fetchone()
+        if row is None and call_id is not None:
+            row = conn.execute(query + ' WHERE call_id = ?', (str(call_id),)).fetchone()
+        if row is None:
+            return None
+        keys = ('recording_id', 'audio_url', 'contact', 'serial', 'call_id', 'location')
+        return dict(zip(keys, row))
+
+    def forget(self, recording_key: str):
+        with _Transaction(self._conn()) as conn:
+            conn.execute('DELETE FROM transcript_index WHERE recording_id = ?', (recording_key,))
+
+    def forget_contact(self, contact: str, conn: Optional[sqlite3.Connection] = None):
+        """Drop a lead's entries (its serial counter is kept so serials are never reused)"""
+        if conn is None:
+            with _Transaction(self._conn()) as conn:
+                self.forget_contact(contact, conn)
+            return
+        conn.execute('DELETE FROM transcript_index WHERE contact = ?', (contact,))
+
+    def count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM transcript_index').fetchone()[0]
+
+
+class FileStorageBackend(StorageBackend):
+    """
+    Compatibility backend using the original loose-file layout:
+    data/timeline_<key>.json, data/transcripts/<key>_<serial>.txt and
+    data/summary_<key>.json.
+    """
+    name = 'file'
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self.transcripts_dir = os.path.join(data_dir, 'transcripts')
+        os.makedirs(self.transcripts_dir, exist_ok=True)
+        self.transcript_index = TranscriptIndex(os.path.join(self.transcripts_dir, 'index.sqlite3'),
+                                                self._highest_serial_on_disk)
+        self.lock_dir = os.path.join(data_dir, '.locks')
+        # contact -> ((mtime_ns, size) of the timeline file, {call_id: position})
+        self._call_positions: Dict[str, Tuple[Tuple[int, int], Dict[str, int]]] = {}
+
+    def lock(self, contact: str):
+        return lead_lock(contact, self.lock_dir)
+
+    def timeline_path(self, contact: str) -> str:
+        return os.path.join(self.data_dir, f'timeline_{contact}.json')
+
+    def transcript_path(self, contact: str, serial: int) -> str:
+        return os.path.join(self.transcripts_dir, f'{contact}_{serial}.txt')
+
+    def summary_path(self, contact: str) -> str:
+        return os.path.join(self.data_dir, f'summary_{contact}.json')
+
+    def save_timeline(self, contact: str, events: List[Dict]):
+        with self.lock(contact):
+            carry_over_transcripts(self.load_timeline(contact), events)
+            self._write_timeline(contact, events)
+
+    def _write_timeline(self, contact: str, events: List[Dict]):
+        _atomic_write(self.timeline_path(contact),
+                      json_codec.dumps_bytes(events, pretty=True))
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _call_index(self, contact: str, signature, timeline: List[Dict]) -> Dict[str, int]:
+        """call ID -> list position, reused while the timeline file is unchanged"""
+        cached = self._call_positions.get(contact)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        positions = {}
+        for position, event in enumerate(timeline):
+            call_id = event_call_id(event)
+            if call_id is not None:
+                positions.setdefault(call_id, position)
+        return positions
+
+    def load_timeline(self, contact: str) -> Optional[List[Dict]]:
+        path = self.timeline_path(contact)
+        if not os.path.exists(path):
+            return None
+        return json_codec.load_file(path)
+
+    def timeline_exists(self, contact: str) -> bool:
+        return os.path.exists(self.timeline_path(contact))
+
+    @staticmethod
+    def _file_version(path: str) -> Optional[Tuple[Any, float]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size), st.st_mtime
+
+    def timeline_version(self, contact: str) -> Optional[Tuple[Any, float]]:
+        return self._file_version(self.timeline_path(contact))
+
+    def load_events_between(self, contact: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[Dict]:
+        """Events within [start, end), decoding only those via the lazy offset index"""
+        timeline = open_json_array(self.timeline_path(contact))
+        if timeline is None:
+            return []
+        with timeline:
+            return timeline.between(start, end)
+
+    def load_events_of_type(self, contact: str, event_type: str) -> List[Dict]:
+        timeline = open_json_array(self.timeline_path(contact))
+        if timeline is None:
+            return []
+        with timeline:
+            return timeline.of_type(event_type)
+
+    def event_index(self, contact: str) -> Optional[List[Tuple[Any, Optional[str], Optional[str]]]]:
+        """Positions, types and timestamps straight from the lazy offset index"""
+        timeline = open_json_array(self.timeline_path(contact))
+        if timeline is None:
+            return None
+        with timeline:
+            return list(zip(range(len(timeline)), timeline.index.types, timeline.index.timestamps))
+
+    def load_events_by_ref(self, contact: str, refs: List[Any]) -> List[Dict]:
+        timeline = open_json_array(self.timeline_path(contact))
+        if timeline is None:
+            return []
+        with timeline:
+            return [timeline[i] for i in refs if 0 <= i < len(timeline)]
+
+    def append_events(self, contact: str, events: List[Dict]):
+        with self.lock(contact):
+            timeline = self.load_timeline(contact) or []
+            timeline.extend(events)
+            self._write_timeline(contact, timeline)
+
+    def attach_transcripts(self, contact: str, transcripts: Dict[str, str]) -> List[str]:
+        path = self.timeline_path(contact)
+        with self.lock(contact):
+            signature = self._signature(path)
+            timeline = self.load_timeline(contact)
+            if timeline is None:
+                return []
+            positions = self._call_index(contact, signature, timeline)
+            attached = []
+            for call_id, transcript_text in transcripts.items():
+                call_id = str(call_id)
+                position = positions.get(call_id)
+                if position is not None and (position >= len(timeline) or event_call_id(timeline[position]) != call_id):
+                    # Cached positions are stale (file rewritten behind our back)
+                    positions = self._call_index(contact, None, timeline)
+                    position = positions.get(call_id)
+                if position is None:
+                    continue
+                timeline[position]['transcript'] = transcript_text
+                attached.append(call_id)
+            if attached:
+                self._write_timeline(contact, timeline)
+                signature = self._signature(path)
+            self._call_positions[contact] = (signature, positions)
+            return attached
+
+    def _highest_serial_on_disk(self, contact: str) -> int:
+        """Seed for a lead's serial counter: the largest <contact>_<serial>.txt[.z] present"""
+        serials = [0]
+        prefix = f'{contact}_'
+        for path in glob.glob(os.path.join(self.transcripts_dir, f'{glob.escape(contact)}_*.txt*')):
+            name = os.path.basename(path)[len(prefix):].split('.', 1)[0]
+            if name.isdigit():
+                serials.append(int(name))
+        return max(serials)
+
+    def allocate_serial(self, contact: str) -> int:
+        return self.transcript_index.allocate_serial(contact)
+
+    def save_transcript(self, contact: str, serial: int, transcript_text: str,
+                        call_id=None, audio_url: Optional[str] = None) -> str:
+        path = self.transcript_path(contact, serial)
+        codec = get_codec()
+        if codec.enabled:
+            path += '.z'
+            data = codec.compress(transcript_text.encode('utf-8'))
+        else:
+            data = transcript_text.encode('utf-8')
+        # Write then rename so the index never points at a partial file
+        _atomic_write(path, data)
+        self.transcript_index.record(contact, serial, path, call_id=call_id, audio_url=audio_url)
+        return path
+
+    def load_transcript(self, contact: str, serial: int) -> Optional[str]:
+        """Read a transcript whether it was stored plain (.txt) or compressed (.txt.z)"""
+        path = self.transcript_path(contact, serial)
+        for candidate in (path, path + '.z'):
+            if os.path.exists(candidate):
+                return get_codec().read_file(candidate).decode('utf-8')
+        return None
+
+    def transcript_location(self, call_id=None, audio_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        entry = self.transcript_index.lookup(call_id=call_id, audio_url=audio_url)
+        if entry is not None and not os.path.exists(entry['location']):
+            # Evicted by storage cleanup since it was indexed
+            self.transcript_index.forget(entry['recording_id'])
+            return None
+        return entry
+
+    def find_transcript(self, call_id=None, audio_url: Optional[str] = None) -> Optional[str]:
+        entry = self.transcript_location(call_id=call_id, audio_url=audio_url)
+        if entry is None:
+            return None
+        try:
+            return get_codec().read_file(entry['location']).decode('utf-8')
+        except OSError:
+            return None
+
+    def save_summary(self, contact: str, summary: Dict):
+        _atomic_write(self.summary_path(contact),
+                      json_codec.dumps_bytes(summary, pretty=True))
+
+    def load_summary(self, contact: str) -> Optional[Dict]:
+        path = self.summary_path(contact)
+        if not os.path.exists(path):
+            return None
+        return json_codec.load_file(path)
+
+    def summary_updated_at(self, contact: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.summary_path(contact))
+        except OSError:
+            return None
+
+    def list_contacts(self) -> List[str]:
+        prefix_len = len('timeline_')
+        return [os.path.basename(p)[prefix_len:-len('.json')]
+                for p in glob.glob(os.path.join(self.data_dir, 'timeline_*.json'))]
+
+    def delete_contact(self, contact: str) -> int:
+        paths = [self.timeline_path(contact), sidecar_path(self.timeline_path(contact)), self.summary_path(contact)]
+        paths.extend(glob.glob(os.path.join(self.transcripts_dir, f'{contact}_*.txt')))
+        paths.extend(glob.glob(os.path.join(self.transcripts_dir, f'{contact}_*.txt.z')))
+        freed = 0
+        for path in paths:
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+        self.transcript_index.forget_contact(contact)
+        self._call_positions.pop(contact, None)
+        return freed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'timelines': len(glob.glob(os.path.join(self.data_dir, 'timeline_*.json'))),
+            'transcripts': len(glob.glob(os.path.join(self.transcripts_dir, '*.txt*'))),
+            'indexed_recordings': self.transcript_index.count(),
+            'summaries': len(glob.glob(os.path.join(self.data_dir, 'summary_*.json'))),
+        }
+
+
+class EventLogStorageBackend(FileStorageBackend):
+    """
+    Append-only JSONL event log per lead: data/events/timeline_<key>.jsonl.
+
+    Records are one JSON object per line:
+      {"op": "header", "generation": ...}   first line, identifies the log
+      {"op": "event", "event": {...}}        a timeline event
+      {"op": "patch", "call_id": ..., "set": {...}}  e.g. transcript attachment
+      {"op": "patch", "seq": n, "set": {...}, "unset": [...]}  n-th event changed
+
+    Attaching a transcript appends a small patch record instead of rewriting
+    the whole timeline. Saving a regenerated timeline appends its new events
+    and patches for the events that changed; the log is only rewritten when
+    events were removed or reordered. Once patches make up a large share of
+    the log it is compacted (patches folded into their events) via
+    temp-file-plus-rename. Appends, rewrites and compaction hold the
+    per-lead lock, so a compaction can never drop a patch appended by
+    another process.
+
+    A sidecar offset index (<log>.idx, tab separated "offset kind timestamp
+    call_id type"; seq patches keep their seq in the timestamp column)
+    allows range reads by timestamp and type without parsing the whole log.
+    Transcripts and summaries keep the file backend layout. Legacy
+    timeline_<key>.json files are migrated on first access and, once the
+    log is on disk, renamed to timeline_<key>.json.migrated, which neither
+    the file backend nor storage cleanup picks up.
+    """
+    name = 'eventlog'
+
+    def __init__(self, data_dir: str = DATA_DIR, compact_min_patches: int = 20,
+                 compact_patch_ratio: float = 0.25):
+        super().__init__(data_dir)
+        self.events_dir = os.path.join(data_dir, 'events')
+        self.compact_min_patches = compact_min_patches
+        self.compact_patch_ratio = compact_patch_ratio
+        os.makedirs(self.events_dir, exist_ok=True)
+
+    def log_path(self, contact: str) -> str:
+        return os.path.join(self.events_dir, f'timeline_{contact}.jsonl')
+
+    def timeline_location(self, contact: str) -> str:
+        return self.log_path(contact)
+
+    def index_path(self, contact: str) -> str:
+        return self.log_path(contact) + '.idx'
+
+    def _encode(self, record: Dict) -> bytes:
+        data = json_codec.dumps_bytes(record)
+        codec = get_codec()
+        if codec.enabled and record['op'] != 'header':
+            # Each record is its own frame so range reads decode only what they touch
+            return codec.compress(data)
+        return data + b'\n'
+
+    @staticmethod
+    def _index_line(offset: int, record: Dict) -> str:
+        if record['op'] == 'event':
+            event = record['event']
+            event_type = str(event.get('type') or '').replace('\t', ' ').replace('\n', ' ')
+            return f"{offset}\tE\t{event_timestamp(event) or ''}\t{event_call_id(event) or ''}\t{event_type}\n"
+        if record['op'] == 'patch':
+            return f"{offset}\tP\t{record.get('seq', '')}\t{record.get('call_id') or ''}\t\n"
+        return f"{offset}\tH\t{record.get('generation', '')}\t\t\n"
+
+    def _migrate_legacy(self, contact: str):
+        """Convert a legacy timeline_<key>.json into an event log, once"""
+        legacy = self.timeline_path(contact)
+        if not os.path.exists(legacy):
+            return
+        with self.lock(contact):
+            try:
+                if not os.path.exists(self.log_path(contact)):
+                    self._write_log(contact, json_codec.load_file(legacy))
+                    logging.info(f"Migrated {legacy} to event log")
+                # The log is fsynced; set the legacy copy aside so it is neither
+                # counted by cleanup nor read again if the log is evicted
+                os.replace(legacy, legacy + '.migrated')
+            except FileNotFoundError:
+                pass  # another worker migrated it first
+            except Exception as e:
+                logging.warning(f"Could not migrate legacy timeline {legacy}: {e}")
+
+    def _read_index(self, contact: str) -> List[Tuple[int, str, str, str, str]]:
+        """
+        Load the offset index, rebuilding it if it belongs to another log
+        generation (or predates the type column) and catching up on records
+        appended by other processes. Reading needs no lock; writing the
+        sidecar back takes the lead lock (see _store_index).
+        """
+        log_path = self.log_path(contact)
+        entries: List[Tuple[int, str, str, str, str]] = []
+        try:
+            with open(self.index_path(contact), 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    # Skip malformed lines and duplicates from racing catch-ups
+                    if len(parts) == 5 and parts[0].isdigit() and (not entries or int(parts[0]) > entries[-1][0]):
+                        entries.append((int(parts[0]), parts[1], parts[2], parts[3], parts[4]))
+        except FileNotFoundError:
+            pass
+        with open(log_path, 'rb') as log:
+            header = json_codec.loads(log.readline() or b'{}')
+            if not entries or entries[0][1] != 'H' or entries[0][2] != header.get('generation', ''):
+                entries, start = [], 0
+            else:
+                log.seek(entries[-1][0])
+                get_codec().read_record(log)
+                start = log.tell()
+            log.seek(start)
+            new_lines = []
+            codec = get_codec()
+            while True:
+                offset = log.tell()
+                line = codec.read_record(log)
+                if line is None:
+                    break  # end of log, or a record still being written
+                index_line = self._index_line(offset, json_codec.loads(line))
+                new_lines.append(index_line)
+                parts = index_line.rstrip('\n').split('\t')
+                entries.append((offset, parts[1], parts[2], parts[3], parts[4]))
+        if new_lines:
+            self._store_index(contact, header.get('generation', ''), new_lines, append=bool(start))
+        return entries
+
+    def _store_index(self, contact: str, generation: str, lines: List[str], append: bool):
+        """
+        Write index lines found by _read_index back to the sidecar, under the
+        lead lock. Nothing is written if the log was rewritten in the
+        meantime (its writer left a fresh index); a rebuilt index replaces
+        the old one atomically.
+        """
+        with self.lock(contact):
+            try:
+                with open(self.log_path(contact), 'rb') as log:
+                    current = json_codec.loads(log.readline() or b'{}').get('generation', '')
+            except FileNotFoundError:
+                return
+            if current != generation:
+                return
+            if append:
+                # Racing catch-ups may append the same lines twice; _read_index skips duplicates
+                with open(self.index_path(contact), 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            else:
+                _atomic_write(self.index_path(contact), ''.join(lines).encode('utf-8'))
+
+    def _append_records(self, contact: str, records: List[Dict]):
+        self._migrate_legacy(contact)
+        with self.lock(contact):
+            if not os.path.exists(self.log_path(contact)):
+                self._write_log(contact, [])
+            payload = b''.join(self._encode(r) for r in records)
+            fd = os.open(self.log_path(contact), os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
+            # Refresh the sidecar index with the new records
+            self._read_index(contact)
+
+    def save_timeline(self, contact: str, events: List[Dict]):
+        """
+        Store a regenerated timeline by appending what changed since the
+        stored one. Falls back to rewriting the log (as compaction does)
+        when that cannot be expressed as appended records.
+        """
+        self._migrate_legacy(contact)
+        with self.lock(contact):
+            stored = self.load_timeline(contact)
+            carry_over_transcripts(stored, events)
+            records = None
+            if stored is not None:
+                # Compare in stored form: datetimes and numpy values as the log holds them
+                records = self._diff_records(stored, json_codec.loads(json_codec.dumps_bytes(events)))
+            if records is None:
+                self._write_log(contact, events)
+            elif records:
+                self._append_records(contact, records)
+                self.maybe_compact(contact)
+
+    @staticmethod
+    def _diff_records(stored: List[Dict], events: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Records turning the stored events into events: seq patches for
+        changed events and event records for new ones at the end. None if
+        events were removed or reordered, or a change would move an event in
+        the offset index (timestamp, call ID or type).
+        """
+        if len(events) < len(stored):
+            return None
+        records = []
+        for seq, (old, new) in enumerate(zip(stored, events)):
+            if old == new:
+                continue
+            if (event_timestamp(old), event_call_id(old), old.get('type')) != \
+                    (event_timestamp(new), event_call_id(new), new.get('type')):
+                return None
+            record = {'op': 'patch', 'seq': seq,
+                      'set': {k: v for k, v in new.items() if k not in old or old[k] != v}}
+            unset = [k for k in old if k not in new]
+            if unset:
+                record['unset'] = unset
+            records.append(record)
+        records.extend({'op': 'event', 'event': e} for e in events[len(stored):])
+        return records
+
+    def _write_log(self, contact: str, events: List[Dict]):
+        log_path = self.log_path(contact)
+        generation = uuid.uuid4().hex
+        records = [{'op': 'header', 'generation': generation}]
+        records.extend({'op': 'event', 'event': e} for e in events)
+        tmp_log = f'{log_path}.{os.getpid()}.tmp'
+        tmp_idx = f'{self.index_path(contact)}.{os.getpid()}.tmp'
+        offset = 0
+        with open(tmp_log, 'wb') as log, open(tmp_idx, 'w', encoding='utf-8') as idx:
+            for record in records:
+                data = self._encode(record)
+                log.write(data)
+                idx.write(self._index_line(offset, record))
+                offset += len(data)
+            log.flush()
+            os.fsync(log.fileno())
+        os.replace(tmp_log, log_path)
+        os.replace(tmp_idx, self.index_path(contact))
+
+    def _scan(self, contact: str, offsets: Optional[List[int]] = None,
+              seqs: Optional[Dict[int, int]] = None) -> List[Dict]:
+        """
+        Read event records (all, or only those at the given offsets, whose
+        seq is given by offset in seqs) and apply the patch records read
+        along with them. Patches always follow the event they change.
+        """
+        events: Dict[int, Dict] = {}
+        call_patches: Dict[str, Dict] = {}
+        codec = get_codec()
+
+        def apply(offset: int, record: Dict):
+            if record['op'] == 'event':
+                events[len(events) if offsets is None else seqs[offset]] = record['event']
+            elif record['op'] == 'patch' and 'seq' in record:
+                event = events.get(record['seq'])
+                if event is not None:
+                    event.update(record['set'])
+                    for key in record.get('unset', ()):
+                        event.pop(key, None)
+            elif record['op'] == 'patch':
+                call_patches.setdefault(str(record['call_id']), {}).update(record['set'])
+
+        with open(self.log_path(contact), 'rb') as log:
+            if offsets is None:
+                while True:
+                    offset = log.tell()
+                    line = codec.read_record(log)
+                    if line is None:
+                        break
+                    apply(offset, json_codec.loads(line))
+            else:
+                for offset in sorted(offsets):
+                    log.seek(offset)
+                    apply(offset, json_codec.loads(codec.read_record(log)))
+        ordered = [events[seq] for seq in sorted(events)]
+        if call_patches:
+            for event in ordered:
+                call_id = event_call_id(event)
+                if call_id in call_patches:
+                    event.update(call_patches[call_id])
+        return ordered
+
+    def load_timeline(self, contact: str) -> Optional[List[Dict]]:
+        self._migrate_legacy(contact)
+        if not os.path.exists(self.log_path(contact)):
+            return None
+        return self._scan(contact)
+
+    def load_events_between(self, contact: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[Dict]:
+        """Events within [start, end), seeking straight to them via the offset index"""
+        self._migrate_legacy(contact)
+        if not os.path.exists(self.log_path(contact)):
+            return []
+        entries = self._read_index(contact)
+        event_entries = [e for e in entries if e[1] == 'E']
+        timestamps = [e[2] for e in event_entries]
+        if timestamps == sorted(timestamps):
+            lo = bisect_left(timestamps, start) if start else 0
+            hi = bisect_left(timestamps, end) if end else len(timestamps)
+            selected = event_entries[lo:hi]
+        else:
+            selected = [e for e in event_entries
+                        if (not start or e[2] >= start) and (not end or e[2] < end)]
+        return self._load_entries(contact, entries, selected)
+
+    def _load_entries(self, contact: str, entries, selected) -> List[Dict]:
+        """Decode the selected event entries with their patches applied"""
+        event_offsets = [e[0] for e in entries if e[1] == 'E']
+        seq_of = {offset: seq for seq, offset in enumerate(event_offsets)}
+        seqs = {e[0]: seq_of[e[0]] for e in selected}
+        wanted_calls = {e[3] for e in selected if e[3]}
+        wanted_seqs = {str(seq) for seq in seqs.values()}
+        offsets = list(seqs)
+        offsets.extend(e[0] for e in entries
+                       if e[1] == 'P' and ((e[3] and e[3] in wanted_calls) or (e[2] and e[2] in wanted_seqs)))
+        return self._scan(contact, offsets, seqs)
+
+    def timeline_exists(self, contact: str) -> bool:
+        return os.path.exists(self.log_path(contact)) or super().timeline_exists(contact)
+
+    def load_events_of_type(self, contact: str, event_type: str) -> List[Dict]:
+        self._migrate_legacy(contact)
+        if not os.path.exists(self.log_path(contact)):
+            return []
+        entries = self._read_index(contact)
+        return self._load_entries(contact, entries, [e for e in entries if e[1] == 'E' and e[4] == event_type])
+
+    def event_index(self, contact: str) -> Optional[List[Tuple[Any, Optional[str], Optional[str]]]]:
+        """Log offsets, types and timestamps from the sidecar index"""
+        self._migrate_legacy(contact)
+        if not os.path.exists(self.log_path(contact)):
+            return None
+        return [(e[0], e[4] or None, e[2] or None) for e in self._read_index(contact) if e[1] == 'E']
+
+    def load_events_by_ref(self, contact: str, refs: List[Any]) -> List[Dict]:
+        if not os.path.exists(self.log_path(contact)):
+            return []
+        entries = self._read_index(contact)
+        by_offset = {e[0]: e for e in entries if e[1] == 'E'}
+        return self._load_entries(contact, entries, [by_offset[r] for r in refs if r in by_offset])
+
+    def timeline_version(self, contact: str) -> Optional[Tuple[Any, float]]:
+        self._migrate_legacy(contact)
+        return self._file_version(self.log_path(contact))
+
+    def append_events(self, contact: str, events: List[Dict]):
+        self._append_records(contact, [{'op': 'event', 'event': e} for e in events])
+
+    def attach_transcripts(self, contact: str, transcripts: Dict[str, str]) -> List[str]:
+        self._migrate_legacy(contact)
+        with self.lock(contact):
+            if not os.path.exists(self.log_path(contact)):
+                return []
+            call_ids = {e[3] for e in self._read_index(contact) if e[1] == 'E' and e[3]}
+            records = [{'op': 'patch', 'call_id': str(call_id), 'set': {'transcript': text}}
+                       for call_id, text in transcripts.items() if str(call_id) in call_ids]
+            if not records:
+                return []
+            # One append for the whole batch
+            self._append_records(contact, records)
+            self.maybe_compact(contact)
+            return [r['call_id'] for r in records]
+
+    def maybe_compact(self, contact: str) -> bool:
+        """Fold patches into their events once they make up a large share of the log"""
+        entries = self._read_index(contact)
+        patch_count = sum(1 for e in entries if e[1] == 'P')
+        event_count = sum(1 for e in entries if e[1] == 'E')
+        if patch_count < max(self.compact_min_patches, self.compact_patch_ratio * event_count):
+            return False
+        self.compact(contact)
+        return True
+
+    def compact(self, contact: str):
+        """Rewrite the log with all patches applied"""
+        with self.lock(contact):
+            events = self.load_timeline(contact)
+            if events is not None:
+                self._write_log(contact, events)
+                logging.info(f"Compacted event log for {contact} ({len(events)} events)")
+
+    def list_contacts(self) -> List[str]:
+        prefix_len = len('timeline_')
+        contacts = set(super().list_contacts())
+        contacts.update(os.path.basename(p)[prefix_len:-len('.jsonl')]
+                        for p in glob.glob(os.path.join(self.events_dir, 'timeline_*.jsonl')))
+        return sorted(contacts)
+
+    def delete_contact(self, contact: str) -> int:
+        freed = super().delete_contact(contact)
+        for path in (self.log_path(contact), self.index_path(contact)):
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+        return freed
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['backend'] = self.name
+        stats['timelines'] = len(self.list_contacts())
+        stats['event_logs'] = len(glob.glob(os.path.join(self.events_dir, 'timeline_*.jsonl')))
+        return stats
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """
+    Embedded SQLite backend indexed by contact, event timestamp and call ID.
+
+    The database runs in WAL mode so readers in every gunicorn worker proceed
+    while one writer commits. Connections are kept per thread.
+    """
+    name = 'sqlite'
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS contacts (
+        contact TEXT PRIMARY KEY,
+        updated_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        contact TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        type TEXT,
+        timestamp TEXT,
+        call_id TEXT,
+        body TEXT NOT NULL,
+        PRIMARY KEY (contact, seq)
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (contact, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_events_call_id ON events (call_id);
+    CREATE TABLE IF NOT EXISTS transcripts (
+        contact TEXT NOT NULL,
+        serial INTEGER NOT NULL,
+        call_id TEXT,
+        audio_url TEXT,
+        text TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (contact, serial)
+    );
+    CREATE INDEX IF NOT EXISTS idx_transcripts_call_id ON transcripts (call_id);
+    CREATE INDEX IF NOT EXISTS idx_transcripts_audio_url ON transcripts (audio_url);
+    CREATE TABLE IF NOT EXISTS summaries (
+        contact TEXT PRIMARY KEY,
+        body TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    '''
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(DATA_DIR, 'store.sqlite3')
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+        self.transcript_index = TranscriptIndex(self.db_path, self._highest_serial)
+        self._backfill_transcript_index()
+
+    def _backfill_transcript_index(self):
+        """Index transcripts stored before the recording-ID index existed"""
+        if self.transcript_index.count():
+            return
+        rows = self._conn().execute('SELECT contact, serial, call_id, audio_url FROM transcripts').fetchall()
+        if not rows:
+            return
+        with self._transaction() as conn:
+            for contact, serial, call_id, audio_url in rows:
+                self.transcript_index.record(contact, serial, f'sqlite://transcripts/{contact}/{serial}',
+                                             call_id=call_id, audio_url=audio_url, conn=conn)
+        logging.info(f"Indexed {len(rows)} existing transcripts by recording ID")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def _highest_serial(self, contact: str) -> int:
+        row = self._conn().execute('SELECT MAX(serial) FROM transcripts WHERE contact = ?', (contact,)).fetchone()
+        return row[0] or 0
+
+    @staticmethod
+    def _pack(text: str) -> Union[str, bytes]:
+        """Store bodies as compressed BLOBs when compression is enabled"""
+        codec = get_codec()
+        return codec.compress(text.encode('utf-8')) if codec.enabled else text
+
+    @staticmethod
+    def _unpack(value: Union[str, bytes]) -> str:
+        if isinstance(value, bytes):
+            return get_codec().decode(value).decode('utf-8')
+        return value
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def _snapshot(self):
+        """Read transaction for reads spanning several statements"""
+        return _Transaction(self._conn(), 'BEGIN')
+
+    def _touch_contact(self, conn: sqlite3.Connection, contact: str):
+        """Mark a contact as written (and accessed), inside the writing transaction"""
+        now = time.time()
+        conn.execute(
+            'INSERT INTO contacts (contact, updated_at, accessed_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(contact) DO UPDATE SET updated_at = excluded.updated_at, accessed_at = excluded.accessed_at',
+            (contact, now, now))
+
+    def _record_access(self, conn: sqlite3.Connection, contact: str, accessed_at: float):
+        """
+        Record a read for LRU cleanup, but only once per ACCESS_TOUCH_SECONDS:
+        an UPDATE takes the database write lock, which would serialize reads
+        across workers. Cleanup works in days, so the coarser time is enough.
+        """
+        now = time.time()
+        if now - accessed_at < ACCESS_TOUCH_SECONDS:
+            return
+        try:
+            conn.execute('UPDATE contacts SET accessed_at = ? WHERE contact = ? AND accessed_at < ?',
+                         (now, contact, now - ACCESS_TOUCH_SECONDS))
+        except sqlite3.OperationalError as e:
+            logging.debug(f"Could not record access for {contact}: {e}")
+
+    def _insert_events(self, conn: sqlite3.Connection, contact: str, events: List[Dict], start_seq: int):
+        conn.executemany(
+            'INSERT INTO events (contact, seq, type, timestamp, call_id, body) VALUES (?, ?, ?, ?, ?, ?)',
+            [(contact, start_seq + i, e.get('type'), event_timestamp(e), event_call_id(e),
+              self._pack(json_codec.dumps(e))) for i, e in enumerate(events)])
+
+    def save_timeline(self, contact: str, events: List[Dict]):
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT body FROM events WHERE contact = ? AND call_id IS NOT NULL',
+                                (contact,)).fetchall()
+            carry_over_transcripts([json_codec.loads(self._unpack(body)) for (body,) in rows], events)
+            conn.execute('DELETE FROM events WHERE contact = ?', (contact,))
+            self._insert_events(conn, contact, events, 0)
+            self._touch_contact(conn, contact)
+
+    def load_timeline(self, contact: str) -> Optional[List[Dict]]:
+        # One snapshot, so a concurrent save_timeline cannot land between the two reads
+        with self._snapshot() as conn:
+            row = conn.execute('SELECT accessed_at FROM contacts WHERE contact = ?', (contact,)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute('SELECT body FROM events WHERE contact = ? ORDER BY seq', (contact,)).fetchall()
+        # After the snapshot ends: an UPDATE inside it could fail to upgrade to a write
+        self._record_access(conn, contact, row[0])
+        return [json_codec.loads(self._unpack(body)) for (body,) in rows]
+
+    def timeline_exists(self, contact: str) -> bool:
+        row = self._conn().execute('SELECT 1 FROM contacts WHERE contact = ?', (contact,)).fetchone()
+        return row is not None
+
+    def timeline_version(self, contact: str) -> Optional[Tuple[Any, float]]:
+        row = self._conn().execute('SELECT updated_at FROM contacts WHERE contact = ?', (contact,)).fetchone()
+        return (row[0], row[0]) if row else None
+
+    def load_events_between(self, contact: str, start: Optional[str] = None,
+                            end: Optional[str] = None) -> List[Dict]:
+        """Events for a contact within [start, end) using the timestamp index"""
+        query = 'SELECT body FROM events WHERE contact = ?'
+        params: List[Any] = [contact]
+        if start:
+            query += ' AND timestamp >= ?'
+            params.append(start)
+        if end:
+            query += ' AND timestamp < ?'
+            params.append(end)
+        rows = self._conn().execute(query + ' ORDER BY seq', params).fetchall()
+        return [json_codec.loads(self._unpack(body)) for (body,) in rows]
+
+    def load_events_of_type(self, contact: str, event_type: str) -> List[Dict]:
+        rows = self._conn().execute('SELECT body FROM events WHERE contact = ? AND type = ? ORDER BY seq',
+                                    (contact, event_type)).fetchall()
+        return [json_codec.loads(self._unpack(body)) for (body,) in rows]
+
+    def event_index(self, contact: str) -> Optional[List[Tuple[Any, Optional[str], Optional[str]]]]:
+        """Sequence numbers, types and timestamps without reading event bodies"""
+        with self._snapshot() as conn:
+            if conn.execute('SELECT 1 FROM contacts WHERE contact = ?', (contact,)).fetchone() is None:
+                return None
+            return conn.execute('SELECT seq, type, timestamp FROM events WHERE contact = ? ORDER BY seq',
+                                (contact,)).fetchall()
+
+    def load_events_by_ref(self, contact: str, refs: List[Any]) -> List[Dict]:
+        bodies = {}
+        with self._snapshot() as conn:
+            for i in range(0, len(refs), 500):
+                chunk = refs[i:i + 500]
+                rows = conn.execute(f'SELECT seq, body FROM events WHERE contact = ? AND seq IN '
+                                    f'({",".join("?" * len(chunk))})', [contact, *chunk]).fetchall()
+                bodies.update(rows)
+        return [json_codec.loads(self._unpack(bodies[r])) for r in refs if r in bodies]
+
+    def append_events(self, contact: str, events: List[Dict]):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT COALESCE(MAX(seq), -1) FROM events WHERE contact = ?', (contact,)).fetchone()
+            self._insert_events(conn, contact, events, row[0] + 1)
+            self._touch_contact(conn, contact)
+
+    def attach_transcripts(self, contact: str, transcripts: Dict[str, str]) -> List[str]:
+        attached = []
+        with self._transaction() as conn:
+            for call_id, transcript_text in transcripts.items():
+                row = conn.execute('SELECT seq, body FROM events WHERE call_id = ? AND contact = ?',
+                                   (str(call_id), contact)).fetchone()
+                if row is None:
+                    continue
+                seq, body = row
+                event = json_codec.loads(self._unpack(body))
+                event['transcript'] = transcript_text
+                conn.execute('UPDATE events SET body = ? WHERE contact = ? AND seq = ?',
+                             (self._pack(json_codec.dumps(event)), contact, seq))
+                attached.append(str(call_id))
+            if attached:
+                self._touch_contact(conn, contact)
+        return attached
+
+    def save_transcript(self, contact: str, serial: int, transcript_text: str,
+                        call_id=None, audio_url: Optional[str] = None) -> str:
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO transcripts (contact, serial, call_id, audio_url, text, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (contact, serial, str(call_id) if call_id is not None else None, audio_url,
+                 self._pack(transcript_text), time.time()))
+            location = f'sqlite://transcripts/{contact}/{serial}'
+            self.transcript_index.record(contact, serial, location, call_id=call_id,
+                                         audio_url=audio_url, conn=conn)
+        return location
+
+    def allocate_serial(self, contact: str) -> int:
+        return self.transcript_index.allocate_serial(contact)
+
+    def transcript_location(self, call_id=None, audio_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.transcript_index.lookup(call_id=call_id, audio_url=audio_url)
+
+    def find_transcript(self, call_id=None, audio_url: Optional[str] = None) -> Optional[str]:
+        entry = self.transcript_location(call_id=call_id, audio_url=audio_url)
+        if entry is None:
+            return None
+        row = self._conn().execute('SELECT text FROM transcripts WHERE contact = ? AND serial = ?',
+                                   (entry['contact'], entry['serial'])).fetchone()
+        return self._unpack(row[0]) if row else None
+
+    def save_summary(self, contact: str, summary: Dict):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO summaries (contact, body, updated_at) VALUES (?, ?, ?)',
+                         (contact, self._pack(json_codec.dumps(summary)), time.time()))
+
+    def load_summary(self, contact: str) -> Optional[Dict]:
+        row = self._conn().execute('SELECT body FROM summaries WHERE contact = ?', (contact,)).fetchone()
+        return json_codec.loads(self._unpack(row[0])) if row else None
+
+    def summary_updated_at(self, contact: str) -> Optional[float]:
+        row = self._conn().execute('SELECT updated_at FROM summaries WHERE contact = ?', (contact,)).fetchone()
+        return row[0] if row else None
+
+    def list_contacts(self) -> List[str]:
+        rows = self._conn().execute('SELECT contact FROM contacts ORDER BY accessed_at').fetchall()
+        return [contact for (contact,) in rows]
+
+    def contacts_by_access(self) -> List[Dict[str, Any]]:
+        """Contacts with their stored size, least recently accessed first"""
+        rows = self._conn().execute('''
+            SELECT c.contact, c.accessed_at,
+                   COALESCE((SELECT SUM(LENGTH(body)) FROM events e WHERE e.contact = c.contact), 0)
+                 + COALESCE((SELECT SUM(LENGTH(text)) FROM transcripts t WHERE t.contact = c.contact), 0)
+                 + COALESCE((SELECT LENGTH(body) FROM summaries s WHERE s.contact = c.contact), 0)
+            FROM contacts c ORDER BY c.accessed_at
+        ''').fetchall()
+        return [{'contact': c, 'accessed_at': a, 'size_bytes': s} for c, a, s in rows]
+
+    def delete_contact(self, contact: str) -> int:
+        with self._transaction() as conn:
+            freed = 0
+            for query in ('SELECT COALESCE(SUM(LENGTH(body)), 0) FROM events WHERE contact = ?',
+                          'SELECT COALESCE(SUM(LENGTH(text)), 0) FROM transcripts WHERE contact = ?',
+                          'SELECT COALESCE(SUM(LENGTH(body)), 0) FROM summaries WHERE contact = ?'):
+                freed += conn.execute(query, (contact,)).fetchone()[0]
+            for table in ('events', 'transcripts', 'summaries', 'contacts'):
+                conn.execute(f'DELETE FROM {table} WHERE contact = ?', (contact,))
+            self.transcript_index.forget_contact(contact, conn)
+        return freed
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        size = 0
+        for suffix in ('', '-wal'):
+            try:
+                size += os.path.getsize(self.db_path + suffix)
+            except OSError:
+                pass
+        return {
+            'backend': self.name,
+            'timelines': conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0],
+            'events': conn.execute('SELECT COUNT(*) FROM events').fetchone()[0],
+            'transcripts': conn.execute('SELECT COUNT(*) FROM transcripts').fetchone()[0],
+            'indexed_recordings': self.transcript_index.count(),
+            'summaries': conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0],
+            'db_size_mb': size / (1024 * 1024),
+        }
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT/ROLLBACK so concurrent writers serialize
+    cleanly. With begin='BEGIN' it is a read snapshot instead: every SELECT
+    inside sees the database as of the first one, without taking the write
+    lock.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, begin: str = 'BEGIN IMMEDIATE'):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+class TranscriptAttachBatcher:
+    """
+    Group commit for transcript attachments.
+
+    The first caller for a lead waits `delay` seconds, then writes every
+    attachment queued for that lead in the meantime with a single
+    attach_transcripts() call; the other callers block until that write
+    finishes. Under a burst of completions this turns N timeline writes per
+    lead into one.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None, delay: float = 0.2):
+        self._backend = backend
+        self.delay = delay
+        self._pending: Dict[str, List[Tuple[str, str, '_AttachWaiter']]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend or get_storage_backend()
+
+    def attach(self, contact: str, call_id, transcript_text: str) -> bool:
+        """Attach a transcript, batched with concurrent attachments; True if it matched an event"""
+        waiter = _AttachWaiter()
+        with self._lock:
+            batch = self._pending.setdefault(contact, [])
+            batch.append((str(call_id), transcript_text, waiter))
+            leader = len(batch) == 1
+        if leader:
+            time.sleep(self.delay)
+            with self._lock:
+                batch = self._pending.pop(contact)
+            try:
+                attached = set(self.backend.attach_transcripts(
+                    contact, {call_id: text for call_id, text, _ in batch}))
+                for call_id, _, w in batch:
+                    w.done(call_id in attached)
+            except Exception as e:
+                for _, _, w in batch:
+                    w.done(False, e)
+        return waiter.result()
+
+
+class _AttachWaiter:
+    def __init__(self):
+        self._event = threading.Event()
+        self._matched = False
+        self._error: Optional[Exception] = None
+
+    def done(self, matched: bool, error: Optional[Exception] = None):
+        self._matched, self._error = matched, error
+        self._event.set()
+
+    def result(self) -> bool:
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._matched
+
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Process-wide storage backend selected by the STORAGE_BACKEND env var:
+    "eventlog" (default), "sqlite", or "file" for the legacy JSON layout.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.getenv('STORAGE_BACKEND', 'eventlog').lower()
+                if kind == 'sqlite':
+                    _backend = SQLiteStorageBackend(os.getenv('STORAGE_SQLITE_PATH'))
+                elif kind == 'file':
+                    _backend = FileStorageBackend()
+                else:
+                    if kind != 'eventlog':
+                        logging.warning(f"Unknown STORAGE_BACKEND={kind}, falling back to eventlog backend")
+                    _backend = EventLogStorageBackend()
+                logging.info(f"Using {_backend.name} storage backend")
+    return _backend
@@ -0,0 +1,262 @@
+import os
+import glob
+import logging
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import List, Dict, Optional, Tuple, BinaryIO
+
+try:
+    import zstandard as zstd
+except ImportError:  # optional dependency, zlib is always available
+    zstd = None
+
+import json_codec
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DICT_DIR = os.path.join(DATA_DIR, 'codec')
+
+# Frames start with this marker so compressed and plain JSON records can be
+# mixed in one file: b"Z<codec>:<dict_id>:<length>\n" + payload + b"\n"
+FRAME_MARKER = b'Z'
+ZLIB_MAX_DICT = 32 * 1024  # deflate window size
+# How long the current dictionary ID is trusted before re-reading it, so a
+# dictionary trained by another process is picked up without file I/O per record
+DICT_RECHECK_SECONDS = 60
+
+
+class StorageCodec:
+    """
+    Optional compression for stored timelines and transcripts.
+
+    Each record is compressed independently so readers can decode only the
+    records they need (lazy decompression); stats and listings work on file
+    names, sizes and the offset index and never touch bodies. A shared
+    dictionary trained on the transcript corpus makes small records compress
+    well; every frame records the dictionary it was written with, so
+    retraining never breaks older data.
+    """
+
+    def __init__(self, name: str = 'none', level: int = 6, dict_dir: str = DICT_DIR):
+        if name == 'zstd' and zstd is None:
+            logging.warning("zstandard is not installed, falling back to zlib compression")
+            name = 'zlib'
+        if name not in ('none', 'zstd', 'zlib'):
+            logging.warning(f"Unknown compression codec {name}, storing uncompressed")
+            name = 'none'
+        self.name = name
+        self.level = level
+        self.dict_dir = dict_dir
+        self._dicts: Dict[Tuple[str, str], bytes] = {}
+        self._current: Dict[str, Tuple[str, float]] = {}  # codec -> (dict ID, monotonic time read)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.name != 'none'
+
+    # --- Dictionaries ---
+
+    def _dict_path(self, codec: str, dict_id: str) -> str:
+        return os.path.join(self.dict_dir, f'{codec}_{dict_id}.dict')
+
+    def _current_path(self, codec: str) -> str:
+        return os.path.join(self.dict_dir, f'current_{codec}')
+
+    def current_dict_id(self, codec: Optional[str] = None) -> str:
+        """
+        ID of the dictionary new records are written with ('0' for none),
+        re-read from disk at most every DICT_RECHECK_SECONDS
+        """
+        codec = codec or self.name
+        now = time.monotonic()
+        cached = self._current.get(codec)
+        if cached is not None and now - cached[1] < DICT_RECHECK_SECONDS:
+            return cached[0]
+        try:
+            with open(self._current_path(codec), 'r') as f:
+                dict_id = f.read().strip() or '0'
+        except OSError:
+            dict_id = '0'
+        self._current[codec] = (dict_id, now)
+        return dict_id
+
+    def _load_dict(self, codec: str, dict_id: str) -> Optional[bytes]:
+        if dict_id == '0':
+            return None
+        key = (codec, dict_id)
+        if key not in self._dicts:
+            with self._lock:
+                with open(self._dict_path(codec, dict_id), 'rb') as f:
+                    self._dicts[key] = f.read()
+        return self._dicts[key]
+
+    def train_dictionary(self, samples: List[bytes], size: int = 64 * 1024) -> str:
+        """
+        Train a shared dictionary from sample records and make it current.
+
+        zstd uses its own trainer; for zlib the dictionary is built from the
+        most frequent phrases (speaker labels, greetings, boilerplate), with
+        the most common placed last where deflate finds them cheapest.
+
+        Returns:
+            The new dictionary ID
+        """
+        if not self.enabled or not samples:
+            return '0'
+        if self.name == 'zstd':
+            trained = zstd.train_dictionary(size, samples)
+            data, dict_id = trained.as_bytes(), str(trained.dict_id())
+        else:
+            data = self._build_zlib_dictionary(samples, min(size, ZLIB_MAX_DICT))
+            dict_id = str(zlib.adler32(data))
+        os.makedirs(self.dict_dir, exist_ok=True)
+        with open(self._dict_path(self.name, dict_id), 'wb') as f:
+            f.write(data)
+        tmp = f'{self._current_path(self.name)}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(dict_id)
+        os.replace(tmp, self._current_path(self.name))
+        self._current[self.name] = (dict_id, time.monotonic())
+        logging.info(f"Trained {self.name} dictionary {dict_id} ({len(data)} bytes) from {len(samples)} samples")
+        return dict_id
+
+    @staticmethod
+    def _build_zlib_dictionary(samples: List[bytes], size: int) -> bytes:
+        counts: Counter = Counter()
+        for sample in samples:
+            words = sample.decode('utf-8', errors='ignore').split(' ')
+            for n in (3, 5, 8):
+                for i in range(0, max(len(words) - n + 1, 0)):
+                    counts[' '.join(words[i:i + n])] += 1
+        phrases, total = [], 0
+        for phrase, count in counts.most_common():
+            if count < 2:
+                break
+            encoded = (phrase + ' ').encode('utf-8')
+            if total + len(encoded) > size:
+                break
+            phrases.append(encoded)
+            total += len(encoded)
+        return b''.join(reversed(phrases))
+
+    # --- Frames ---
+
+    def compress(self, data: bytes) -> bytes:
+        """Return a self-describing frame, or data unchanged when disabled"""
+        if not self.enabled:
+            return data
+        dict_id = self.current_dict_id()
+        zdict = self._load_dict(self.name, dict_id)
+        if self.name == 'zstd':
+            cdict = zstd.ZstdCompressionDict(zdict) if zdict else None
+            payload = zstd.ZstdCompressor(level=self.level, dict_data=cdict).compress(data)
+        else:
+            comp = zlib.compressobj(self.level, zdict=zdict) if zdict else zlib.compressobj(self.level)
+            payload = comp.compress(data) + comp.flush()
+        return FRAME_MARKER + f'{self.name}:{dict_id}:{len(payload)}\n'.encode('ascii') + payload + b'\n'
+
+    def decompress_frame(self, header: bytes, payload: bytes) -> bytes:
+        codec, dict_id, _ = header[1:].decode('ascii').strip().split(':')
+        zdict = self._load_dict(codec, dict_id)
+        if codec == 'zstd':
+            if zstd is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed records")
+            cdict = zstd.ZstdCompressionDict(zdict) if zdict else None
+            return zstd.ZstdDecompressor(dict_data=cdict).decompress(payload)
+        decomp = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return decomp.decompress(payload) + decomp.flush()
+
+    @staticmethod
+    def _frame_length(header: bytes) -> Optional[int]:
+        """Payload length if header is a frame header written by compress(), else None"""
+        if not header.startswith(FRAME_MARKER):
+            return None
+        try:
+            codec, dict_id, length = header[1:].decode('ascii').strip().split(':')
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if codec not in ('zstd', 'zlib') or not dict_id.isdigit() or not length.isdigit():
+            return None
+        return int(length)
+
+    def decode(self, data: bytes) -> bytes:
+        """Decode a whole blob that may or may not be a frame"""
+        header, _, rest = data.partition(b'\n')
+        length = self._frame_length(header)
+        if length is None:
+            return data
+        return self.decompress_frame(header, rest[:length])
+
+    def read_file(self, path: str) -> bytes:
+        """Contents of a stored file: .z files are decoded, anything else is returned as is"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        return self.decode(data) if path.endswith('.z') else data
+
+    def read_record(self, f: BinaryIO) -> Optional[bytes]:
+        """
+        Read one record (a plain JSON line or a frame) from a log file.
+
+        Returns None at end of file or on a partially written record.
+        """
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            return None
+        if not line.startswith(FRAME_MARKER):
+            return line
+        length = int(line.decode('ascii').rsplit(':', 1)[1])
+        payload = f.read(length + 1)
+        if len(payload) != length + 1:
+            return None
+        return self.decompress_frame(line, payload[:-1])
+
+
+_codec: Optional[StorageCodec] = None
+
+
+def get_codec() -> StorageCodec:
+    """Process-wide codec selected by STORAGE_COMPRESSION (none, zstd or zlib)"""
+    global _codec
+    if _codec is None:
+        _codec = StorageCodec(os.getenv('STORAGE_COMPRESSION', 'none').lower(),
+                              int(os.getenv('STORAGE_COMPRESSION_LEVEL', '6')))
+    return _codec
+
+
+def collect_training_samples(data_dir: str = DATA_DIR, limit: int = 5000) -> List[bytes]:
+    """Transcripts and timeline events from the local corpus, as training samples"""
+    from storage_backend import get_storage_backend  # imports this module
+    codec = get_codec()
+    samples: List[bytes] = []
+    for path in glob.glob(os.path.join(data_dir, 'transcripts', '*.txt*')):
+        samples.append(codec.read_file(path))
+    # Timelines through the configured backend, whatever layout it stores them in
+    backend = get_storage_backend()
+    for contact in backend.list_contacts():
+        if len(samples) >= limit:
+            break
+        try:
+            events = backend.load_timeline(contact) or []
+            # Encoded exactly as the backends store them, so the dictionary matches real records
+            samples.extend(json_codec.dumps_bytes(e) for e in events)
+        except Exception as e:
+            logging.warning(f"Skipping timeline of {contact} for dictionary training: {e}")
+    return samples[:limit]
+
+
+if __name__ == "__main__":
+    # Train a shared dictionary on the local transcript/timeline corpus:
+    #   STORAGE_COMPRESSION=zstd python storage_codec.py
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    codec = get_codec()
+    if not codec.enabled:
+        logging.error("Set STORAGE_COMPRESSION=zstd or zlib to train a dictionary")
+    else:
+        samples = collect_training_samples()
+        dict_id = codec.train_dictionary(samples)
+        raw = sum(len(s) for s in samples)
+        packed = sum(len(codec.compress(s)) for s in samples)
+        logging.info(f"Dictionary {dict_id}: {raw} bytes -> {packed} bytes ({packed / max(raw, 1):.1%})")
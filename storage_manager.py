@@ -1,31 +1,61 @@
 import os
 import json
 import logging
-import shutil
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import glob
 
-class StorageManager:
-    def __init__(self, max_age_days: int = 7, max_files_per_mobile: int = 50):
+from storage_backend import get_storage_backend
+from lru_files import LRUFileStore
+
+class StorageManager(LRUFileStore):
+    def __init__(self, max_age_days: int = 7, max_files_per_mobile: int = 50,
+                 capacity_mb: Optional[float] = None, high_water: float = 0.9,
+                 low_water: float = 0.75, pin_ttl_seconds: int = 3600):
         """
         Initialize storage manager with cleanup policies
         
         Args:
             max_age_days: Files older than this will be deleted
             max_files_per_mobile: Maximum files to keep per mobile number
+            capacity_mb: Disk budget for managed files; enables LRU eviction when set
+            high_water: Fraction of capacity_mb that triggers LRU eviction
+            low_water: Fraction of capacity_mb that LRU eviction frees down to
+            pin_ttl_seconds: Pins older than this are treated as stale (crashed worker)
         """
         self.max_age_days = max_age_days
         self.max_files_per_mobile = max_files_per_mobile
+        if capacity_mb is None and os.getenv('STORAGE_CAPACITY_MB'):
+            capacity_mb = float(os.getenv('STORAGE_CAPACITY_MB'))
+        self.capacity_mb = capacity_mb
+        self.high_water = high_water
+        self.low_water = min(low_water, high_water)
+        self.pin_ttl_seconds = pin_ttl_seconds
+        self._bytes_freed = 0
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.data_dir = os.path.join(self.base_dir, 'data')
         self.timeline_dir = os.path.join(self.base_dir, 'data')
+        self.pin_dir = os.path.join(self.data_dir, '.pins')
         
         # Ensure directories exist
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.timeline_dir, exist_ok=True)
+        os.makedirs(self.pin_dir, exist_ok=True)
         
-        logging.info(f"StorageManager initialized with max_age_days={max_age_days}, max_files_per_mobile={max_files_per_mobile}")
+        logging.info(f"StorageManager initialized with max_age_days={max_age_days}, max_files_per_mobile={max_files_per_mobile}, capacity_mb={capacity_mb}")
+    
+    def _timeline_files(self) -> List[str]:
+        """Timeline files in both the legacy JSON and the event log layout"""
+        files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+        files.extend(glob.glob(os.path.join(self.timeline_dir, "events", "timeline_*.jsonl")))
+        return files
+    
+    def _tracked_paths(self) -> List[str]:
+        paths = self._timeline_files()
+        paths.extend(glob.glob(os.path.join(self.data_dir, "*summary*.json")))
+        paths.extend(glob.glob(os.path.join(self.data_dir, "*summary*.txt")))
+        paths.extend(glob.glob(os.path.join(self.data_dir, "Lead*")))
+        return paths
     
     def cleanup_old_files(self) -> Dict[str, int]:
         """
@@ -38,8 +68,11 @@ class StorageManager:
             'timeline_files_deleted': 0,
             'lead_files_deleted': 0,
             'summary_files_deleted': 0,
+            'backend_leads_deleted': 0,
+            'lru_items_evicted': 0,
             'total_space_freed_mb': 0
         }
+        self._bytes_freed = 0
         
         try:
             # Clean up old timeline files
@@ -51,6 +84,12 @@ class StorageManager:
             # Clean up old summary files
             stats['summary_files_deleted'] = self._cleanup_summary_files()
             
+            # Clean up leads held in an indexed backend (SQLite)
+            stats['backend_leads_deleted'] = self._cleanup_backend_leads()
+            
+            # Evict least-recently-used items if still above the high-water mark
+            stats['lru_items_evicted'] = self.evict_lru()['items_evicted']
+            
             # Calculate space freed
             stats['total_space_freed_mb'] = self._calculate_space_freed()
             
@@ -59,23 +98,25 @@ class StorageManager:
             
         except Exception as e:
             logging.error(f"Storage cleanup failed: {e}")
+            stats['total_space_freed_mb'] = self._calculate_space_freed()
             return stats
     
     def _cleanup_timeline_files(self) -> int:
         """Clean up old timeline files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
         # Get all timeline files
-        timeline_files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+        timeline_files = self._timeline_files()
         
         for file_path in timeline_files:
             try:
                 file_stat = os.stat(file_path)
-                file_date = datetime.fromtimestamp(file_stat.st_mtime)
+                file_date = datetime.fromtimestamp(max(file_stat.st_atime, file_stat.st_mtime))
                 
-                if file_date < cutoff_date:
-                    os.remove(file_path)
+                if file_date < cutoff_date and not self.is_pinned(file_path, pins):
+                    self._remove_path(file_path)
                     deleted_count += 1
                     logging.info(f"Deleted old timeline: {file_path}")
             except Exception as e:
@@ -85,6 +126,7 @@ class StorageManager:
     
     def _cleanup_lead_files(self) -> int:
         """Clean up old lead files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
@@ -94,10 +136,10 @@ class StorageManager:
         for lead_dir in lead_dirs:
             try:
                 dir_stat = os.stat(lead_dir)
-                dir_date = datetime.fromtimestamp(dir_stat.st_mtime)
+                dir_date = datetime.fromtimestamp(max(dir_stat.st_atime, dir_stat.st_mtime))
                 
-                if dir_date < cutoff_date:
-                    shutil.rmtree(lead_dir)
+                if dir_date < cutoff_date and not self.is_pinned(lead_dir, pins):
+                    self._remove_path(lead_dir)
                     deleted_count += 1
                     logging.info(f"Deleted old lead directory: {lead_dir}")
             except Exception as e:
@@ -107,6 +149,7 @@ class StorageManager:
     
     def _cleanup_summary_files(self) -> int:
         """Clean up old summary files"""
+        pins = self.live_pins()
         deleted_count = 0
         cutoff_date = datetime.now() - timedelta(days=self.max_age_days)
         
@@ -117,10 +160,10 @@ class StorageManager:
         for file_path in summary_files:
             try:
                 file_stat = os.stat(file_path)
-                file_date = datetime.fromtimestamp(file_stat.st_mtime)
+                file_date = datetime.fromtimestamp(max(file_stat.st_atime, file_stat.st_mtime))
                 
-                if file_date < cutoff_date:
-                    os.remove(file_path)
+                if file_date < cutoff_date and not self.is_pinned(file_path, pins):
+                    self._remove_path(file_path)
                     deleted_count += 1
                     logging.info(f"Deleted old summary file: {file_path}")
             except Exception as e:
@@ -128,10 +171,31 @@ class StorageManager:
         
         return deleted_count
     
+    def _cleanup_backend_leads(self) -> int:
+        """Clean up leads not accessed recently from an indexed storage backend"""
+        pins = self.live_pins()
+        backend = get_storage_backend()
+        if not hasattr(backend, 'contacts_by_access'):
+            # The file backend is covered by the glob-based cleanups above
+            return 0
+        deleted_count = 0
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
+        for lead in backend.contacts_by_access():
+            if lead['accessed_at'] >= cutoff:
+                break
+            if self.is_pinned(f"timeline_{lead['contact']}.json", pins):
+                continue
+            try:
+                self._bytes_freed += backend.delete_contact(lead['contact'])
+                deleted_count += 1
+                logging.info(f"Deleted old lead from {backend.name} backend: {lead['contact']}")
+            except Exception as e:
+                logging.warning(f"Failed to delete lead {lead['contact']} from {backend.name} backend: {e}")
+        return deleted_count
+    
     def _calculate_space_freed(self) -> float:
-        """Calculate approximate space freed in MB"""
-        # This is a rough estimate - in production you'd want more precise tracking
-        return 0.0  # Placeholder for now
+        """Space freed in MB by the current cleanup run"""
+        return self._bytes_freed / (1024 * 1024)
     
     def get_storage_stats(self) -> Dict[str, any]:
         """Get current storage statistics"""
@@ -146,7 +210,7 @@ class StorageManager:
         
         try:
             # Count timeline files
-            timeline_files = glob.glob(os.path.join(self.timeline_dir, "timeline_*.json"))
+            timeline_files = self._timeline_files()
             stats['timeline_files'] = len(timeline_files)
             
             # Count lead directories
@@ -221,7 +285,10 @@ class StorageManager:
         # 1. More than 50 total files/directories
         # 2. Total size > 100MB
         # 3. Oldest file > 3 days
+        # 4. Total size above the LRU high-water mark (when a capacity is set)
         total_items = stats['timeline_files'] + stats['lead_directories'] + stats['summary_files']
+        if self.capacity_mb and stats['total_size_mb'] > self.capacity_mb * self.high_water:
+            return True
         
         return (total_items > 50 or 
                 stats['total_size_mb'] > 100 or 
@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+import json_codec
+from http_cache import content_etag
+
+# Saved summaries record the ETag of the timeline they were generated from
+SUMMARY_SOURCE_KEY = '_source_timeline_etag'
+# Start summaries as soon as /generate-timeline has a fresh timeline
+SPECULATIVE_SUMMARIES = os.getenv('SPECULATIVE_SUMMARIES', 'false').lower() in ('1', 'true', 'yes')
+# Speculative jobs nobody has asked for yet, per worker; more are not started
+SPECULATIVE_MAX_JOBS = int(os.getenv('SPECULATIVE_MAX_JOBS', '4'))
+
+
+def timeline_etag(timeline: List[Dict[str, Any]]) -> str:
+    """Content ETag of a timeline, the same one /generate-timeline sends"""
+    return content_etag(json_codec.dumps_bytes(timeline))
+
+
+def saved_summary_for(backend, contact: str, source_etag: str) -> Optional[Dict[str, Any]]:
+    """The saved summary of a lead if it was generated from this timeline, else None"""
+    stored = backend.load_summary(contact)
+    if not stored or stored.get(SUMMARY_SOURCE_KEY) != source_etag:
+        return None
+    stored.pop(SUMMARY_SOURCE_KEY)
+    return stored
+
+
+def save_summary_for(backend, contact: str, summary: Dict[str, Any], source_etag: str):
+    """Save a summary together with the ETag of the timeline it was generated from"""
+    backend.save_summary(contact, {**summary, SUMMARY_SOURCE_KEY: source_etag})
+
+
+class SummaryJobs:
+    """
+    Summary generations in flight, keyed by (contact, timeline ETag), so a
+    summary is generated once per timeline version however it was asked
+    for.
+
+    speculate() starts one in the background, e.g. right after a timeline
+    was served, when the summary request is likely to follow. summarize()
+    attaches to a job already running for the same timeline, or runs one in
+    the calling thread that later callers attach to. Every job saves its
+    result with save_summary_for before finishing, so once a job is gone
+    its result is found by saved_summary_for.
+
+    Speculative jobs that no request has attached to yet are capped at
+    max_speculative; beyond that, speculation is skipped rather than queued.
+    Every job runs inside pin(backend, contact), e.g. StorageManager.pin_lead,
+    so storage cleanup cannot evict the lead while its summary is generated.
+
+    Example:
+        jobs = SummaryJobs(generate_combined_summary, pin=storage_manager.pin_lead)
+        jobs.speculate(backend, contact, path, lambda: timeline, etag)
+        summary = jobs.summarize(backend, contact, path, lambda: timeline, etag)
+    """
+
+    def __init__(self, generate: Callable[..., Dict[str, Any]], max_speculative: int = SPECULATIVE_MAX_JOBS,
+                 pin: Optional[Callable[[Any, str], ContextManager]] = None):
+        self.generate = generate
+        self.pin = pin or (lambda backend, contact: nullcontext())
+        self.max_speculative = max_speculative
+        self._jobs: Dict[Tuple[str, str], Future] = {}
+        self._unclaimed: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_speculative),
+                                            thread_name_prefix='speculative-summary')
+        self.stats = {'speculated': 0, 'attached': 0, 'skipped': 0}
+
+    def _run(self, future: Future, key: Tuple[str, str], backend, timeline_path: str,
+             load_timeline: Callable[[], List[Dict[str, Any]]], check_saved: bool):
+        contact, source_etag = key
+        try:
+            with self.pin(backend, contact):
+                summary = saved_summary_for(backend, contact, source_etag) if check_saved else None
+                if summary is None:
+                    summary = self.generate(timeline_path, timeline=load_timeline())
+                    save_summary_for(backend, contact, summary, source_etag)
+            future.set_result(summary)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._jobs.get(key) is future:
+                    del self._jobs[key]
+                self._unclaimed.discard(key)
+
+    def speculate(self, backend, contact: str, timeline_path: str,
+                  load_timeline: Callable[[], List[Dict[str, Any]]], source_etag: str) -> bool:
+        """
+        Start generating the summary of this timeline version in the
+        background, unless it is saved already, running already, or the
+        cap on unclaimed speculative jobs is reached.
+
+        Returns:
+            True if a job was started
+        """
+        key = (contact, source_etag)
+        with self._lock:
+            if key in self._jobs:
+                return False
+            if len(self._unclaimed) >= self.max_speculative:
+                self.stats['skipped'] += 1
+                return False
+            future = Future()
+            self._jobs[key] = future
+            self._unclaimed.add(key)
+            self.stats['speculated'] += 1
+        self._executor.submit(self._run, future, key, backend, timeline_path, load_timeline, True)
+        return True
+
+    def summarize(self, backend, contact: str, timeline_path: str,
+                  load_timeline: Callable[[], List[Dict[str, Any]]], source_etag: str,
+                  refresh: bool = False) -> Dict[str, Any]:
+        """
+        Summary of this timeline version, waiting for a job already running
+        for it or generating it in the calling thread. With refresh, a new
+        generation is started even if one is running.
+        """
+        key = (contact, source_etag)
+        with self._lock:
+            future = None if refresh else self._jobs.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._jobs[key] = future
+            else:
+                if key in self._unclaimed:
+                    self._unclaimed.discard(key)
+                    logging.info(f"Attached to speculative summary for {contact}")
+                self.stats['attached'] += 1
+        if owner:
+            self._run(future, key, backend, timeline_path, load_timeline, False)
+        return future.result()
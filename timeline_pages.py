@@ -0,0 +1,153 @@
+import base64
+import hashlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import json_codec
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Channel names accepted by ?channel= and the event types they cover
+CHANNEL_TYPES = {
+    'whatsapp': ('whatsapp', 'whatsapp_pack'),
+    'email': ('email', 'email_thread'),
+    'call': ('call',),
+    'lead': ('lead_info',),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def event_digest(event: Dict[str, Any]) -> str:
+    """Short hash of an event's content, to notice that it changed in place"""
+    return hashlib.blake2b(json_codec.dumps_bytes(event), digest_size=6).hexdigest()
+
+
+def encode_cursor(timestamp: Optional[str], rank: int, digest: str) -> str:
+    """
+    Opaque cursor for one event: its timestamp, its rank among events with
+    the same timestamp, and its content digest. Positions change when a
+    timeline is regenerated; timestamp and rank don't.
+    """
+    raw = json_codec.dumps_bytes([timestamp or '', rank, digest])
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, rank, digest = json_codec.loads(raw)
+        return str(timestamp), int(rank), str(digest)
+    except Exception:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def event_types_for(channels: Optional[str]) -> Optional[Set[str]]:
+    """Event types for a comma-separated channel list (None means every channel)"""
+    if not channels:
+        return None
+    types = set()
+    for channel in channels.split(','):
+        channel = channel.strip().lower()
+        if channel not in CHANNEL_TYPES:
+            raise ValueError(f"Unknown channel {channel!r}; expected one of {', '.join(CHANNEL_TYPES)}")
+        types.update(CHANNEL_TYPES[channel])
+    return types
+
+
+def _slot_keys(index) -> List[Tuple[str, int]]:
+    """(timestamp, rank among equal timestamps) of every indexed event"""
+    keys, seen = [], {}
+    for _, _, timestamp in index:
+        timestamp = timestamp or ''
+        rank = seen.get(timestamp, 0)
+        seen[timestamp] = rank + 1
+        keys.append((timestamp, rank))
+    return keys
+
+
+def read_timeline_page(backend, contact: str, cursor: Optional[str] = None, since: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE, types: Optional[Set[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    One page of a stored timeline, chosen from the backend's event index so
+    that only the returned events are decoded.
+
+    Without since, pages run newest first: the first page holds the latest
+    events and next_cursor fetches the page before it. With since (a
+    latest_cursor from an earlier response), only events added after that
+    event are returned, oldest first, plus the event itself if it changed
+    in place (a WhatsApp session that grew, a transcript attached).
+
+    Args:
+        backend: Storage backend holding the timeline
+        contact: Storage key of the lead
+        cursor: next_cursor of the previous page
+        since: latest_cursor of an earlier response, for a delta
+        limit: Maximum events per page
+        types: Only events of these types (see event_types_for)
+
+    Returns:
+        Dict with items ({"id", "event"}), next_cursor, latest_cursor,
+        has_more and total (matching events in the timeline), or None if
+        no timeline is stored
+    """
+    index = backend.event_index(contact)
+    if index is None:
+        return None
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    keys = _slot_keys(index)
+    position = {key: i for i, key in enumerate(keys)}
+
+    def wanted(i: int) -> bool:
+        return types is None or index[i][1] in types
+
+    changed = None
+    if since:
+        timestamp, rank, digest = decode_cursor(since)
+        at = position.get((timestamp, rank))
+        if at is None:
+            # The event is gone (timeline regenerated): resume after its timestamp
+            start = next((i for i, key in enumerate(keys) if key[0] > timestamp), len(keys))
+        else:
+            start = at + 1
+            if wanted(at) and event_digest(backend.load_events_by_ref(contact, [index[at][0]])[0]) != digest:
+                changed = at
+        candidates = [i for i in range(start, len(keys)) if wanted(i)]
+        if changed is not None:
+            candidates.insert(0, changed)
+    else:
+        end = len(keys)
+        if cursor:
+            timestamp, rank, _ = decode_cursor(cursor)
+            end = position.get((timestamp, rank))
+            if end is None:
+                end = next((i for i, key in enumerate(keys) if key[0] >= timestamp), len(keys))
+        candidates = [i for i in range(end - 1, -1, -1) if wanted(i)]
+
+    selected = candidates[:limit]
+    has_more = len(candidates) > limit
+    events = backend.load_events_by_ref(contact, [index[i][0] for i in selected])
+    items = [{'id': f'{keys[i][0]}#{keys[i][1]}', 'event': event} for i, event in zip(selected, events)]
+
+    def cursor_of(i: int, event: Dict[str, Any]) -> str:
+        return encode_cursor(keys[i][0], keys[i][1], event_digest(event))
+
+    next_cursor = cursor_of(selected[-1], events[-1]) if has_more and not since else None
+    if since and has_more:
+        latest_cursor = cursor_of(selected[-1], events[-1])  # keep polling from here
+    elif not keys:
+        latest_cursor = since
+    elif selected and selected[-1 if since else 0] == len(keys) - 1:
+        latest_cursor = cursor_of(len(keys) - 1, events[-1 if since else 0])
+    else:
+        newest = backend.load_events_by_ref(contact, [index[-1][0]])
+        latest_cursor = cursor_of(len(keys) - 1, newest[0]) if newest else since
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'latest_cursor': latest_cursor,
+        'has_more': has_more,
+        'total': len(keys) if types is None else sum(1 for _, t, _ in index if t in types),
+    }
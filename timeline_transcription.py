@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Any
+
+import requests
+
+from lru_files import record_access
+from storage_backend import get_storage_backend, event_call_id
+
+# The transcription service (call_transcription/transcribe_calls.py) runs separately
+TRANSCRIPTION_SERVICE_URL = os.getenv('TRANSCRIPTION_SERVICE_URL', 'http://localhost:8001')
+AUTO_TRANSCRIBE_CONCURRENCY = int(os.getenv('TIMELINE_TRANSCRIBE_CONCURRENCY', '8'))
+AUTO_TRANSCRIBE_TIMEOUT = float(os.getenv('TIMELINE_TRANSCRIBE_TIMEOUT', '300'))  # seconds for the whole stage
+# Same threshold as the transcription service's batch queue
+MIN_TRANSCRIBE_DURATION = float(os.getenv('TRANSCRIBE_MIN_DURATION', '10'))
+
+
+def _duration(event: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(event.get('duration'))
+    except (TypeError, ValueError):
+        return None
+
+
+def calls_missing_transcripts(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Call events that have a recording but no transcript yet, most recent
+    first. Calls known to be shorter than MIN_TRANSCRIBE_DURATION are left out.
+    """
+    calls = [e for e in events
+             if event_call_id(e) is not None and e.get('record_url') and not e.get('transcript')
+             and (_duration(e) is None or _duration(e) >= MIN_TRANSCRIBE_DURATION)]
+    calls.sort(key=lambda e: e.get('timestamp') or '', reverse=True)
+    return calls
+
+
+def _transcribe(service_url: str, contact: str, event: Dict[str, Any], timeout: float) -> Optional[str]:
+    """Transcribe one call through the service, waiting for the text"""
+    response = requests.post(
+        f'{service_url.rstrip("/")}/transcribe-call',
+        json={'record_url': event['record_url'], 'mobile_number': contact,
+              'call_id': event_call_id(event), 'wait': True},
+        timeout=timeout)
+    response.raise_for_status()
+    return response.text or None
+
+
+def transcribe_missing_calls(events: List[Dict[str, Any]], contact: str,
+                             max_concurrency: int = AUTO_TRANSCRIBE_CONCURRENCY,
+                             timeout: float = AUTO_TRANSCRIBE_TIMEOUT,
+                             service_url: str = TRANSCRIPTION_SERVICE_URL) -> Dict[str, int]:
+    """
+    Fill in transcripts for recorded calls before a timeline is saved.
+
+    Transcripts already stored (matched by call ID or recording ID) are
+    reused without calling the service. The remaining calls are sent to the
+    transcription service with at most max_concurrency in flight. Calls
+    still running when timeout expires are left without a transcript; the
+    service attaches them to the saved timeline once they finish.
+
+    Args:
+        events: Timeline events, updated in place
+        contact: Storage key of the lead
+        max_concurrency: Transcriptions in flight at once
+        timeout: Seconds to wait for the whole stage
+
+    Returns:
+        Counts of missing, cached, transcribed, failed and pending calls
+    """
+    missing = calls_missing_transcripts(events)
+    stats = {'missing': len(missing), 'cached': 0, 'transcribed': 0, 'failed': 0, 'pending': 0}
+    if not missing:
+        return stats
+
+    backend = get_storage_backend()
+    to_transcribe = []
+    for event in missing:
+        try:
+            entry = backend.transcript_location(call_id=event_call_id(event), audio_url=event['record_url'])
+            cached = None
+            if entry is not None:
+                # Reused transcripts count as accessed for LRU eviction
+                record_access(entry['location'])
+                cached = backend.find_transcript(call_id=event_call_id(event), audio_url=event['record_url'])
+        except Exception as e:
+            logging.warning(f"Transcript lookup failed for call {event_call_id(event)}: {e}")
+            cached = None
+        if cached:
+            event['transcript'] = cached
+            stats['cached'] += 1
+        else:
+            to_transcribe.append(event)
+
+    if to_transcribe:
+        deadline = time.time() + timeout
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        futures = {executor.submit(_transcribe, service_url, contact, event, timeout): event
+                   for event in to_transcribe}
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.time()))
+        for future in done:
+            event = futures[future]
+            try:
+                transcript = future.result()
+            except Exception as e:
+                logging.warning(f"Auto-transcription failed for call {event_call_id(event)}: {e}")
+                transcript = None
+            if transcript:
+                event['transcript'] = transcript
+                stats['transcribed'] += 1
+            else:
+                stats['failed'] += 1
+        for future in not_done:
+            future.cancel()
+        stats['pending'] = len(not_done)
+        # Don't hold up the timeline for stragglers; they finish in the background
+        executor.shutdown(wait=False)
+
+    logging.info(f"Auto-transcription for {contact}: {stats}")
+    return stats
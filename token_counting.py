@@ -0,0 +1,28 @@
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to ~4 characters per token
+    tiktoken = None
+
+# Model the summary prompts are sent to (see llm_analysis/*_node.py)
+SUMMARY_MODEL = 'gpt-4.1-mini'
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens of text for SUMMARY_MODEL (estimated from length without tiktoken)"""
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(SUMMARY_MODEL)
+        except Exception:
+            try:
+                _encoding = tiktoken.get_encoding('o200k_base')
+            except Exception as e:
+                logging.warning(f"tiktoken unavailable ({e}), estimating tokens from length")
+                _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
@@ -0,0 +1,372 @@
+"""
+Predictive warm-up: refresh timelines and summaries of recently active
+leads in the background, so an agent's first click hits a saved summary.
+
+    python warmup.py              # loop, warming during WARMUP_WINDOWS
+    python warmup.py --once       # one pass (still honours the windows)
+    python warmup.py --once --force --dry-run
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import calendar
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: no cross-process guard, one service per host is up to the operator
+    fcntl = None
+
+import json_codec
+from storage_backend import DATA_DIR, LOCK_DIR, contact_key, get_storage_backend
+from storage_manager import StorageManager
+from summary_cache import saved_summary_for, save_summary_for, timeline_etag
+from token_counting import count_tokens
+
+# Estimated LLM tokens (prompts plus maximum replies) spent per day
+WARMUP_TOKEN_BUDGET = int(os.getenv('WARMUP_TOKEN_BUDGET', '2000000'))
+# Local-time windows in which warm-up may run, e.g. "01:00-06:00,14:00-15:00"; empty means always
+WARMUP_WINDOWS = os.getenv('WARMUP_WINDOWS', '01:00-06:00')
+WARMUP_INTERVAL = float(os.getenv('WARMUP_INTERVAL_SECONDS', '900'))
+WARMUP_MAX_LEADS = int(os.getenv('WARMUP_MAX_LEADS', '100'))  # per pass
+# How far back the first pass looks for activity
+WARMUP_LOOKBACK_HOURS = float(os.getenv('WARMUP_LOOKBACK_HOURS', '24'))
+STATE_PATH = os.path.join(DATA_DIR, 'warmup_state.json')
+MAX_PENDING = 5000
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_analysis', 'prompts')
+SUMMARY_PROMPTS = ('requirements_prompt.txt', 'tasks_actionables_prompt.txt', 'conversation_summary_prompt.txt')
+SUMMARY_REPLY_TOKENS = 1500 + 1500 + 1800  # max_tokens of the three summary calls
+
+# Latest activity per lead since a watermark, one cheap grouped query per
+# channel over the tables db_test_extract.py reads. Source timestamps are UTC.
+ACTIVITY_QUERIES = {
+    'whatsapp': '''
+    SELECT
+      CASE WHEN direction = 'inbound' THEN from_number ELSE to_number END AS phone,
+      NULL AS email,
+      MAX(created_at) AS last_activity
+    FROM whatsapp_messages
+    WHERE source = 'eazybe' AND direction IN ('inbound', 'outbound') AND created_at > %s
+    GROUP BY 1;
+    ''',
+    'email': '''
+    SELECT
+      json_extract_path_text(l.user_details, 'phone') AS phone,
+      json_extract_path_text(l.user_details, 'email') AS email,
+      MAX(le.timestamp) AS last_activity
+    FROM leads_emails le
+    JOIN leads l
+      ON json_extract_path_text(l.user_details, 'email') IN (le.from_email, le.to_email)
+    WHERE le.timestamp > %s
+    GROUP BY 1, 2;
+    ''',
+    'call': '''
+    SELECT
+      json_extract_path_text(l.user_details, 'phone') AS phone,
+      json_extract_path_text(l.user_details, 'email') AS email,
+      MAX(lc.timestamp) AS last_activity
+    FROM leads_calls lc
+    JOIN leads l
+      ON json_extract_path_text(l.user_details, 'phone') IN (lc.to_number, lc.from_number)
+    WHERE lc.timestamp > %s
+    GROUP BY 1, 2;
+    ''',
+}
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_windows(spec: str) -> List[tuple]:
+    """'01:00-06:00,22:30-02:00' as (start, end) minutes since midnight"""
+    windows = []
+    for part in (spec or '').split(','):
+        if part.strip():
+            start, end = part.split('-')
+            windows.append((_minutes(start), _minutes(end)))
+    return windows
+
+
+def in_window(windows: List[tuple], now: Optional[datetime] = None) -> bool:
+    if not windows:
+        return True
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):  # wraps past midnight
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def _prompt_tokens(name: str) -> int:
+    try:
+        with open(os.path.join(PROMPT_DIR, name), 'r', encoding='utf-8') as f:
+            return count_tokens(f.read())
+    except OSError:
+        return 0
+
+
+def estimate_summary_tokens(timeline: List[Dict[str, Any]]) -> int:
+    """Upper estimate of the tokens one summary of timeline costs (three prompts plus replies)"""
+    timeline_tokens = count_tokens(json_codec.dumps(timeline))
+    return sum(timeline_tokens + _prompt_tokens(name) for name in SUMMARY_PROMPTS) + SUMMARY_REPLY_TOKENS
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Unix time of a naive UTC ISO timestamp from the source tables"""
+    try:
+        return calendar.timegm(datetime.fromisoformat(str(timestamp)[:26]).timetuple())
+    except (TypeError, ValueError):
+        return None
+
+
+class WarmupService:
+    """
+    Finds leads with WhatsApp, email or call activity newer than their
+    saved summary and regenerates their timeline and summary, most recently
+    active first, while inside a warm-up window and within the daily token
+    budget.
+
+    Summaries are saved with the ETag of their source timeline, exactly as
+    /generate-summary does, so the API serves them without calling the LLM.
+    Progress (activity watermark, leads still to warm, tokens spent today)
+    is kept in data/warmup_state.json.
+    """
+
+    def __init__(self, backend=None, token_budget: int = WARMUP_TOKEN_BUDGET,
+                 windows: str = WARMUP_WINDOWS, max_leads: int = WARMUP_MAX_LEADS,
+                 state_path: str = STATE_PATH, storage_manager: Optional[StorageManager] = None):
+        self.backend = backend or get_storage_backend()
+        self.storage_manager = storage_manager or StorageManager()
+        self.token_budget = token_budget
+        self.windows = parse_windows(windows)
+        self.max_leads = max_leads
+        self.state_path = state_path
+
+    # --- State ---
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            state = json_codec.load_file(self.state_path)
+        except (OSError, ValueError):
+            state = {}
+        today = datetime.now().date().isoformat()
+        if state.get('day') != today:
+            state['day'], state['tokens_spent'] = today, 0
+        state.setdefault('pending', {})
+        return state
+
+    def save_state(self, state: Dict[str, Any]):
+        tmp = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json_codec.dumps_bytes(state, pretty=True))
+        os.replace(tmp, self.state_path)
+
+    # --- Detection ---
+
+    def _fetch(self, query: str, since: str) -> List[Dict[str, Any]]:
+        import pandas as pd
+        from db_test_extract import Databaseconnect
+        conn = Databaseconnect().connect_database()
+        try:
+            return pd.read_sql(query, conn, params=[since.replace('T', ' ')]).to_dict('records')
+        finally:
+            conn.close()
+
+    def find_active_leads(self, since: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Leads with activity after since, keyed by storage contact key.
+
+        Returns:
+            contact -> {contact, mobile, email, last_activity, channels}
+        """
+        leads: Dict[str, Dict[str, Any]] = {}
+        for channel, query in ACTIVITY_QUERIES.items():
+            try:
+                rows = self._fetch(query, since)
+            except Exception as e:
+                logging.warning(f"[Warmup] {channel} activity query failed: {e}")
+                continue
+            for row in rows:
+                mobile, email = row.get('phone') or None, row.get('email') or None
+                last_activity = json_codec.to_jsonable(row.get('last_activity'))
+                if (not mobile and not email) or not last_activity:
+                    continue
+                contact = contact_key(mobile, email)
+                lead = leads.setdefault(contact, {'contact': contact, 'mobile': mobile, 'email': email,
+                                                  'last_activity': last_activity, 'channels': []})
+                lead['mobile'] = lead['mobile'] or mobile
+                lead['email'] = lead['email'] or email
+                lead['last_activity'] = max(lead['last_activity'], last_activity)
+                if channel not in lead['channels']:
+                    lead['channels'].append(channel)
+        return leads
+
+    def needs_warmup(self, lead: Dict[str, Any]) -> bool:
+        """Whether the lead's activity is newer than its saved summary (or it has none)"""
+        summarized_at = self.backend.summary_updated_at(lead['contact'])
+        activity = _epoch(lead['last_activity'])
+        return summarized_at is None or activity is None or activity > summarized_at
+
+    # --- Warming ---
+
+    def warm_lead(self, lead: Dict[str, Any], tokens_left: int) -> Optional[int]:
+        """
+        Refresh one lead's timeline and, if it changed, its summary.
+
+        Returns:
+            Estimated tokens spent (0 when the saved summary was still
+            current), or None if the summary did not fit in tokens_left
+        """
+        from db_test_extract import consolidate_and_save_timeline
+        from llm_analysis.orchestrator import generate_combined_summary
+
+        contact = lead['contact']
+        # Same pin as API summaries, so cleanup cannot evict the lead mid-refresh
+        with self.storage_manager.pin_lead(self.backend, contact):
+            if consolidate_and_save_timeline(mobile_number=lead['mobile'], email=lead['email']) is None:
+                raise RuntimeError("timeline extraction failed")
+            timeline = self.backend.load_timeline(contact)
+            if timeline is None:
+                raise RuntimeError("timeline was not saved")
+            source_etag = timeline_etag(timeline)
+            if saved_summary_for(self.backend, contact, source_etag) is not None:
+                return 0
+            cost = estimate_summary_tokens(timeline)
+            if cost > tokens_left:
+                return None
+            summary = generate_combined_summary(self.backend.timeline_location(contact), timeline=timeline)
+            save_summary_for(self.backend, contact, summary, source_etag)
+            return cost
+
+    def run_once(self, force: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        One warm-up pass.
+
+        Args:
+            force: Run even outside the warm-up windows
+            dry_run: Only report which leads would be warmed
+
+        Returns:
+            Counts of active, candidate, warmed, unchanged, deferred and
+            failed leads, plus tokens spent today
+        """
+        if not force and not in_window(self.windows):
+            return {'skipped': 'outside warm-up window'}
+        state = self.load_state()
+        if not state.get('watermark'):
+            start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=WARMUP_LOOKBACK_HOURS)
+            state['watermark'] = start.isoformat(timespec='seconds')
+        since = state['watermark']
+        active = self.find_active_leads(since)
+
+        pending = state['pending']
+        for contact, lead in active.items():
+            previous = pending.get(contact)
+            if previous is None or lead['last_activity'] >= previous['last_activity']:
+                pending[contact] = lead
+        candidates = [lead for lead in pending.values() if self.needs_warmup(lead)]
+        # Leads agents already looked at first, then the most recently active
+        candidates.sort(key=lambda l: (self.backend.summary_updated_at(l['contact']) is not None,
+                                       l['last_activity']), reverse=True)
+        stats = {'active': len(active), 'candidates': len(candidates), 'warmed': 0, 'unchanged': 0,
+                 'deferred': 0, 'failed': 0}
+        if dry_run:
+            stats['would_warm'] = [l['contact'] for l in candidates[:self.max_leads]]
+            return stats
+
+        done = set()
+        for lead in candidates[:self.max_leads]:
+            tokens_left = self.token_budget - state['tokens_spent']
+            if tokens_left < SUMMARY_REPLY_TOKENS or (not force and not in_window(self.windows)):
+                break
+            try:
+                cost = self.warm_lead(lead, tokens_left)
+            except Exception as e:
+                logging.warning(f"[Warmup] Could not warm {lead['contact']}: {e}")
+                stats['failed'] += 1
+                done.add(lead['contact'])  # new activity queues it again
+                continue
+            if cost is None:
+                stats['deferred'] += 1
+                continue
+            state['tokens_spent'] += cost
+            stats['warmed' if cost else 'unchanged'] += 1
+            done.add(lead['contact'])
+
+        remaining = [l for l in candidates if l['contact'] not in done]
+        state['pending'] = {l['contact']: l for l in remaining[:MAX_PENDING]}
+        if active:
+            state['watermark'] = max(since, *(l['last_activity'] for l in active.values()))
+        self.save_state(state)
+        stats['tokens_spent_today'] = state['tokens_spent']
+        logging.info(f"[Warmup] Pass complete: {stats}")
+        return stats
+
+    def run_forever(self, interval: float = WARMUP_INTERVAL):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"[Warmup] Pass failed: {e}")
+            time.sleep(interval)
+
+
+_service_lock_fd = None
+
+
+def start_background(interval: float = WARMUP_INTERVAL) -> bool:
+    """
+    Run the warm-up service in a daemon thread of this process, unless
+    another process (e.g. another API worker) already runs it.
+
+    Returns:
+        True if this process started the service
+    """
+    global _service_lock_fd
+    if _service_lock_fd is not None:
+        return False
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(LOCK_DIR, 'warmup.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+    _service_lock_fd = fd  # held for the life of the process
+    thread = threading.Thread(target=WarmupService().run_forever, args=(interval,),
+                              name='summary-warmup', daemon=True)
+    thread.start()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute summaries for recently active leads')
+    parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+    parser.add_argument('--force', action='store_true', help='Ignore WARMUP_WINDOWS')
+    parser.add_argument('--dry-run', action='store_true', help='List the leads that would be warmed')
+    parser.add_argument('--interval', type=float, default=WARMUP_INTERVAL, help='Seconds between passes')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    service = WarmupService()
+    if args.once or args.dry_run:
+        print(json_codec.dumps(service.run_once(force=args.force, dry_run=args.dry_run), pretty=True))
+        return 0
+    service.run_forever(args.interval)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())